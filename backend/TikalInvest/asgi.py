@@ -3,15 +3,18 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tikalinvest.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TikalInvest.settings')
 
 django_asgi_app = get_asgi_application()
 
+from apps.stocks.routing import websocket_urlpatterns as stocks_websocket_urlpatterns
+
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
     'websocket': AuthMiddlewareStack(
         URLRouter([
             # WebSocket URLs aquí
+            *stocks_websocket_urlpatterns,
         ])
     ),
 })
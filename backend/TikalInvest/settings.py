@@ -2,6 +2,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from celery.schedules import crontab
+from corsheaders.defaults import default_headers
 
 load_dotenv()
 
@@ -14,6 +16,8 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
 # Application definition
 INSTALLED_APPS = [
+    # Primero: runserver pasa a servir ASGI (HTTP y el WebSocket ws/prices/)
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -26,6 +30,7 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'corsheaders',
     'django_filters',
+    'channels',
     
     # Local apps
     'apps.users',
@@ -33,6 +38,7 @@ INSTALLED_APPS = [
     'apps.stocks',
     'apps.transactions',
     'apps.admin_panel',
+    'apps.wallet',
 ]
 
 MIDDLEWARE = [
@@ -46,7 +52,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'tikalinvest.urls'
+ROOT_URLCONF = 'TikalInvest.urls'
 
 TEMPLATES = [
     {
@@ -64,8 +70,8 @@ TEMPLATES = [
     },
 ]
 
-WSGI_APPLICATION = 'tikalinvest.wsgi.application'
-ASGI_APPLICATION = 'tikalinvest.asgi.application'
+WSGI_APPLICATION = 'TikalInvest.wsgi.application'
+ASGI_APPLICATION = 'TikalInvest.asgi.application'
 
 # Database
 DATABASES = {
@@ -149,6 +155,43 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Auth0
+AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN', '')
+AUTH0_CLIENT_ID = os.getenv('AUTH0_CLIENT_ID', '')
+AUTH0_CLIENT_SECRET = os.getenv('AUTH0_CLIENT_SECRET', '')
+
+# Revocación de tokens de Auth0 en segundo plano (apps.users.auth0_revoke)
+AUTH0_REVOKE = {
+    # En desarrollo puede apuntar al revoke falso: http://localhost:8000/api/auth/fake-auth0/oauth/revoke
+    'URL': os.getenv('AUTH0_REVOKE_URL', f'https://{AUTH0_DOMAIN}/oauth/revoke'),
+    'TIMEOUT': 5,
+    # Cola propia, para que un Auth0 lento no retrase las demás tareas
+    'QUEUE': 'auth0',
+    # Con tantas revocaciones pendientes se descartan las nuevas
+    'MAX_QUEUE': 1000,
+    # Segundos que se espera al broker para saber el tamaño de la cola; sin respuesta se descarta
+    'SIZE_TIMEOUT': 0.5,
+    # Segundos tras los cuales una revocación sin ejecutar se descarta (el token ya venció)
+    'EXPIRES': 3600,
+}
+
+# Llaves públicas de Auth0 en caché por proceso (apps.users.jwks)
+AUTH0_JWKS = {
+    # Segundos de vida del juego de llaves; se renueva en segundo plano REFRESH_AHEAD antes
+    'TTL': int(os.getenv('AUTH0_JWKS_TTL', '600')),
+    'REFRESH_AHEAD': 60,
+    # Descarga inmediata por kid desconocido, como mucho una cada tantos segundos
+    'MIN_REFETCH_INTERVAL': 30,
+    'TIMEOUT': 5,
+}
+
+# Tokens de Auth0 ya verificados, por proceso (apps.users.token_cache)
+AUTH0_TOKEN_CACHE = {
+    # Segundos máximos por entrada; nunca más allá del exp del token
+    'TTL': int(os.getenv('AUTH0_TOKEN_CACHE_TTL', '60')),
+    'MAX_ENTRIES': 10000,
+}
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -159,6 +202,10 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Paginación por cursor: la página siguiente de los listados que son una lista va en Link
+CORS_EXPOSE_HEADERS = ['Link', 'Idempotent-Replayed']
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 # Email Configuration (Gmail o tu servidor SMTP preferido)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -170,6 +217,167 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 # Zerobounce API
 ZEROBOUNCE_API_KEY = os.getenv('ZEROBOUNCE')
 
+# Redis (docker-compose levanta el servicio 'redis')
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+# Caché de cotizaciones de Yahoo Finance
+# BACKEND: 'local' (memoria del proceso, para tests) o 'redis' (compartida entre workers)
+QUOTE_CACHE = {
+    'BACKEND': os.getenv('QUOTE_CACHE_BACKEND', 'redis' if REDIS_URL else 'local'),
+    'LOCATION': REDIS_URL,
+    'KEY_PREFIX': 'tikal',
+    'MAX_ENTRIES': int(os.getenv('QUOTE_CACHE_MAX_ENTRIES', '1024')),
+    'TTL': int(os.getenv('QUOTE_CACHE_TTL', '60')),
+    'STALE_TTL': int(os.getenv('QUOTE_CACHE_STALE_TTL', '900')),
+    # Sector, industria, descripción, beta, P/E... del detalle de una acción
+    'FUNDAMENTALS_TTL': int(os.getenv('QUOTE_CACHE_FUNDAMENTALS_TTL', '86400')),
+    # TTL por símbolo exacto o por sufijo
+    'TTL_OVERRIDES': {
+        '-USD': int(os.getenv('QUOTE_CACHE_CRYPTO_TTL', '30')),
+    },
+}
+
+# Checkpoints de posiciones para consultas "a una fecha" (apps.portfolio.checkpoints)
+PORTFOLIO_CHECKPOINTS = {
+    # Operaciones nuevas mínimas para guardar un checkpoint
+    'MIN_TRANSACTIONS': int(os.getenv('PORTFOLIO_CHECKPOINT_MIN_TRANSACTIONS', '50')),
+}
+
+# Reintentos de POST con la cabecera Idempotency-Key (apps.users.idempotency)
+IDEMPOTENCY = {
+    # Horas que se guarda la respuesta de cada llave
+    'TTL_HOURS': int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24')),
+    # Segundos tras los que un intento que quedó "en proceso" se da por muerto
+    'LOCK_TIMEOUT': 60,
+}
+
+# Lotes de operaciones (POST /api/portfolio/transactions/batch/)
+PORTFOLIO_BATCH = {
+    'MAX_ORDERS': int(os.getenv('PORTFOLIO_BATCH_MAX_ORDERS', '100')),
+}
+
+# Llamadas a upstreams externos: circuito, concurrencia adaptativa y reintentos
+UPSTREAM = {
+    'yahoo': {
+        # Llamadas fallidas seguidas (tras sus reintentos) que abren el circuito y segundos que permanece abierto
+        'FAILURE_THRESHOLD': int(os.getenv('YAHOO_FAILURE_THRESHOLD', '5')),
+        'RECOVERY_TIMEOUT': int(os.getenv('YAHOO_RECOVERY_TIMEOUT', '30')),
+        # Llamadas simultáneas: valor inicial y límites del ajuste automático
+        'CONCURRENCY': 5,
+        'MIN_CONCURRENCY': 1,
+        'MAX_CONCURRENCY': 20,
+        # Latencia (segundos) a partir de la cual se reduce la concurrencia
+        'TARGET_LATENCY': 2.0,
+        'RETRIES': 2,
+        'BACKOFF_BASE': 0.5,
+        'BACKOFF_MAX': 4.0,
+        # Espera máxima por un lugar libre antes de rendirse
+        'ACQUIRE_TIMEOUT': 5.0,
+    },
+}
+
+# Cliente async de cotizaciones (vistas de /api/async/stocks/ servidas por ASGI)
+ASYNC_MARKET_CLIENT = {
+    # Conexiones del pool y peticiones simultáneas a Yahoo por worker
+    'MAX_CONNECTIONS': 100,
+    'CONCURRENCY': int(os.getenv('ASYNC_MARKET_CONCURRENCY', '50')),
+    'TIMEOUT': 10,
+    'RETRIES': 1,
+}
+
+# Foto del mercado que refresca Celery beat y sirven las vistas de stocks
+MARKET_SNAPSHOT = {
+    'REFRESH_SECONDS': int(os.getenv('MARKET_SNAPSHOT_REFRESH_SECONDS', '30')),
+    # A partir de esta antigüedad (segundos) la respuesta se marca como stale
+    'MAX_AGE': int(os.getenv('MARKET_SNAPSHOT_MAX_AGE', '120')),
+    'RETENTION': 86400,
+}
+
+# Almacén local de barras diarias (tabla price_bars)
+HISTORY_STORE = {
+    # Periodo que completa Celery la primera vez que se sincroniza un símbolo
+    'INITIAL_PERIOD': os.getenv('HISTORY_INITIAL_PERIOD', '10y'),
+    # Intervalo mínimo entre actualizaciones encoladas desde una petición
+    'RESYNC_SECONDS': 21600,
+}
+
+# Directorio local de símbolos para /api/stocks/search/
+SYMBOL_DIRECTORY = {
+    'LISTING_FILE': BASE_DIR / 'services' / 'data' / 'symbols.csv',
+    'MAX_RESULTS': 20,
+}
+
+# Channels: capa en memoria para desarrollo/tests, Redis cuando está configurado
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+                # Mensajes máximos por canal antes de descartar (clientes lentos)
+                'capacity': 200,
+                'expiry': 30,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {
+                'capacity': 200,
+                'expiry': 30,
+            },
+        },
+    }
+
+# Canal de precios en tiempo real (ws/prices/)
+PRICE_STREAM = {
+    'MAX_SYMBOLS': 50,
+}
+
+# Celery
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL or 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ROUTES = {
+    # También los reintentos van a la cola de Auth0; el worker debe consumirla (-Q celery,auth0)
+    'apps.users.tasks.revoke_auth0_token': {'queue': AUTH0_REVOKE['QUEUE']},
+}
+CELERY_BEAT_SCHEDULE = {
+    'refresh-market-snapshot': {
+        'task': 'apps.stocks.tasks.refresh_market_snapshot',
+        'schedule': float(MARKET_SNAPSHOT['REFRESH_SECONDS']),
+        'options': {'expires': MARKET_SNAPSHOT['REFRESH_SECONDS']},
+    },
+    'sync-price-history': {
+        'task': 'apps.stocks.tasks.sync_price_history',
+        # Después del cierre del mercado de Nueva York
+        'schedule': crontab(hour=17, minute=30, day_of_week='mon-fri'),
+    },
+    'snapshot-portfolios': {
+        'task': 'apps.portfolio.tasks.snapshot_portfolios',
+        # Todos los días: las criptomonedas también cotizan el fin de semana
+        'schedule': crontab(hour=23, minute=50),
+    },
+    'checkpoint-holdings': {
+        'task': 'apps.portfolio.tasks.checkpoint_holdings',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'verify-ledger': {
+        'task': 'apps.users.tasks.verify_ledger',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'purge-idempotency-keys': {
+        'task': 'apps.users.tasks.purge_idempotency_keys',
+        'schedule': crontab(minute=15),
+    },
+    'replay-audit-spool': {
+        'task': 'apps.users.tasks.replay_audit_spool',
+        'schedule': 600.0,
+    },
+}
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -202,3 +410,13 @@ LOGGING = {
 # Crear carpeta de logs si no existe
 LOGS_DIR = BASE_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
+
+# Registros de auditoría (SecurityLog) diferidos y por lotes (apps.users.audit)
+AUDIT_LOG = {
+    'FLUSH_INTERVAL_MS': int(os.getenv('AUDIT_LOG_FLUSH_INTERVAL_MS', '200')),
+    'BATCH_SIZE': 100,
+    # Con tantos registros pendientes quien registra vacía el búfer en línea
+    'MAX_BUFFER': 5000,
+    # Spool en disco de cada proceso; sobrevive a la caída del worker
+    'SPOOL_DIR': LOGS_DIR / 'audit',
+}
@@ -11,9 +11,11 @@ router.register(r'stocks', StocksViewSet, basename='stocks')
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    path('api/async/stocks/', include('apps.stocks.async_urls')),
     path('api/', include('apps.users.urls')),
     path('api/auth/', include('apps.auth.urls')),
     path('api/portfolio/', include('apps.portfolio.urls')),
+    path('api/wallet/', include('apps.wallet.urls')),
     path('api/', include('apps.admin_panel.urls')),
 ]
 
@@ -3,11 +3,19 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Sum, Avg, F, Q 
 from apps.users.auth0_authentication import Auth0JWTAuthentication
+from apps.users.balance import BalanceService
+from apps.users.models import LedgerEntry
 from rest_framework import exceptions
 from apps.transactions.models import Transaction
 from apps.stocks.models import Stock
+from apps.portfolio.valuation import PortfolioValuation
+from apps.portfolio.performance import PortfolioPerformance, parse_range
+from apps.portfolio.checkpoints import as_of
+from datetime import date
+from decimal import Decimal
 
 User = get_user_model()
 
@@ -46,7 +54,7 @@ def verify_auth0_user(request):
                 'email': user.email,
                 'name': f"{user.first_name} {user.last_name}".strip(),
                 'role': user.role,
-                'balance': float(user.balance),
+                'balance': float(BalanceService.get_available(user)),
                 'referral_code': user.referral_code,
                 'is_verified': user.is_verified,
                 'date_joined': user.date_joined.isoformat() if user.date_joined else None
@@ -75,7 +83,7 @@ def user_profile(request):
             'email': user.email,
             'name': f"{user.first_name} {user.last_name}".strip(),
             'role': user.role,
-            'balance': float(user.balance),
+            'balance': float(BalanceService.get_available(user)),
             'referral_code': user.referral_code,
             'is_verified': user.is_verified,
             'date_joined': user.date_joined.isoformat() if user.date_joined else None
@@ -127,44 +135,50 @@ def portfolio_data(request):
             holdings[stock_id]['quantity'] -= tx.quantity
             holdings[stock_id]['total_cost'] -= float(tx.total_amount)
     
-    # Calcular valores actuales y preparar respuesta
+    # Valuar a precio de mercado con una sola búsqueda de cotizaciones
+    open_holdings = [data for data in holdings.values() if data['quantity'] > 0]
+    stocks = {data['stock'].symbol.upper(): data['stock'] for data in open_holdings}
+    quotes = PortfolioValuation.get_quotes(stocks.keys())
+    for symbol, stock in stocks.items():
+        # Sin cotización se usa el último precio guardado en la tabla Stock
+        quotes.setdefault(symbol, {'price': stock.current_price})
+    
+    valuation = PortfolioValuation.value_positions([
+        {
+            'symbol': data['stock'].symbol,
+            'name': data['stock'].name,
+            'shares': Decimal(data['quantity']),
+            'cost_basis': Decimal(str(data['total_cost'])),
+        }
+        for data in open_holdings
+    ], quotes)
+    
     portfolio_items = []
-    total_value = 0
-    total_invested = 0
-    total_pl = 0
-    
-    for stock_id, data in holdings.items():
-        if data['quantity'] > 0:
-            stock = data['stock']
-            current_value = float(stock.current_price) * data['quantity']
-            avg_price = data['total_cost'] / data['quantity'] if data['quantity'] > 0 else 0
-            profit_loss = current_value - data['total_cost']
-            profit_loss_percent = (profit_loss / data['total_cost'] * 100) if data['total_cost'] > 0 else 0
-            
-            portfolio_items.append({
-                'stock_id': stock.id,
-                'symbol': stock.symbol,
-                'name': stock.name,
-                'quantity': data['quantity'],
-                'avg_price': round(avg_price, 2),
-                'current_price': float(stock.current_price),
-                'total_value': round(current_value, 2),
-                'profit_loss': round(profit_loss, 2),
-                'profit_loss_percent': round(profit_loss_percent, 2),
-                'change_percent': float(stock.change_percent) if hasattr(stock, 'change_percent') else 0
-            })
-            
-            total_value += current_value
-            total_invested += data['total_cost']
-            total_pl += profit_loss
+    for position in valuation['positions']:
+        stock = stocks[position['symbol'].upper()]
+        portfolio_items.append({
+            'stock_id': stock.id,
+            'symbol': stock.symbol,
+            'name': stock.name,
+            'quantity': float(position['shares']),
+            'avg_price': float(position['average_price']),
+            'current_price': float(position['current_price']),
+            'total_value': float(position['market_value']),
+            'profit_loss': float(position['unrealized_pnl']),
+            'profit_loss_percent': float(position['unrealized_pnl_percent']),
+            'change_percent': float(position['change_percent'])
+        })
     
-    # Calcular cambio diario (estimado)
-    daily_change = total_value * 0.02  # Placeholder, ajustar con logica real
-    daily_change_percent = (daily_change / total_value * 100) if total_value > 0 else 0
+    total_value = float(valuation['market_value'])
+    total_invested = float(valuation['cost_basis'])
+    total_pl = float(valuation['unrealized_pnl'])
+    daily_change = float(valuation['day_change'])
+    daily_change_percent = float(valuation['day_change_percent'])
     
+    available_balance = float(BalanceService.get_available(user))
     portfolio_summary = {
-        'total_value': round(total_value + float(user.balance), 2),
-        'available_balance': float(user.balance),
+        'total_value': round(total_value + available_balance, 2),
+        'available_balance': available_balance,
         'invested_amount': round(total_invested, 2),
         'current_holdings_value': round(total_value, 2),
         'daily_change': round(daily_change, 2),
@@ -177,7 +191,7 @@ def portfolio_data(request):
     
     return Response({
         'portfolio': portfolio_summary,
-        'user_balance': float(user.balance)
+        'user_balance': available_balance
     })
 
 
@@ -218,11 +232,12 @@ def portfolio_summary(request):
         )
     ).filter(net_quantity__gt=0).count()
     
+    available_balance = float(BalanceService.get_available(user))
     return Response({
         'total_invested': round(net_invested, 2),
-        'available_balance': float(user.balance),
+        'available_balance': available_balance,
         'total_holdings': holdings,
-        'total_value': round(net_invested + float(user.balance), 2)
+        'total_value': round(net_invested + available_balance, 2)
     })
 
 
@@ -277,8 +292,11 @@ def portfolio_history(request):
     """
     user = request.user
     
-    # Obtener parametros
-    period = request.query_params.get('period', '1M')
+    # Obtener parametros (7D, 1M, 3M, 1Y o ALL)
+    try:
+        period = parse_range(request.query_params.get('period', '1M'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     # Obtener transacciones recientes
     transactions = Transaction.objects.filter(
@@ -297,10 +315,32 @@ def portfolio_history(request):
         'commission': float(tx.commission)
     } for tx in transactions]
     
-    return Response({
+    response = {
         'period': period,
+        'series': PortfolioPerformance.get_series(user.id, period),
         'history': history_data
-    })
+    }
+    
+    # Posiciones a una fecha pasada (?as_of=YYYY-MM-DD)
+    as_of_date = request.query_params.get('as_of')
+    if as_of_date:
+        try:
+            day = date.fromisoformat(as_of_date)
+        except ValueError:
+            return Response({'error': 'Fecha invalida, usa YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        response['as_of'] = day.isoformat()
+        response['positions'] = [
+            {
+                'symbol': h.symbol,
+                'name': h.name,
+                'shares': float(h.shares),
+                'average_price': float(h.average_price),
+                'total_invested': float(h.cost_basis),
+            }
+            for h in as_of(user, day).values()
+        ]
+    
+    return Response(response)
 
 
 @api_view(['POST'])
@@ -324,19 +364,21 @@ def use_referral_code(request):
         
         referrer = User.objects.get(referral_code=referral_code)
         
-        user.referred_by = referrer
-        user.balance += 100.00
-        user.save()
-        
-        referrer.balance += 50.00
-        referrer.save()
+        with transaction.atomic():
+            user.referred_by = referrer
+            user.save(update_fields=['referred_by'])
+            
+            new_balance = BalanceService.credit(
+                user, Decimal('100.00'), LedgerEntry.BONUS, reference=f'referral:{referrer.pk}'
+            )
+            BalanceService.credit(referrer, Decimal('50.00'), LedgerEntry.BONUS, reference=f'referral:{user.pk}')
         
         return Response({
             'success': True,
             'message': 'Codigo de referido aplicado exitosamente',
             'bonus_received': 100.00,
             'referrer_name': f"{referrer.first_name} {referrer.last_name}".strip(),
-            'new_balance': float(user.balance)
+            'new_balance': float(new_balance)
         })
         
     except User.DoesNotExist:
@@ -5,6 +5,7 @@ from apps.stocks.models import Stock
 from rest_framework.views import APIView
 from apps.transactions.models import Transaction
 from apps.users.permissions import IsAdmin
+from apps.common.pagination import TransactionPagination
 from .serializers import UserSerializer, StockSerializer, TransactionSerializer
 
 class AdminUserListView(generics.ListAPIView):
@@ -53,9 +54,19 @@ class AdminStockToggleActiveView(generics.UpdateAPIView):
         return Response({"message": "Toggled active status", "is_active": stock.is_active})
 
 class AdminTransactionListView(generics.ListAPIView):
-    queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [IsAdmin]
+    pagination_class = TransactionPagination
+
+    def get_queryset(self):
+        queryset = Transaction.objects.select_related("user", "stock")
+        symbol = self.request.query_params.get("symbol")
+        transaction_type = self.request.query_params.get("type")
+        if symbol:
+            queryset = queryset.filter(stock__symbol=symbol.upper())
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+        return queryset
 
 class AdminTransactionStatusView(generics.UpdateAPIView):
     queryset = Transaction.objects.all()
@@ -3,13 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, Sum, Q, F
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
 from apps.users.models import UserBalance, DepositTransaction
-from apps.portfolio.models import StockTransaction
+from apps.portfolio.models import StockTransaction, Holding
+from apps.portfolio.valuation import PortfolioValuation
+from apps.common.pagination import StockTransactionPagination
 from apps.users.serializers import UserSerializer, UserBalanceSerializer
 
 User = get_user_model()
@@ -55,9 +57,15 @@ class AdminViewSet(viewsets.ModelViewSet):
             stock_transactions__created_at__gte=last_month
         ).distinct().count()
         
+        # Valor de mercado de todos los portafolios (una búsqueda de cotizaciones)
+        investor_ids = Holding.objects.filter(shares__gt=0).values_list('user_id', flat=True).distinct()
+        valuations = PortfolioValuation.value_users(investor_ids)
+        assets_value = sum((v['market_value'] for v in valuations.values()), Decimal('0'))
+        
         return Response({
             'total_users': total_users,
             'total_volume': float(total_volume),
+            'assets_under_management': float(assets_value),
             'transactions_today': transactions_today,
             'active_users': active_users,
             'new_users_this_month': active_users_month,
@@ -125,10 +133,10 @@ class AdminViewSet(viewsets.ModelViewSet):
         """Obtiene lista de usuarios con su información"""
         users = User.objects.filter(status='active').annotate(
             trades_count=Count('stock_transactions'),
-            balance=Sum('user_balance__balance')
+            cash=F('balance__available_balance')
         ).values(
             'id', 'email', 'first_name', 'last_name', 'status',
-            'created_at', 'trades_count', 'balance'
+            'created_at', 'trades_count', 'cash'
         )
         
         # Mapear datos
@@ -138,7 +146,7 @@ class AdminViewSet(viewsets.ModelViewSet):
                 'id': str(user['id']),
                 'name': f"{user['first_name']} {user['last_name']}".strip() or user['email'].split('@')[0],
                 'email': user['email'],
-                'balance': float(user['balance'] or 0),
+                'balance': float(user['cash'] or 0),
                 'trades': user['trades_count'],
                 'status': user['status'],
             })
@@ -199,10 +207,23 @@ class AdminViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def transactions_detailed(self, request):
-        """Obtiene lista detallada de todas las transacciones"""
+        """
+        Obtiene lista detallada de las transacciones completadas, de a 50.
+        La respuesta sigue siendo una lista; la página siguiente va en la
+        cabecera Link (?cursor=...). Acepta ?symbol= y ?type=.
+        """
         transactions = StockTransaction.objects.filter(
             status='completed'
-        ).select_related('user').order_by('-created_at')[:50]
+        ).select_related('user')
+        symbol = request.query_params.get('symbol')
+        transaction_type = request.query_params.get('type')
+        if symbol:
+            transactions = transactions.filter(symbol=symbol.upper())
+        if transaction_type:
+            transactions = transactions.filter(transaction_type=transaction_type)
+
+        paginator = StockTransactionPagination(page_size=50)
+        transactions = paginator.paginate_queryset(transactions, request, view=self)
         
         data = []
         for tx in transactions:
@@ -221,7 +242,7 @@ class AdminViewSet(viewsets.ModelViewSet):
                 'status': tx.status,
             })
         
-        return Response(data)
+        return Response(data, headers=paginator.get_link_header())
     
     @action(detail=False, methods=['get'])
     def today_revenue(self, request):
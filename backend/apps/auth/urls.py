@@ -1,3 +1,12 @@
+from django.conf import settings
 from django.urls import path
 
 urlpatterns = []
+
+if settings.DEBUG:
+    from .views import FakeAuth0RevokeView
+
+    # Revoke falso de Auth0 para desarrollo y pruebas (AUTH0_REVOKE_URL)
+    urlpatterns += [
+        path('fake-auth0/oauth/revoke', FakeAuth0RevokeView.as_view(), name='fake-auth0-revoke'),
+    ]
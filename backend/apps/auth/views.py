@@ -0,0 +1,46 @@
+import threading
+import time
+
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class FakeAuth0RevokeView(APIView):
+    """
+    Imitación local de POST /oauth/revoke de Auth0, solo con DEBUG.
+
+    Apuntando AUTH0_REVOKE_URL aquí se prueba la revocación en segundo plano
+    sin Auth0. Los parámetros ?delay=<segundos> y ?status=<código> simulan un
+    Auth0 lento o con errores. GET devuelve los tokens revocados hasta ahora.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    revoked = []
+    _lock = threading.Lock()
+
+    def get(self, request):
+        with self._lock:
+            return Response({'count': len(self.revoked), 'tokens': list(self.revoked)})
+
+    def post(self, request):
+        delay = min(float(request.query_params.get('delay', 0)), 30)
+        if delay > 0:
+            time.sleep(delay)
+
+        code = int(request.query_params.get('status', status.HTTP_200_OK))
+        if code != status.HTTP_200_OK:
+            return Response({'error': 'fake_error', 'error_description': 'Error simulado'}, status=code)
+
+        token = request.data.get('token')
+        if not token or not request.data.get('client_id'):
+            return Response(
+                {'error': 'invalid_request', 'error_description': 'Faltan token o client_id'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with self._lock:
+            self.revoked.append(token)
+        return Response(status=status.HTTP_200_OK)
@@ -0,0 +1,125 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre (campo de fecha, id), ambos descendentes.
+
+    En lugar de OFFSET, cada página continúa "después de" la última fila de la
+    anterior: WHERE (fecha, id) < (fecha_cursor, id_cursor). Con un índice que
+    empiece por los filtros de la vista y siga con la fecha, la página 500
+    cuesta lo mismo que la primera. El id desempata filas con la misma fecha
+    (UUID o entero), así ninguna se repite ni se salta entre páginas.
+
+    El cursor es opaco para el cliente: base64 de la fecha e id de la última fila.
+    """
+
+    ordering_field = 'created_at'
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def __init__(self, ordering_field=None, page_size=None):
+        if ordering_field:
+            self.ordering_field = ordering_field
+        if page_size:
+            self.page_size = page_size
+
+    def encode_cursor(self, instance):
+        position = {
+            't': getattr(instance, self.ordering_field).isoformat(),
+            'id': str(instance.pk),
+        }
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            timestamp = parse_datetime(position['t'])
+            pk = position['id']
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+        return timestamp, pk
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = self.ordering_field
+
+        queryset = queryset.order_by(f'-{field}', '-pk')
+        position = self.decode_cursor(request)
+        if position:
+            timestamp, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'pk__lt': pk})
+            )
+
+        # Una fila extra para saber si hay página siguiente sin contar la tabla
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_link_header(self):
+        """Cabecera Link con la página siguiente, para respuestas que son una lista"""
+        next_link = self.get_next_link()
+        return {'Link': f'<{next_link}>; rel="next"'} if next_link else {}
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('page_size', self.page_size),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class StockTransactionPagination(KeysetPagination):
+    """Historial de StockTransaction (portafolio), más reciente primero"""
+
+    ordering_field = 'created_at'
+
+
+class TransactionPagination(KeysetPagination):
+    """Historial de Transaction (app transactions), más reciente primero"""
+
+    ordering_field = 'timestamp'
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework import permissions, status
 from django.db.models import Sum, Count
 from apps.users.models import Profile
+from apps.users.balance import BalanceService
 from apps.stocks.models import Stock
 from apps.transactions.models import Transaction
 from apps.transactions.serializers import TransactionSerializer
@@ -26,7 +27,7 @@ class DashboardStatsView(APIView):
             "total_stocks": total_stocks,
             "total_users": total_users,
             "total_transactions": total_transactions,
-            "user_balance": float(user.balance),
+            "user_balance": float(BalanceService.get_available(user)),
             "total_invested": float(total_invested),
             "user_name": f"{user.first_name} {user.last_name}".strip() or user.username,
         })
@@ -0,0 +1,128 @@
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Holding, StockTransaction
+from .serializers import StockTransactionCreateSerializer
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal('0.01')
+
+
+def max_orders():
+    return getattr(settings, 'PORTFOLIO_BATCH', {}).get('MAX_ORDERS', 100)
+
+
+def submit_orders(user, orders):
+    """
+    Registra varias operaciones del usuario en una sola transacción.
+
+    Valida todas las órdenes en una pasada, en el orden recibido, contra el
+    saldo disponible y las posiciones (bloqueados con select_for_update), y
+    las acumula: una compra descuenta saldo para las siguientes y una venta
+    solo puede usar las acciones que queden. Las válidas se insertan con
+    bulk_create y las posiciones se actualizan con una escritura por tabla,
+    en lugar de un commit y un record_fill por orden. Las órdenes rechazadas
+    no afectan a las demás.
+
+    Returns:
+        list: un resultado por orden, {'index', 'success', 'transaction' | 'errors'}
+    """
+    from apps.users.models import UserBalance
+
+    results = [None] * len(orders)
+    parsed = []
+    for index, order in enumerate(orders):
+        serializer = StockTransactionCreateSerializer(data=order)
+        if serializer.is_valid():
+            parsed.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'success': False, 'errors': serializer.errors}
+
+    with transaction.atomic():
+        balance = UserBalance.objects.select_for_update().filter(user=user).first()
+        cash = balance.available_balance if balance else Decimal('0')
+
+        symbols = {data['symbol'].upper() for _, data in parsed}
+        # select_for_update no bloquea filas que aún no existen: se insertan
+        # vacías antes de bloquear (como record_fill) para que una operación
+        # suelta concurrente del mismo símbolo no choque con el lote
+        bought = {
+            data['symbol'].upper(): data['name']
+            for _, data in parsed if data['transaction_type'] == 'buy'
+        }
+        before = set(Holding.objects.filter(user=user, symbol__in=bought).values_list('symbol', flat=True))
+        Holding.objects.bulk_create(
+            [Holding(user=user, symbol=symbol, name=name) for symbol, name in bought.items() if symbol not in before],
+            ignore_conflicts=True,
+        )
+        holdings = {
+            h.symbol: h
+            for h in Holding.objects.select_for_update().filter(user=user, symbol__in=symbols)
+        }
+
+        accepted = []
+        for index, data in parsed:
+            symbol = data['symbol'].upper()
+            shares = data['shares']
+            total = (shares * data['price_per_share']).quantize(CENTS)
+            holding = holdings.get(symbol)
+
+            if shares <= 0 or data['price_per_share'] <= 0:
+                error = 'La cantidad y el precio deben ser mayores a cero'
+            elif data['transaction_type'] == 'buy' and total > cash:
+                error = f'Saldo insuficiente: disponible {cash}, requerido {total}'
+            elif data['transaction_type'] == 'sell' and (holding is None or holding.shares < shares):
+                error = f'Acciones insuficientes de {symbol}: disponibles {holding.shares if holding else 0}'
+            else:
+                error = None
+
+            if error:
+                results[index] = {'index': index, 'success': False, 'errors': {'non_field_errors': [error]}}
+                continue
+
+            holding.apply(data['transaction_type'], shares, total)
+            holding.name = data['name'] or holding.name
+            cash += total if data['transaction_type'] == 'sell' else -total
+
+            accepted.append((index, StockTransaction(
+                user=user,
+                symbol=symbol,
+                name=data['name'],
+                transaction_type=data['transaction_type'],
+                shares=shares,
+                price_per_share=data['price_per_share'],
+                total=total,
+                status='completed',
+            )))
+
+        touched = {tx.symbol for _, tx in accepted}
+        if accepted:
+            StockTransaction.objects.bulk_create([tx for _, tx in accepted])
+            now = timezone.now()
+            for symbol in touched:
+                # bulk_update no aplica auto_now
+                holdings[symbol].updated_at = now
+            Holding.objects.bulk_update(
+                [holdings[symbol] for symbol in touched],
+                ['name', 'shares', 'cost_basis', 'realized_pnl', 'updated_at'],
+            )
+
+        # Filas vacías que se insertaron para compras que al final se rechazaron
+        Holding.objects.filter(
+            user=user,
+            symbol__in=[s for s in bought if s not in before and s not in touched],
+            shares=0,
+            cost_basis=0,
+            realized_pnl=0,
+        ).delete()
+
+    for index, tx in accepted:
+        results[index] = {'index': index, 'success': True, 'transaction': tx}
+
+    logger.info(f"Lote de {len(orders)} órdenes de {user.pk}: {len(accepted)} registradas")
+    return results
@@ -0,0 +1,140 @@
+import logging
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Holding, HoldingCheckpoint, StockTransaction
+
+logger = logging.getLogger(__name__)
+
+
+def _config():
+    return getattr(settings, 'PORTFOLIO_CHECKPOINTS', {})
+
+
+def end_of_day(day):
+    """Último instante de day en la zona horaria del proyecto"""
+    return timezone.make_aware(datetime.combine(day, time.max))
+
+
+def _load(checkpoint, user_id):
+    holdings = {}
+    for p in checkpoint.positions:
+        holdings[p['symbol']] = Holding(
+            user_id=user_id,
+            symbol=p['symbol'],
+            name=p['name'],
+            shares=Decimal(p['shares']),
+            cost_basis=Decimal(p['cost_basis']),
+            realized_pnl=Decimal(p['realized_pnl']),
+        )
+    return holdings
+
+
+def _dump(holdings):
+    return [
+        {
+            'symbol': h.symbol,
+            'name': h.name,
+            'shares': str(h.shares),
+            'cost_basis': str(h.cost_basis),
+            'realized_pnl': str(h.realized_pnl),
+        }
+        for h in sorted(holdings.values(), key=lambda h: h.symbol)
+    ]
+
+
+def _replay_from_checkpoint(user_id, timestamp):
+    """
+    Posiciones a timestamp partiendo del checkpoint más cercano anterior.
+
+    Returns:
+        tuple: (dict {símbolo: Holding sin guardar}, operaciones reproducidas)
+    """
+    checkpoint = (
+        HoldingCheckpoint.objects.filter(user_id=user_id, taken_at__lte=timestamp)
+        .order_by('-taken_at')
+        .first()
+    )
+    transactions = StockTransaction.objects.filter(
+        user_id=user_id, status='completed', created_at__lte=timestamp
+    )
+    holdings = {}
+    if checkpoint is not None:
+        holdings = _load(checkpoint, user_id)
+        transactions = transactions.filter(created_at__gt=checkpoint.taken_at)
+
+    applied = 0
+
+    def counted(rows):
+        nonlocal applied
+        for row in rows:
+            applied += 1
+            yield row
+
+    holdings = Holding.replay(
+        user_id,
+        counted(transactions.order_by('created_at', 'id').only(
+            'symbol', 'name', 'transaction_type', 'shares', 'total', 'created_at'
+        ).iterator()),
+        holdings,
+    )
+    return holdings, applied
+
+
+def as_of(user, timestamp):
+    """
+    Posiciones del usuario en un instante pasado (datetime o date, que se toma
+    al cierre del día). Solo se reproducen las operaciones posteriores al
+    checkpoint más cercano, así el costo no depende de la antigüedad de la cuenta.
+
+    Returns:
+        dict: {símbolo: Holding sin guardar}, solo posiciones con acciones
+    """
+    if not isinstance(timestamp, datetime):
+        timestamp = end_of_day(timestamp)
+    user_id = getattr(user, 'pk', user)
+    holdings, _ = _replay_from_checkpoint(user_id, timestamp)
+    return {symbol: h for symbol, h in holdings.items() if h.shares > 0}
+
+
+def take_checkpoint(user_id, timestamp=None):
+    """
+    Guarda las posiciones del usuario a timestamp (por defecto ahora) si desde
+    el checkpoint anterior hubo al menos MIN_TRANSACTIONS operaciones.
+
+    Returns:
+        HoldingCheckpoint o None si no hacía falta
+    """
+    timestamp = timestamp or timezone.now()
+    holdings, applied = _replay_from_checkpoint(user_id, timestamp)
+    if applied < _config().get('MIN_TRANSACTIONS', 50):
+        return None
+
+    return HoldingCheckpoint.objects.create(
+        user_id=user_id,
+        taken_at=timestamp,
+        positions=_dump(holdings),
+        transactions_applied=applied,
+    )
+
+
+def checkpoint_users(timestamp=None):
+    """Crea checkpoints para los usuarios con suficientes operaciones nuevas"""
+    timestamp = timestamp or timezone.now()
+    user_ids = (
+        StockTransaction.objects.filter(status='completed', created_at__lte=timestamp)
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    created = 0
+    for user_id in user_ids:
+        try:
+            if take_checkpoint(user_id, timestamp):
+                created += 1
+        except Exception as e:
+            logger.error(f"Error creando checkpoint de holdings para {user_id}: {str(e)}")
+    logger.info(f"Checkpoints de holdings creados: {created}")
+    return created
@@ -0,0 +1,86 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.portfolio.batch import submit_orders
+from apps.portfolio.models import StockTransaction
+from apps.users.balance import BalanceService
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara registrar N operaciones una por una contra el lote "
+        "(apps.portfolio.batch). Cada corrida usa un usuario temporal que al "
+        "terminar queda dado de baja (el libro mayor no se borra)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=30, help="Órdenes por corrida")
+        parser.add_argument('--rounds', type=int, default=5, help="Corridas por método")
+
+    def _orders(self, count):
+        # Rebalanceo típico: compras en distintos símbolos
+        return [
+            {
+                'symbol': f'BENCH{i}',
+                'name': f'Bench {i}',
+                'transaction_type': 'buy',
+                'shares': '3',
+                'price_per_share': '101.25',
+            }
+            for i in range(count)
+        ]
+
+    def _run(self, method, orders):
+        """Ejecuta method con un usuario temporal; devuelve segundos"""
+        User = get_user_model()
+        suffix = uuid.uuid4().hex[:12]
+        user = User.objects.create(username=f'bench-{suffix}', email=f'bench-{suffix}@example.com')
+        try:
+            # El UserBalance ya lo creó la señal post_save; el depósito pasa por el libro mayor
+            BalanceService.deposit(user, Decimal('10000000'), reference='bench_trades')
+
+            # Sin transacción exterior: cada commit de method es un commit real
+            started = time.perf_counter()
+            method(user, orders)
+            return time.perf_counter() - started
+        finally:
+            user.remove()
+
+    @staticmethod
+    def _single(user, orders):
+        # Lo que hace el cliente hoy: una petición (y un commit) por orden
+        for order in orders:
+            with transaction.atomic():
+                StockTransaction.objects.create(
+                    user=user,
+                    symbol=order['symbol'],
+                    name=order['name'],
+                    transaction_type=order['transaction_type'],
+                    shares=Decimal(order['shares']),
+                    price_per_share=Decimal(order['price_per_share']),
+                )
+
+    def handle(self, *args, **options):
+        orders = self._orders(options['orders'])
+        rounds = options['rounds']
+
+        timings = {
+            'una por una': [self._run(self._single, orders) for _ in range(rounds)],
+            'lote': [self._run(submit_orders, orders) for _ in range(rounds)],
+        }
+
+        for label, values in timings.items():
+            best = min(values) * 1000
+            average = sum(values) / len(values) * 1000
+            self.stdout.write(
+                f"{label:>12}: mejor {best:8.2f} ms, promedio {average:8.2f} ms "
+                f"({len(orders)} órdenes, {rounds} corridas)"
+            )
+
+        speedup = min(timings['una por una']) / max(min(timings['lote']), 1e-9)
+        self.stdout.write(self.style.SUCCESS(f"El lote es {speedup:.1f}x más rápido"))
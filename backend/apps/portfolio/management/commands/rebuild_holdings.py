@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from apps.portfolio.models import Holding, StockTransaction
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la tabla holdings reproduciendo las operaciones completadas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="ID de un usuario; por defecto todos")
+        parser.add_argument('--symbol', help="Reconstruir solo este símbolo")
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user_ids = [options['user']]
+        else:
+            user_ids = (
+                StockTransaction.objects.filter(status='completed')
+                .values_list('user_id', flat=True)
+                .distinct()
+            )
+
+        symbol = options['symbol'].upper() if options['symbol'] else None
+        users = positions = 0
+        for user_id in user_ids:
+            holdings = Holding.rebuild(user_id, symbol)
+            users += 1
+            positions += len(holdings)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Holdings reconstruidos: {positions} posiciones de {users} usuarios"
+        ))
@@ -0,0 +1,87 @@
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _apply(position, transaction_type, shares, total):
+    """
+    Copia de Holding.apply al momento de esta migración: las migraciones no
+    deben depender del código actual de los modelos.
+    """
+    if transaction_type == 'buy':
+        position['shares'] += shares
+        position['cost_basis'] += total
+        return
+
+    sold = min(shares, position['shares'])
+    if sold <= 0:
+        return
+    cost_removed = (position['cost_basis'] * sold / position['shares']).quantize(Decimal('0.0001'))
+    proceeds = total * sold / shares
+    position['realized_pnl'] += (proceeds - cost_removed).quantize(Decimal('0.0001'))
+    position['shares'] -= sold
+    position['cost_basis'] -= cost_removed
+    if position['shares'] == 0:
+        position['cost_basis'] = Decimal('0')
+
+
+def populate_holdings(apps, schema_editor):
+    """Llena la tabla holdings reproduciendo el historial de operaciones completadas"""
+    StockTransaction = apps.get_model('portfolio', 'StockTransaction')
+    Holding = apps.get_model('portfolio', 'Holding')
+
+    user_ids = StockTransaction.objects.filter(status='completed').values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        transactions = StockTransaction.objects.filter(
+            user_id=user_id, status='completed'
+        ).order_by('created_at', 'id').values_list('symbol', 'name', 'transaction_type', 'shares', 'total')
+
+        positions = {}
+        for symbol, name, transaction_type, shares, total in transactions.iterator():
+            position = positions.setdefault(symbol, {
+                'name': name,
+                'shares': Decimal('0'),
+                'cost_basis': Decimal('0'),
+                'realized_pnl': Decimal('0'),
+            })
+            _apply(position, transaction_type, Decimal(shares), Decimal(total))
+            position['name'] = name or position['name']
+
+        Holding.objects.bulk_create([
+            Holding(user_id=user_id, symbol=symbol, **position)
+            for symbol, position in positions.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('shares', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=15)),
+                ('cost_basis', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=18)),
+                ('realized_pnl', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holdings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'holdings',
+                'ordering': ['symbol'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='holding',
+            constraint=models.UniqueConstraint(fields=('user', 'symbol'), name='holding_user_symbol_uniq'),
+        ),
+        migrations.RunPython(populate_holdings, migrations.RunPython.noop),
+    ]
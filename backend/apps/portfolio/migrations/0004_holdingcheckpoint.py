@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0003_portfoliosnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HoldingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('positions', models.JSONField(default=list)),
+                ('transactions_applied', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holding_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'holding_checkpoints',
+                'ordering': ['user', '-taken_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='holdingcheckpoint',
+            index=models.Index(fields=['user', '-taken_at'], name='holding_ckpt_user_taken_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0004_holdingcheckpoint'),
+    ]
+
+    operations = [
+        # (user, symbol) y (user, transaction_type) quedan cubiertos por los nuevos
+        migrations.RemoveIndex(
+            model_name='stocktransaction',
+            name='stock_trans_user_id_940cd6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='stocktransaction',
+            name='stock_trans_user_id_6e92f6_idx',
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['user', 'symbol', '-created_at'], name='stock_tx_user_symbol_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['user', 'transaction_type', '-created_at'], name='stock_tx_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['status', '-created_at'], name='stock_tx_status_created_idx'),
+        ),
+    ]
@@ -1,5 +1,5 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from decimal import Decimal
@@ -38,19 +38,229 @@ class StockTransaction(models.Model):
         db_table = 'stock_transactions'
         indexes = [
             models.Index(fields=['user', '-created_at']),
-            models.Index(fields=['user', 'symbol']),
-            models.Index(fields=['user', 'transaction_type']),
+            # Listados filtrados paginados por cursor (ver apps.common.pagination)
+            models.Index(fields=['user', 'symbol', '-created_at'], name='stock_tx_user_symbol_idx'),
+            models.Index(fields=['user', 'transaction_type', '-created_at'], name='stock_tx_user_type_idx'),
+            models.Index(fields=['status', '-created_at'], name='stock_tx_status_created_idx'),
         ]
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.user.email} - {self.transaction_type.upper()} {self.shares} {self.symbol} @ ${self.price_per_share}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado con el que se cargó, para detectar cuándo se completa
+        instance._original_status = instance.__dict__.get('status')
+        return instance
+    
     def save(self, *args, **kwargs):
-        """Calcula automáticamente el total antes de guardar"""
+        """
+        Calcula automáticamente el total antes de guardar y, en la misma
+        transacción de base de datos, actualiza el Holding del símbolo cuando
+        la operación pasa a completada (o deja de estarlo).
+        """
         if not self.total:
             self.total = self.shares * self.price_per_share
-        super().save(*args, **kwargs)
+        
+        original_status = getattr(self, '_original_status', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.status == 'completed' and original_status != 'completed':
+                Holding.record_fill(self)
+                HoldingCheckpoint.invalidate(self.user_id, self.created_at)
+            elif original_status == 'completed' and self.status != 'completed':
+                Holding.rebuild(self.user_id, self.symbol)
+                HoldingCheckpoint.invalidate(self.user_id, self.created_at)
+        self._original_status = self.status
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if self.status == 'completed':
+                Holding.rebuild(self.user_id, self.symbol)
+                HoldingCheckpoint.invalidate(self.user_id, self.created_at)
+        return result
+
+
+class Holding(models.Model):
+    """
+    Posición materializada de un usuario en un símbolo (costo promedio).
+    Se actualiza al completarse cada StockTransaction, así el portafolio se
+    lee con una sola consulta en lugar de recorrer todo el historial.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holdings')
+    symbol = models.CharField(max_length=10)
+    name = models.CharField(max_length=255)
+    shares = models.DecimalField(max_digits=15, decimal_places=4, default=Decimal('0'))
+    # Costo de las acciones que quedan en cartera
+    cost_basis = models.DecimalField(max_digits=18, decimal_places=4, default=Decimal('0'))
+    # Ganancia o pérdida de las ventas, contra el costo promedio
+    realized_pnl = models.DecimalField(max_digits=18, decimal_places=4, default=Decimal('0'))
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'holdings'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'symbol'], name='holding_user_symbol_uniq'),
+        ]
+        ordering = ['symbol']
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.shares} {self.symbol}"
+    
+    @property
+    def average_price(self) -> Decimal:
+        if self.shares > 0:
+            return self.cost_basis / self.shares
+        return Decimal('0')
+    
+    def apply(self, transaction_type, shares, total):
+        """
+        Aplica una operación completada a la posición (sin guardar).
+        Las ventas descuentan el costo promedio de las acciones vendidas y la
+        diferencia con lo cobrado va a realized_pnl.
+        """
+        if transaction_type == 'buy':
+            self.shares += shares
+            self.cost_basis += total
+            return
+        
+        sold = min(shares, self.shares)
+        if sold <= 0:
+            return
+        cost_removed = (self.cost_basis * sold / self.shares).quantize(Decimal('0.0001'))
+        proceeds = total * sold / shares
+        self.realized_pnl += (proceeds - cost_removed).quantize(Decimal('0.0001'))
+        self.shares -= sold
+        self.cost_basis -= cost_removed
+        if self.shares == 0:
+            self.cost_basis = Decimal('0')
+    
+    @classmethod
+    def record_fill(cls, stock_transaction):
+        """Suma una operación completada al Holding del símbolo, con bloqueo de fila"""
+        with transaction.atomic():
+            cls.objects.get_or_create(
+                user_id=stock_transaction.user_id,
+                symbol=stock_transaction.symbol,
+                defaults={'name': stock_transaction.name},
+            )
+            holding = cls.objects.select_for_update().get(
+                user_id=stock_transaction.user_id,
+                symbol=stock_transaction.symbol,
+            )
+            holding.apply(
+                stock_transaction.transaction_type,
+                Decimal(stock_transaction.shares),
+                Decimal(stock_transaction.total),
+            )
+            holding.name = stock_transaction.name or holding.name
+            holding.save()
+        return holding
+    
+    @classmethod
+    def replay(cls, user_id, transactions, holdings=None):
+        """
+        Recalcula posiciones a partir de operaciones completadas ordenadas por fecha,
+        partiendo de holdings (p. ej. un checkpoint) o de cero.
+        
+        Returns:
+            dict: {símbolo: Holding sin guardar}
+        """
+        holdings = holdings if holdings is not None else {}
+        for tx in transactions:
+            holding = holdings.get(tx.symbol)
+            if holding is None:
+                holding = holdings[tx.symbol] = cls(user_id=user_id, symbol=tx.symbol, name=tx.name)
+            holding.apply(tx.transaction_type, tx.shares, tx.total)
+            holding.name = tx.name or holding.name
+        return holdings
+    
+    @classmethod
+    def rebuild(cls, user_id, symbol=None):
+        """Reconstruye las posiciones de un usuario (o de un símbolo) desde su historial"""
+        transactions = StockTransaction.objects.filter(user_id=user_id, status='completed')
+        existing = cls.objects.filter(user_id=user_id)
+        if symbol:
+            transactions = transactions.filter(symbol=symbol)
+            existing = existing.filter(symbol=symbol)
+        
+        holdings = cls.replay(
+            user_id,
+            transactions.order_by('created_at', 'id').only(
+                'symbol', 'name', 'transaction_type', 'shares', 'total'
+            ).iterator(),
+        )
+        with transaction.atomic():
+            existing.delete()
+            cls.objects.bulk_create(holdings.values())
+        return holdings
+
+
+class HoldingCheckpoint(models.Model):
+    """
+    Posiciones de un usuario en un instante, con todas las operaciones
+    completadas hasta taken_at ya aplicadas. as_of() parte del checkpoint
+    más cercano y solo reproduce las operaciones posteriores.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holding_checkpoints')
+    taken_at = models.DateTimeField()
+    # [{'symbol', 'name', 'shares', 'cost_basis', 'realized_pnl'}] con decimales como texto
+    positions = models.JSONField(default=list)
+    # Operaciones aplicadas desde el checkpoint anterior
+    transactions_applied = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'holding_checkpoints'
+        ordering = ['user', '-taken_at']
+        indexes = [
+            models.Index(fields=['user', '-taken_at'], name='holding_ckpt_user_taken_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} @ {self.taken_at.isoformat()}"
+    
+    @classmethod
+    def invalidate(cls, user_id, since):
+        """
+        Borra los checkpoints que ya no son válidos porque cambió una operación
+        anterior a ellos (p. ej. una pendiente que se completó después)
+        """
+        if since is not None:
+            cls.objects.filter(user_id=user_id, taken_at__gte=since).delete()
+
+
+class PortfolioSnapshot(models.Model):
+    """
+    Valor del portafolio de un usuario al cierre de un día.
+    Lo guarda la tarea nocturna snapshot_portfolios; es la serie que usan las
+    gráficas de rendimiento.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='portfolio_snapshots')
+    date = models.DateField()
+    # Valor de mercado de las posiciones
+    market_value = models.DecimalField(max_digits=18, decimal_places=2)
+    # Saldo disponible
+    cash = models.DecimalField(max_digits=18, decimal_places=2)
+    # Inversión neta (compras - ventas)
+    invested = models.DecimalField(max_digits=18, decimal_places=2)
+    
+    class Meta:
+        db_table = 'portfolio_snapshots'
+        ordering = ['user', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='portfolio_snapshot_user_date_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.date} {self.total_value}"
+    
+    @property
+    def total_value(self) -> Decimal:
+        return self.market_value + self.cash
 
 
 class Portfolio(models.Model):
@@ -66,62 +276,83 @@ class Portfolio(models.Model):
     def __str__(self):
         return f"Portfolio de {self.user.email}"
     
+    def get_valuation(self) -> dict:
+        """Valuación a precio de mercado de las posiciones (memorizada en la instancia)"""
+        if getattr(self, '_valuation', None) is None:
+            from .valuation import PortfolioValuation
+            
+            self._valuation = PortfolioValuation.value_user(self.user_id)
+        return self._valuation
+    
+    def get_summary(self) -> dict:
+        """
+        Totales del portafolio en una sola consulta agregada sobre holdings,
+        con el valor actual a precio de mercado (ver PortfolioValuation).
+        Se memoriza en la instancia, así que el serializer, dashboard_stats y
+        los reportes comparten el mismo cálculo durante la petición.
+        """
+        if getattr(self, '_summary', None) is None:
+            totals = Holding.objects.filter(user_id=self.user_id).aggregate(
+                cost_basis=models.Sum('cost_basis'),
+                realized_pnl=models.Sum('realized_pnl'),
+                total_shares=models.Sum('shares', filter=models.Q(shares__gt=0)),
+                positions=models.Count('id', filter=models.Q(shares__gt=0)),
+            )
+            cost_basis = totals['cost_basis'] or Decimal('0')
+            realized_pnl = totals['realized_pnl'] or Decimal('0')
+            
+            # Compras - ventas = costo de lo que queda en cartera - ganancia ya realizada
+            total_invested = cost_basis - realized_pnl
+            valuation = self.get_valuation()
+            current_value = valuation['market_value']
+            total_gains = current_value - total_invested
+            gains_percentage = Decimal('0')
+            if total_invested > 0:
+                gains_percentage = (total_gains / total_invested) * 100
+            
+            self._summary = {
+                'total_invested': total_invested,
+                'cost_basis': cost_basis,
+                'realized_pnl': realized_pnl,
+                'unrealized_pnl': valuation['unrealized_pnl'],
+                'current_value': current_value,
+                'total_gains': total_gains,
+                'gains_percentage': gains_percentage,
+                'day_change': valuation['day_change'],
+                'day_change_percent': valuation['day_change_percent'],
+                'total_shares': totals['total_shares'] or Decimal('0'),
+                'positions': totals['positions'],
+            }
+        return self._summary
+    
+    def invalidate_summary(self):
+        """Descarta los totales memorizados (p. ej. después de operar en la misma petición)"""
+        self._summary = None
+        self._valuation = None
+    
     def get_total_invested(self) -> Decimal:
         """Calcula la inversión total (compras - ventas)"""
-        transactions = self.user.stock_transactions.filter(status='completed')
-        total = Decimal('0')
-        for transaction in transactions:
-            if transaction.transaction_type == 'buy':
-                total += transaction.total
-            else:  # sell
-                total -= transaction.total
-        return total
+        return self.get_summary()['total_invested']
     
     def get_current_value(self) -> Decimal:
         """Calcula el valor actual del portafolio basado en el precio actual de cada acción"""
-        # Por ahora retorna la inversión total
-        # En una implementación real, traería los precios actuales de Yahoo Finance
-        return self.get_total_invested()
+        return self.get_summary()['current_value']
     
     def get_total_gains(self) -> Decimal:
         """Calcula las ganancias totales (valor actual - inversión)"""
-        return self.get_current_value() - self.get_total_invested()
+        return self.get_summary()['total_gains']
     
     def get_portfolio_holdings(self) -> dict:
-        """Retorna las acciones actuales agrupadas por símbolo"""
-        transactions = self.user.stock_transactions.filter(status='completed').order_by('symbol')
-        holdings = {}
-        
-        for transaction in transactions:
-            if transaction.symbol not in holdings:
-                holdings[transaction.symbol] = {
-                    'symbol': transaction.symbol,
-                    'name': transaction.name,
-                    'shares': Decimal('0'),
-                    'average_price': Decimal('0'),
-                    'total_invested': Decimal('0'),
-                }
-            
-            holding = holdings[transaction.symbol]
-            if transaction.transaction_type == 'buy':
-                # Actualizar promedio de precio
-                old_total = holding['total_invested']
-                new_total = old_total + transaction.total
-                old_shares = holding['shares']
-                new_shares = old_shares + transaction.shares
-                
-                if new_shares > 0:
-                    holding['average_price'] = new_total / new_shares
-                
-                holding['total_invested'] = new_total
-                holding['shares'] = new_shares
-            else:  # sell
-                holding['shares'] = max(Decimal('0'), holding['shares'] - transaction.shares)
-                # Restamos proporcionalmente la inversión
-                if holding['shares'] == 0:
-                    holding['total_invested'] = Decimal('0')
-                else:
-                    holding['total_invested'] -= transaction.total
-        
-        # Filtrar holdings sin acciones
-        return {k: v for k, v in holdings.items() if v['shares'] > 0}
+        """Retorna las acciones actuales agrupadas por símbolo (tabla holdings)"""
+        holdings = self.user.holdings.filter(shares__gt=0).order_by('symbol')
+        return {
+            h.symbol: {
+                'symbol': h.symbol,
+                'name': h.name,
+                'shares': h.shares,
+                'average_price': h.average_price,
+                'total_invested': h.cost_basis,
+                'realized_pnl': h.realized_pnl,
+            }
+            for h in holdings
+        }
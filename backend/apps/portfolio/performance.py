@@ -0,0 +1,184 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .valuation import PortfolioValuation
+
+logger = logging.getLogger(__name__)
+
+# Rangos de las gráficas: (días hacia atrás, puntos máximos)
+RANGES = {
+    '7D': (7, 7),
+    '1M': (31, 31),
+    '3M': (92, 46),
+    '1Y': (366, 52),
+    'ALL': (None, 60),
+}
+DEFAULT_RANGE = '7D'
+
+
+def parse_range(value):
+    """Normaliza ?range=; lanza ValueError si no es uno de RANGES"""
+    key = (value or DEFAULT_RANGE).upper()
+    if key not in RANGES:
+        raise ValueError(f"Rango no soportado: {value}. Usa: {', '.join(RANGES)}")
+    return key
+
+
+def downsample(points, max_points):
+    """
+    Reduce la serie a max_points tomando el último punto de cada tramo,
+    que es el valor de cierre de ese periodo. Siempre conserva el último punto.
+    """
+    if len(points) <= max_points:
+        return points
+    step = len(points) / max_points
+    return [points[min(int((i + 1) * step) - 1, len(points) - 1)] for i in range(max_points)]
+
+
+class PortfolioPerformance:
+    """Serie diaria del valor de los portafolios (tabla portfolio_snapshots)"""
+
+    # Usuarios por tanda en la tarea nocturna
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def take_snapshots(day=None):
+        """
+        Guarda el valor de cierre del día de cada usuario con posiciones o saldo.
+
+        Se calcula desde la tabla holdings (estado actual), no recorriendo el
+        historial de operaciones, así el costo no crece con la antigüedad de la
+        cuenta. Si faltan días desde la foto anterior (la tarea no corrió), se
+        rellenan repitiendo esa foto.
+
+        Returns:
+            int: número de filas escritas
+        """
+        from apps.users.models import UserBalance
+        from .models import Holding, PortfolioSnapshot
+
+        day = day or timezone.localdate()
+        user_ids = set(Holding.objects.filter(shares__gt=0).values_list('user_id', flat=True))
+        user_ids |= set(UserBalance.objects.filter(available_balance__gt=0).values_list('user_id', flat=True))
+        user_ids = sorted(user_ids)
+
+        written = 0
+        for i in range(0, len(user_ids), PortfolioPerformance.CHUNK_SIZE):
+            chunk = user_ids[i:i + PortfolioPerformance.CHUNK_SIZE]
+
+            # Una búsqueda de cotizaciones por tanda; las repetidas salen de la caché
+            valuations = PortfolioValuation.value_users(chunk)
+            invested = dict(
+                Holding.objects.filter(user_id__in=chunk)
+                .values('user_id')
+                .annotate(total=Sum(F('cost_basis') - F('realized_pnl')))
+                .values_list('user_id', 'total')
+            )
+            cash = dict(
+                UserBalance.objects.filter(user_id__in=chunk).values_list('user_id', 'available_balance')
+            )
+
+            rows = [
+                PortfolioSnapshot(
+                    user_id=user_id,
+                    date=day,
+                    market_value=valuations[user_id]['market_value'],
+                    cash=cash.get(user_id) or Decimal('0'),
+                    invested=(invested.get(user_id) or Decimal('0')).quantize(Decimal('0.01')),
+                )
+                for user_id in chunk
+            ]
+            rows += PortfolioPerformance._fill_gaps(chunk, day)
+
+            PortfolioSnapshot.objects.bulk_create(
+                rows,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['user', 'date'],
+                update_fields=['market_value', 'cash', 'invested'],
+            )
+            written += len(rows)
+
+        logger.info(f"Fotos de portafolio del {day}: {written} filas")
+        return written
+
+    @staticmethod
+    def _fill_gaps(user_ids, day):
+        """Filas para los días sin foto entre la última guardada de cada usuario y day"""
+        from .models import PortfolioSnapshot
+
+        # Última foto de cada usuario antes de day, en una sola consulta;
+        # solo interesan las que dejan al menos un día sin foto
+        last_date = (
+            PortfolioSnapshot.objects.filter(user_id=OuterRef('user_id'), date__lt=day)
+            .order_by('-date')
+            .values('date')[:1]
+        )
+        latest = {
+            snapshot.user_id: snapshot
+            for snapshot in PortfolioSnapshot.objects.filter(
+                user_id__in=user_ids,
+                date=Subquery(last_date),
+                date__lt=day - timedelta(days=1),
+            )
+        }
+
+        rows = []
+        for user_id, snapshot in latest.items():
+            gap_day = snapshot.date + timedelta(days=1)
+            while gap_day < day:
+                rows.append(PortfolioSnapshot(
+                    user_id=user_id,
+                    date=gap_day,
+                    market_value=snapshot.market_value,
+                    cash=snapshot.cash,
+                    invested=snapshot.invested,
+                ))
+                gap_day += timedelta(days=1)
+        return rows
+
+    @staticmethod
+    def get_series(user_id, range_key=DEFAULT_RANGE, live=None):
+        """
+        Serie del valor del portafolio para el rango pedido, ya reducida.
+        live es un punto opcional con el valor actual, que se agrega como
+        último punto si el día de hoy todavía no tiene foto.
+
+        Returns:
+            list: [{'date', 'value', 'market_value', 'cash', 'invested'}]
+        """
+        from .models import PortfolioSnapshot
+
+        days, max_points = RANGES[range_key]
+        today = timezone.localdate()
+        snapshots = PortfolioSnapshot.objects.filter(user_id=user_id)
+        if days:
+            snapshots = snapshots.filter(date__gt=today - timedelta(days=days))
+
+        points = [
+            {
+                'date': day.isoformat(),
+                'value': float(market_value + cash),
+                'market_value': float(market_value),
+                'cash': float(cash),
+                'invested': float(invested),
+            }
+            for day, market_value, cash, invested in snapshots.order_by('date').values_list(
+                'date', 'market_value', 'cash', 'invested'
+            )
+        ]
+
+        if live and (not points or points[-1]['date'] < today.isoformat()):
+            points.append({
+                'date': today.isoformat(),
+                'value': float(live['market_value'] + live['cash']),
+                'market_value': float(live['market_value']),
+                'cash': float(live['cash']),
+                'invested': float(live['invested']),
+            })
+
+        return downsample(points, max_points)
@@ -32,6 +32,7 @@ class PortfolioHoldingSerializer(serializers.Serializer):
     shares = serializers.DecimalField(max_digits=15, decimal_places=4)
     average_price = serializers.DecimalField(max_digits=15, decimal_places=2)
     total_invested = serializers.DecimalField(max_digits=15, decimal_places=2)
+    realized_pnl = serializers.DecimalField(max_digits=15, decimal_places=2)
 
 
 class PortfolioSerializer(serializers.ModelSerializer):
@@ -53,15 +54,15 @@ class PortfolioSerializer(serializers.ModelSerializer):
     
     def get_total_invested(self, obj):
         """Retorna la inversión total"""
-        return str(obj.get_total_invested())
+        return str(obj.get_summary()['total_invested'])
     
     def get_current_value(self, obj):
         """Retorna el valor actual"""
-        return str(obj.get_current_value())
+        return str(obj.get_summary()['current_value'])
     
     def get_total_gains(self, obj):
         """Retorna las ganancias totales"""
-        return str(obj.get_total_gains())
+        return str(obj.get_summary()['total_gains'])
 
 
 class DashboardStatsSerializer(serializers.Serializer):
@@ -0,0 +1,19 @@
+from datetime import date
+
+from celery import shared_task
+
+from .performance import PortfolioPerformance
+
+
+@shared_task(ignore_result=True)
+def snapshot_portfolios(day=None):
+    """Guarda el valor de cierre del día de cada portafolio (day en formato YYYY-MM-DD)"""
+    return PortfolioPerformance.take_snapshots(date.fromisoformat(day) if day else None)
+
+
+@shared_task(ignore_result=True)
+def checkpoint_holdings():
+    """Guarda checkpoints de posiciones para acotar las consultas as_of()"""
+    from .checkpoints import checkpoint_users
+
+    return checkpoint_users()
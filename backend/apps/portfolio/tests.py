@@ -0,0 +1,174 @@
+import threading
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.users.models import UserBalance
+
+from .batch import submit_orders
+from .models import Holding, StockTransaction
+from .serializers import StockTransactionCreateSerializer
+
+User = get_user_model()
+
+
+def _order(symbol, transaction_type, shares, price):
+    return {
+        'symbol': symbol,
+        'name': f'{symbol} Inc.',
+        'transaction_type': transaction_type,
+        'shares': str(shares),
+        'price_per_share': str(price),
+    }
+
+
+def _user(username, cash):
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password='x')
+    UserBalance.objects.filter(user=user).update(available_balance=Decimal(cash))
+    return user
+
+
+class SubmitOrdersTests(TestCase):
+    """Reglas de aceptación por orden del lote"""
+
+    def setUp(self):
+        self.user = _user('trader', '1000.00')
+
+    def test_buys_consume_cash_in_order(self):
+        results = submit_orders(self.user, [
+            _order('AAPL', 'buy', 3, '200.00'),
+            _order('MSFT', 'buy', 2, '250.00'),
+            _order('NVDA', 'buy', 1, '300.00'),
+        ])
+
+        self.assertEqual([r['success'] for r in results], [True, False, True])
+        self.assertIn('Saldo insuficiente', results[1]['errors']['non_field_errors'][0])
+        self.assertEqual(StockTransaction.objects.filter(user=self.user).count(), 2)
+
+    def test_sell_proceeds_fund_later_buys(self):
+        Holding.objects.create(user=self.user, symbol='AAPL', name='AAPL Inc.', shares=5, cost_basis=500)
+
+        results = submit_orders(self.user, [
+            _order('MSFT', 'buy', 4, '300.00'),
+            _order('AAPL', 'sell', 5, '100.00'),
+            _order('MSFT', 'buy', 4, '300.00'),
+        ])
+
+        self.assertEqual([r['success'] for r in results], [False, True, True])
+
+    def test_sells_limited_to_remaining_shares(self):
+        results = submit_orders(self.user, [
+            _order('AAPL', 'buy', 2, '100.00'),
+            _order('AAPL', 'sell', 1, '110.00'),
+            _order('AAPL', 'sell', 2, '110.00'),
+            _order('TSLA', 'sell', 1, '100.00'),
+        ])
+
+        self.assertEqual([r['success'] for r in results], [True, True, False, False])
+        holding = Holding.objects.get(user=self.user, symbol='AAPL')
+        self.assertEqual(holding.shares, Decimal('1'))
+        self.assertEqual(holding.cost_basis, Decimal('100'))
+        self.assertEqual(holding.realized_pnl, Decimal('10'))
+
+    def test_invalid_orders_do_not_block_the_rest(self):
+        results = submit_orders(self.user, [
+            {'symbol': 'AAPL'},
+            _order('AAPL', 'buy', 0, '100.00'),
+            _order('AAPL', 'buy', 1, '100.00'),
+        ])
+
+        self.assertEqual([r['success'] for r in results], [False, False, True])
+        self.assertIn('transaction_type', results[0]['errors'])
+
+    def test_rejected_buy_leaves_no_empty_holding(self):
+        results = submit_orders(self.user, [_order('AMZN', 'buy', 100, '500.00')])
+
+        self.assertFalse(results[0]['success'])
+        self.assertFalse(Holding.objects.filter(user=self.user, symbol='AMZN').exists())
+
+    def test_holdings_match_a_rebuild(self):
+        submit_orders(self.user, [
+            _order('AAPL', 'buy', 2, '100.00'),
+            _order('MSFT', 'buy', 1, '300.00'),
+            _order('AAPL', 'sell', 1, '150.00'),
+        ])
+        batched = {h.symbol: (h.shares, h.cost_basis, h.realized_pnl) for h in Holding.objects.filter(user=self.user)}
+
+        rebuilt = Holding.rebuild(self.user.pk)
+        self.assertEqual(batched, {s: (h.shares, h.cost_basis, h.realized_pnl) for s, h in rebuilt.items()})
+
+    def test_batch_uses_fewer_queries_than_single_creates(self):
+        orders = [_order(f'S{i}', 'buy', 1, '10.00') for i in range(10)]
+
+        with CaptureQueriesContext(connection) as single:
+            for order in orders:
+                serializer = StockTransactionCreateSerializer(data=order)
+                serializer.is_valid(raise_exception=True)
+                serializer.save(user=self.user)
+        other = _user('other', '1000.00')
+        with CaptureQueriesContext(connection) as batched:
+            submit_orders(other, orders)
+
+        self.assertLess(len(batched), len(single) / 3)
+
+
+class BatchEndpointTests(TestCase):
+
+    def setUp(self):
+        self.user = _user('api-trader', '100.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_partial_batch(self):
+        response = self.client.post('/api/portfolio/transactions/batch/', {
+            'orders': [_order('AAPL', 'buy', 1, '50.00'), _order('MSFT', 'buy', 1, '500.00')],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['rejected']), (1, 1))
+
+    def test_empty_batch(self):
+        response = self.client.post('/api/portfolio/transactions/batch/', {'orders': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Requiere bloqueos de fila de PostgreSQL')
+class ConcurrentBatchTests(TransactionTestCase):
+
+    def test_batch_and_single_create_on_new_symbol(self):
+        user = _user('racer', '100000.00')
+        errors = []
+        start = threading.Barrier(2)
+
+        def run(func):
+            try:
+                start.wait()
+                func()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        def single():
+            serializer = StockTransactionCreateSerializer(data=_order('NEW', 'buy', 1, '10.00'))
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=user)
+
+        def batch():
+            results = submit_orders(user, [_order('NEW', 'buy', 2, '10.00')])
+            assert results[0]['success'], results
+
+        for _ in range(5):
+            threads = [threading.Thread(target=run, args=(f,)) for f in (single, batch)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Holding.objects.get(user=user, symbol='NEW').shares, Decimal('15'))
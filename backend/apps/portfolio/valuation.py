@@ -0,0 +1,132 @@
+import logging
+from decimal import Decimal
+
+from services.yahoo_finance_service import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal('0.01')
+
+
+def _to_decimal(value):
+    return Decimal(str(value)) if value not in (None, '', 'N/A') else None
+
+
+class PortfolioValuation:
+    """
+    Valuación a precio de mercado de las posiciones (tabla holdings).
+
+    Junta los símbolos de todas las posiciones y pide sus cotizaciones de una
+    vez (una consulta a la caché y una descarga por lotes para lo que falte),
+    así sirve igual para un usuario que para todos los del panel de admin.
+    """
+
+    @staticmethod
+    def get_quotes(symbols, quotes=None):
+        """
+        Cotizaciones de los símbolos. quotes permite pasar una foto ya obtenida
+        (p. ej. la del mercado) y solo se piden los símbolos que no estén en ella.
+        """
+        symbols = {s.upper() for s in symbols}
+        found = {s: q for s, q in (quotes or {}).items() if s in symbols}
+        missing = symbols - found.keys()
+        if missing:
+            try:
+                found.update(YahooFinanceService.get_quotes(missing))
+            except Exception as e:
+                logger.warning(f"No se pudieron obtener cotizaciones para valuar: {str(e)}")
+        return found
+
+    @staticmethod
+    def value_positions(positions, quotes):
+        """
+        Valúa posiciones con las cotizaciones dadas. Cada posición es un dict con
+        symbol, name, shares y cost_basis; las que no tienen cotización se valúan
+        a su costo y se marcan con priced=False.
+
+        Returns:
+            dict: {'positions': [...], 'market_value', 'cost_basis',
+                   'unrealized_pnl', 'unrealized_pnl_percent', 'day_change', 'day_change_percent'}
+        """
+        valued = []
+        market_value = cost_total = day_change = Decimal('0')
+
+        for position in positions:
+            shares = Decimal(position['shares'])
+            cost_basis = Decimal(position['cost_basis'])
+            average_price = cost_basis / shares if shares else Decimal('0')
+
+            quote = quotes.get(position['symbol'].upper()) or {}
+            price = _to_decimal(quote.get('price'))
+            change = _to_decimal(quote.get('change')) or Decimal('0')
+            change_percent = _to_decimal(quote.get('changePercent')) or Decimal('0')
+            priced = price is not None
+            if not priced:
+                price = average_price
+                change = change_percent = Decimal('0')
+
+            value = shares * price
+            unrealized = value - cost_basis
+            position_day_change = shares * change
+
+            valued.append({
+                'symbol': position['symbol'],
+                'name': position.get('name') or position['symbol'],
+                'shares': shares,
+                'average_price': average_price.quantize(CENTS),
+                'current_price': price.quantize(CENTS),
+                'cost_basis': cost_basis.quantize(CENTS),
+                'market_value': value.quantize(CENTS),
+                'unrealized_pnl': unrealized.quantize(CENTS),
+                'unrealized_pnl_percent': (unrealized / cost_basis * 100).quantize(CENTS) if cost_basis else Decimal('0'),
+                'day_change': position_day_change.quantize(CENTS),
+                'change_percent': change_percent,
+                'priced': priced,
+            })
+
+            market_value += value
+            cost_total += cost_basis
+            day_change += position_day_change
+
+        unrealized_total = market_value - cost_total
+        previous_value = market_value - day_change
+        return {
+            'positions': valued,
+            'market_value': market_value.quantize(CENTS),
+            'cost_basis': cost_total.quantize(CENTS),
+            'unrealized_pnl': unrealized_total.quantize(CENTS),
+            'unrealized_pnl_percent': (unrealized_total / cost_total * 100).quantize(CENTS) if cost_total else Decimal('0'),
+            'day_change': day_change.quantize(CENTS),
+            'day_change_percent': (day_change / previous_value * 100).quantize(CENTS) if previous_value else Decimal('0'),
+        }
+
+    @staticmethod
+    def value_users(user_ids, quotes=None):
+        """
+        Valúa los portafolios de varios usuarios con una consulta a holdings y
+        una sola búsqueda de cotizaciones para todos los símbolos.
+
+        Returns:
+            dict: {user_id: valuación (ver value_positions)}
+        """
+        from .models import Holding
+
+        user_ids = list(user_ids)
+        by_user = {user_id: [] for user_id in user_ids}
+        rows = Holding.objects.filter(user_id__in=user_ids, shares__gt=0).values(
+            'user_id', 'symbol', 'name', 'shares', 'cost_basis'
+        )
+        for row in rows:
+            by_user[row['user_id']].append(row)
+
+        symbols = {row['symbol'] for positions in by_user.values() for row in positions}
+        quotes = PortfolioValuation.get_quotes(symbols, quotes) if symbols else {}
+
+        return {
+            user_id: PortfolioValuation.value_positions(positions, quotes)
+            for user_id, positions in by_user.items()
+        }
+
+    @staticmethod
+    def value_user(user_id, quotes=None):
+        return PortfolioValuation.value_users([user_id], quotes)[user_id]
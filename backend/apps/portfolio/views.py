@@ -3,11 +3,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Sum, F, Case, When, DecimalField
-from django.utils import timezone
-from datetime import timedelta
+from datetime import date
 from decimal import Decimal
 
+from apps.common.pagination import StockTransactionPagination
+from apps.users.idempotency import idempotent
 from .models import StockTransaction, Portfolio
+from .performance import PortfolioPerformance, parse_range
+from .batch import submit_orders, max_orders
+from . import checkpoints
 from .serializers import (
     StockTransactionSerializer, 
     StockTransactionCreateSerializer,
@@ -20,13 +24,24 @@ class StockTransactionViewSet(viewsets.ModelViewSet):
     """ViewSet para manejar transacciones de acciones"""
     serializer_class = StockTransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = StockTransactionPagination
     
     def get_queryset(self):
         """Solo retorna transacciones del usuario autenticado"""
-        return StockTransaction.objects.filter(user=self.request.user)
+        queryset = StockTransaction.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            # Filtros del listado: usan los índices (user, symbol|type, -created_at)
+            symbol = self.request.query_params.get('symbol')
+            transaction_type = self.request.query_params.get('type')
+            if symbol:
+                queryset = queryset.filter(symbol=symbol.upper())
+            if transaction_type:
+                queryset = queryset.filter(transaction_type=transaction_type)
+        return queryset
     
+    @idempotent
     def create(self, request, *args, **kwargs):
-        """Crear una nueva transacción"""
+        """Crear una nueva transacción (reintentable con la cabecera Idempotency-Key)"""
         serializer = StockTransactionCreateSerializer(data=request.data)
         if serializer.is_valid():
             # Crear la transacción asociada al usuario
@@ -34,6 +49,38 @@ class StockTransactionViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def batch(self, request):
+        """
+        Registra varias operaciones en una sola transacción
+        POST /api/portfolio/transactions/batch/ {"orders": [{symbol, name, transaction_type, shares, price_per_share}, ...]}
+        """
+        orders = request.data.get('orders') if isinstance(request.data, dict) else request.data
+        if not isinstance(orders, list) or not orders:
+            return Response({
+                'success': False,
+                'message': 'Se requiere una lista de órdenes en "orders"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(orders) > max_orders():
+            return Response({
+                'success': False,
+                'message': f'Máximo {max_orders()} órdenes por lote'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = submit_orders(request.user, orders)
+        for result in results:
+            if result['success']:
+                result['transaction'] = StockTransactionSerializer(result['transaction']).data
+        
+        created = sum(1 for result in results if result['success'])
+        return Response({
+            'success': created == len(results),
+            'created': created,
+            'rejected': len(results) - created,
+            'results': results
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Obtiene las últimas 5 transacciones"""
@@ -99,12 +146,11 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         except:
             total_balance = Decimal('0')
         
-        # Calcular inversiones y ganancias
-        total_invested = portfolio.get_total_invested()
-        total_gains = portfolio.get_total_gains()
-        gains_percentage = Decimal('0')
-        if total_invested > 0:
-            gains_percentage = (total_gains / total_invested) * 100
+        # Calcular inversiones y ganancias (una sola consulta)
+        summary = portfolio.get_summary()
+        total_invested = summary['total_invested']
+        total_gains = summary['total_gains']
+        gains_percentage = summary['gains_percentage']
         
         # Obtener últimas 5 transacciones
         recent_transactions = StockTransaction.objects.filter(
@@ -112,19 +158,20 @@ class PortfolioViewSet(viewsets.ModelViewSet):
             status='completed'
         ).order_by('-created_at')[:5]
         
-        # Generar datos para la gráfica de rendimiento (últimos 7 días)
-        performance_data = []
-        for i in range(6, -1, -1):
-            date = timezone.now() - timedelta(days=i)
-            date_str = date.strftime('%a')  # Lun, Mar, etc
-            
-            # Simular valor del portafolio en ese día
-            # En producción, esto debería ser más sofisticado
-            day_value = total_balance + (total_invested * (Decimal(i) / 6))
-            performance_data.append({
-                'date': date_str,
-                'value': float(day_value)
-            })
+        # Gráfica de rendimiento desde las fotos diarias (?range=7D|1M|3M|1Y|ALL)
+        try:
+            range_key = parse_range(request.query_params.get('range'))
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        performance_data = PortfolioPerformance.get_series(user.id, range_key, live={
+            'market_value': summary['current_value'],
+            'cash': total_balance,
+            'invested': total_invested,
+        })
         
         return Response({
             'success': True,
@@ -133,29 +180,86 @@ class PortfolioViewSet(viewsets.ModelViewSet):
                 'total_invested': float(total_invested),
                 'total_gains': float(total_gains),
                 'gains_percentage': float(gains_percentage),
-                'portfolio_value': float(total_balance + total_invested),
+                'portfolio_value': float(total_balance + summary['current_value']),
                 'recent_transactions': StockTransactionSerializer(recent_transactions, many=True).data,
-                'performance_data': performance_data
+                'performance_data': performance_data,
+                'performance_range': range_key
             }
         })
     
     @action(detail=False, methods=['get'])
-    def holdings(self, request):
-        """Retorna los holdings actuales del portafolio"""
-        portfolio = self.get_object()
-        holdings = portfolio.get_portfolio_holdings()
+    def summary(self, request):
+        """
+        Totales del portafolio (inversión, valor, ganancias, posiciones)
+        GET /api/portfolio/portfolio/summary/
+        """
+        summary = self.get_object().get_summary()
+        return Response({
+            'success': True,
+            'summary': {
+                key: value if key == 'positions' else float(value)
+                for key, value in summary.items()
+            }
+        })
+    
+    @action(detail=False, methods=['get'])
+    def as_of(self, request):
+        """
+        Posiciones del portafolio al cierre de una fecha pasada
+        GET /api/portfolio/portfolio/as_of/?date=YYYY-MM-DD
+        """
+        try:
+            day = date.fromisoformat(request.query_params.get('date', ''))
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Fecha inválida, usa YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
+        holdings = checkpoints.as_of(request.user, day)
         return Response({
             'success': True,
+            'date': day.isoformat(),
             'count': len(holdings),
             'holdings': [
                 {
-                    'symbol': h['symbol'],
-                    'name': h['name'],
-                    'shares': float(h['shares']),
-                    'average_price': float(h['average_price']),
-                    'total_invested': float(h['total_invested']),
+                    'symbol': h.symbol,
+                    'name': h.name,
+                    'shares': float(h.shares),
+                    'average_price': float(h.average_price),
+                    'total_invested': float(h.cost_basis),
+                    'realized_pnl': float(h.realized_pnl),
                 }
                 for h in holdings.values()
             ]
         })
+    
+    @action(detail=False, methods=['get'])
+    def holdings(self, request):
+        """Retorna los holdings actuales del portafolio"""
+        portfolio = self.get_object()
+        holdings = portfolio.get_portfolio_holdings()
+        positions = {p['symbol']: p for p in portfolio.get_valuation()['positions']}
+        
+        data = []
+        for h in holdings.values():
+            position = positions.get(h['symbol'])
+            data.append({
+                'symbol': h['symbol'],
+                'name': h['name'],
+                'shares': float(h['shares']),
+                'average_price': float(h['average_price']),
+                'total_invested': float(h['total_invested']),
+                'realized_pnl': float(h['realized_pnl']),
+                # Valuación a precio de mercado
+                'current_price': float(position['current_price']) if position else None,
+                'market_value': float(position['market_value']) if position else None,
+                'unrealized_pnl': float(position['unrealized_pnl']) if position else None,
+                'day_change': float(position['day_change']) if position else None,
+            })
+        
+        return Response({
+            'success': True,
+            'count': len(data),
+            'holdings': data
+        })
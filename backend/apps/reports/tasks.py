@@ -2,6 +2,7 @@ from celery import shared_task
 from django.core.mail import send_mail
 from django.contrib.auth import get_user_model
 from apps.transactions.models import Transaction
+from apps.users.balance import BalanceService
 from decimal import Decimal
 
 User = get_user_model()
@@ -36,7 +37,7 @@ def generate_user_report(user_id, start_date=None, end_date=None):
     message += f"\nTotal comprado: ${total_buy}\n"
     message += f"Total vendido: ${total_sell}\n"
     message += f"Ganancia / Pérdida: ${profit_loss}\n"
-    message += f"Saldo actual: ${user.balance}\n\nGracias por usar TikalInvest."
+    message += f"Saldo actual: ${BalanceService.get_available(user)}\n\nGracias por usar TikalInvest."
 
     send_mail(
         subject="Tu reporte de transacciones",
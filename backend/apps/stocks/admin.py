@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Stock, StockHistory
+from .models import Stock, StockHistory, PriceBar
 
 admin.site.register(Stock)
 admin.site.register(StockHistory)
+admin.site.register(PriceBar)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class StocksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.stocks'
+
+    def ready(self):
+        import apps.stocks.signals
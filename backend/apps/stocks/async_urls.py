@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import async_views
+
+# Variantes async de StocksViewSet; pensadas para servirse por TikalInvest/asgi.py
+urlpatterns = [
+    path("quote/", async_views.quote, name="async_stock_quote"),
+    path("quotes/", async_views.quotes, name="async_stock_quotes"),
+    path("market_data/", async_views.market_data, name="async_market_data"),
+]
@@ -0,0 +1,162 @@
+import logging
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+
+from services.async_market_client import get_async_market_client
+from services.market_snapshot import MarketSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Símbolos máximos por petición en /quotes/
+MAX_SYMBOLS = 100
+
+
+@asynccontextmanager
+async def _market_client(request):
+    """
+    Cliente async compartido. Bajo ASGI el event loop dura lo que el proceso
+    y el cliente se reutiliza; bajo WSGI Django corre cada vista async en un
+    loop nuevo, así que su cliente se cierra al terminar la petición.
+    """
+    client = get_async_market_client()
+    try:
+        yield client
+    finally:
+        if not isinstance(request, ASGIRequest):
+            await client.aclose()
+
+
+def _method_not_allowed():
+    return JsonResponse({
+        'success': False,
+        'message': 'Método no permitido'
+    }, status=405)
+
+
+async def quote(request):
+    """
+    Cotización de una acción sin bloquear el worker
+    GET /api/async/stocks/quote/?symbol=AAPL
+    """
+    if request.method != 'GET':
+        return _method_not_allowed()
+    
+    symbol = request.GET.get('symbol')
+    if not symbol:
+        return JsonResponse({
+            'success': False,
+            'message': 'Símbolo requerido'
+        }, status=400)
+    
+    try:
+        async with _market_client(request) as client:
+            stock = await client.get_stock_data(symbol)
+        if not stock:
+            return JsonResponse({
+                'success': False,
+                'message': f'No se encontró {symbol}'
+            }, status=404)
+        
+        return JsonResponse({
+            'success': True,
+            'stock': stock
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo {symbol}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Error obteniendo datos de la acción'
+        }, status=500)
+
+
+async def quotes(request):
+    """
+    Cotizaciones de varias acciones en paralelo, en el orden pedido
+    GET /api/async/stocks/quotes/?symbols=AAPL,MSFT,BTC-USD
+    """
+    if request.method != 'GET':
+        return _method_not_allowed()
+    
+    symbols = [s.strip().upper() for s in request.GET.get('symbols', '').split(',') if s.strip()]
+    if not symbols:
+        return JsonResponse({
+            'success': False,
+            'message': 'Símbolos requeridos'
+        }, status=400)
+    if len(symbols) > MAX_SYMBOLS:
+        return JsonResponse({
+            'success': False,
+            'message': f'Máximo {MAX_SYMBOLS} símbolos por petición'
+        }, status=400)
+    
+    try:
+        async with _market_client(request) as client:
+            found = await client.get_quotes(symbols)
+        stocks = [found[s] for s in symbols if s in found]
+        return JsonResponse({
+            'success': True,
+            'stocks': stocks,
+            'count': len(stocks),
+            'missing': [s for s in symbols if s not in found]
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo cotizaciones: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Error obteniendo datos de acciones'
+        }, status=500)
+
+
+async def market_data(request):
+    """
+    Foto del mercado (acciones + criptos)
+    GET /api/async/stocks/market_data/
+    """
+    if request.method != 'GET':
+        return _method_not_allowed()
+    
+    try:
+        # Vencida se sirve igual y se renueva en segundo plano, como en la vista síncrona
+        snapshot = await sync_to_async(MarketSnapshot.get_or_refresh, thread_sensitive=False)(generate=False)
+        if snapshot is None:
+            # Arranque en frío: armar la foto con el cliente async en lugar de bloquear
+            from services.yahoo_finance_service import YahooFinanceService
+            
+            async with _market_client(request) as client:
+                found = await client.get_quotes(
+                    YahooFinanceService.POPULAR_STOCKS + YahooFinanceService.POPULAR_CRYPTOS
+                )
+            stocks = [found[s] for s in YahooFinanceService.POPULAR_STOCKS if s in found]
+            cryptos = [found[s] for s in YahooFinanceService.POPULAR_CRYPTOS if s in found]
+            if not stocks and not cryptos:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Datos del mercado no disponibles todavía'
+                }, status=503)
+            return JsonResponse({
+                'success': True,
+                'data': {
+                    'stocks': stocks,
+                    'cryptos': cryptos,
+                    'total': len(stocks) + len(cryptos)
+                }
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'stocks': snapshot['stocks'],
+                'cryptos': snapshot['cryptos'],
+                'total': len(snapshot['stocks']) + len(snapshot['cryptos'])
+            },
+            **MarketSnapshot.metadata(snapshot)
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo datos del mercado: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Error obteniendo datos del mercado'
+        }, status=500)
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+from services.market_snapshot import MarketSnapshot
+from services.price_stream import group_name, streamed_symbols
+
+logger = logging.getLogger(__name__)
+
+
+class PriceStreamConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Canal de precios en tiempo real.
+
+    El cliente envía {"action": "subscribe", "symbols": ["AAPL", "BTC-USD"]}
+    (o "unsubscribe") y recibe {"type": "prices", "quotes": [...]} con los
+    cambios que publica el refresco de la foto del mercado. Solo se aceptan
+    los símbolos de esa foto; los demás se rechazan con un mensaje de error.
+
+    Los cambios pendientes se guardan por símbolo y solo se conserva el
+    último: si un cliente lee lento no se acumula una cola, simplemente
+    recibe el precio más reciente de cada símbolo en el siguiente envío.
+    """
+
+    async def connect(self):
+        self.symbols = set()
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+        self.sender = asyncio.create_task(self._send_loop())
+        await self.accept()
+
+    async def disconnect(self, code):
+        self.sender.cancel()
+        for symbol in self.symbols:
+            await self.channel_layer.group_discard(group_name(symbol), self.channel_name)
+        self.symbols.clear()
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action')
+        symbols = content.get('symbols') or []
+        if action not in ('subscribe', 'unsubscribe') or not isinstance(symbols, list):
+            await self.send_json({'type': 'error', 'message': 'Mensaje no válido'})
+            return
+
+        symbols = {str(s).upper() for s in symbols if s}
+        if action == 'subscribe':
+            await self._subscribe(symbols)
+        else:
+            await self._unsubscribe(symbols)
+
+    async def _subscribe(self, symbols):
+        unsupported = symbols - streamed_symbols()
+        if unsupported:
+            # Nunca recibirían cambios: el refresco solo descarga la foto del mercado
+            await self.send_json({
+                'type': 'error',
+                'message': 'Símbolos sin precios en tiempo real',
+                'symbols': sorted(unsupported),
+            })
+            symbols -= unsupported
+            if not symbols:
+                return
+
+        max_symbols = getattr(settings, 'PRICE_STREAM', {}).get('MAX_SYMBOLS', 50)
+        new = symbols - self.symbols
+        if len(self.symbols) + len(new) > max_symbols:
+            await self.send_json({
+                'type': 'error',
+                'message': f'Máximo {max_symbols} símbolos por conexión'
+            })
+            return
+
+        for symbol in new:
+            await self.channel_layer.group_add(group_name(symbol), self.channel_name)
+        self.symbols |= new
+        await self.send_json({'type': 'subscribed', 'symbols': sorted(self.symbols)})
+
+        # Estado inicial: últimos precios conocidos de los símbolos nuevos
+        snapshot = await sync_to_async(MarketSnapshot.get, thread_sensitive=False)()
+        if snapshot:
+            for quote in snapshot['stocks'] + snapshot['cryptos']:
+                if quote['symbol'] in new:
+                    self.pending[quote['symbol']] = quote
+            self.wakeup.set()
+
+    async def _unsubscribe(self, symbols):
+        for symbol in symbols & self.symbols:
+            await self.channel_layer.group_discard(group_name(symbol), self.channel_name)
+            self.pending.pop(symbol, None)
+        self.symbols -= symbols
+        await self.send_json({'type': 'subscribed', 'symbols': sorted(self.symbols)})
+
+    async def price_delta(self, event):
+        """Handler de los mensajes 'price.delta' publicados al grupo del símbolo"""
+        quote = event['quote']
+        if quote['symbol'] in self.symbols:
+            self.pending[quote['symbol']] = quote
+            self.wakeup.set()
+
+    async def _send_loop(self):
+        """Envía los cambios pendientes en lotes, uno a la vez por conexión"""
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                quotes, self.pending = list(self.pending.values()), {}
+                if quotes:
+                    await self.send_json({'type': 'prices', 'quotes': quotes})
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Error enviando precios por websocket: {str(e)}")
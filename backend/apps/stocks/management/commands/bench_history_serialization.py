@@ -0,0 +1,68 @@
+import timeit
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from services.history_serializer import COLUMNAR, RECORDS, serialize_bars
+
+FIELDS = ['close', 'open', 'high', 'low', 'volume']
+
+
+def iterrows_records(hist):
+    """Conversión fila por fila que usaba antes YahooFinanceService"""
+    historical_data = []
+    for date, row in hist.iterrows():
+        try:
+            historical_data.append({
+                'date': date.strftime('%Y-%m-%d'),
+                'close': round(float(row['Close']), 2),
+                'open': round(float(row['Open']), 2),
+                'high': round(float(row['High']), 2),
+                'low': round(float(row['Low']), 2),
+                'volume': int(row['Volume'])
+            })
+        except Exception:
+            continue
+    return historical_data
+
+
+def sample_frame(rows):
+    """DataFrame sintético con la forma de Ticker.history()"""
+    rng = np.random.default_rng(42)
+    close = 100 + rng.standard_normal(rows).cumsum()
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=rows, tz='America/New_York')
+    return pd.DataFrame({
+        'Open': close + rng.random(rows),
+        'High': close + 2,
+        'Low': close - 2,
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 50_000_000, rows),
+    }, index=index)
+
+
+class Command(BaseCommand):
+    help = "Compara la serialización de barras con iterrows contra la versión vectorizada"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2520, help="Barras por serie (2520 ≈ 10 años)")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        hist = sample_frame(options['rows'])
+        repeat = options['repeat']
+
+        if len(iterrows_records(hist)) != len(serialize_bars(hist, FIELDS, RECORDS)):
+            self.stderr.write("Las dos conversiones no producen el mismo número de barras")
+
+        cases = [
+            ('iterrows', lambda: iterrows_records(hist)),
+            ('vectorizado records', lambda: serialize_bars(hist, FIELDS, RECORDS)),
+            ('vectorizado columnar', lambda: serialize_bars(hist, FIELDS, COLUMNAR)),
+        ]
+
+        baseline = None
+        for name, func in cases:
+            best = min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+            baseline = baseline or best
+            self.stdout.write(f"{name:<22} {best:9.2f} ms  x{baseline / best:6.1f}")
@@ -17,3 +17,24 @@ class StockHistory(models.Model):
 
     def __str__(self):
         return f"{self.stock.symbol} @ {self.price} ({self.timestamp})"
+
+
+class PriceBar(models.Model):
+    """Barra diaria OHLCV de un símbolo, sincronizada desde Yahoo Finance"""
+    symbol = models.CharField(max_length=20)
+    date = models.DateField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'price_bars'
+        ordering = ['symbol', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'date'], name='price_bar_symbol_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} {self.date} close={self.close}"
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from services.symbol_directory import SymbolDirectory
+from .models import Stock
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_symbol_directory(sender, **kwargs):
+    """Reconstruye el directorio de símbolos cuando cambia la tabla Stock"""
+    SymbolDirectory.invalidate()
@@ -3,6 +3,14 @@ from .models import Stock, StockHistory
 import random
 from decimal import Decimal
 
+import logging
+
+from services.market_snapshot import MarketSnapshot
+from services.history_store import HistoryStore
+from services.yahoo_finance_service import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
 @shared_task
 def update_stock_prices():
     stocks = Stock.objects.all()
@@ -13,3 +21,31 @@ def update_stock_prices():
         stock.save()
 
         StockHistory.objects.create(stock=stock, price=stock.current_price)
+
+
+@shared_task(ignore_result=True, soft_time_limit=25, time_limit=30)
+def refresh_market_snapshot():
+    """Refresca la foto de POPULAR_STOCKS y POPULAR_CRYPTOS que sirven las vistas"""
+    snapshot = MarketSnapshot.refresh()
+    return snapshot['version'] if snapshot else None
+
+
+@shared_task(ignore_result=True)
+def sync_symbol_history(symbol, full=False):
+    """Sincroniza un símbolo pedido desde la API; full=True descarga INITIAL_PERIOD completo"""
+    return HistoryStore.sync(symbol, full=full)
+
+
+@shared_task(ignore_result=True)
+def sync_price_history():
+    """Sincroniza incrementalmente las barras diarias de los símbolos conocidos"""
+    symbols = set(YahooFinanceService.POPULAR_STOCKS + YahooFinanceService.POPULAR_CRYPTOS)
+    symbols.update(s.upper() for s in Stock.objects.values_list('symbol', flat=True))
+
+    total = 0
+    for symbol in sorted(symbols):
+        try:
+            total += HistoryStore.sync(symbol)
+        except Exception as e:
+            logger.error(f"Error sincronizando histórico de {symbol}: {str(e)}")
+    return total
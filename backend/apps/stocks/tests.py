@@ -1,3 +1,352 @@
-from django.test import TestCase
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.stocks import async_views
+from apps.stocks.consumers import PriceStreamConsumer
+from apps.stocks.models import PriceBar
+from services.async_market_client import AsyncMarketClient
+from services.history_store import HistoryStore
+from services.market_snapshot import MarketSnapshot
+from services.price_stream import publish_deltas
+from services.quote_cache import LocalCacheBackend, QuoteCache
+from services.upstream import AdaptiveLimiter, CircuitBreaker, UpstreamClient, UpstreamUnavailable
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+def _delta(symbol, price):
+    return {
+        'symbol': symbol,
+        'price': price,
+        'change': 0,
+        'changePercent': 0,
+        'volume': 1000,
+        'lastUpdate': '2025-01-01T00:00:00',
+    }
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class PriceStreamConsumerTests(SimpleTestCase):
+    """Canal ws/prices/ con la capa de channels en memoria como broker"""
+
+    async def _connect(self):
+        communicator = WebsocketCommunicator(PriceStreamConsumer.as_asgi(), '/ws/prices/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_subscriber_receives_published_deltas(self):
+        communicator = await self._connect()
+        await communicator.send_json_to({'action': 'subscribe', 'symbols': ['aapl']})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'subscribed', 'symbols': ['AAPL']})
+
+        sent = await sync_to_async(publish_deltas)([_delta('AAPL', 190.5), _delta('MSFT', 410.0)], 7)
+        self.assertEqual(sent, 2)
+
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'prices')
+        self.assertEqual([q['symbol'] for q in message['quotes']], ['AAPL'])
+        self.assertEqual(message['quotes'][0]['price'], 190.5)
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_slow_consumer_gets_latest_price_only(self):
+        communicator = await self._connect()
+        await communicator.send_json_to({'action': 'subscribe', 'symbols': ['AAPL']})
+        await communicator.receive_json_from()
+
+        # Sin leer entre medio: los cambios del mismo símbolo se reemplazan
+        await sync_to_async(publish_deltas)([_delta('AAPL', price) for price in (1.0, 2.0, 3.0)])
+
+        prices = []
+        while not await communicator.receive_nothing(timeout=0.2):
+            message = await communicator.receive_json_from()
+            prices += [q['price'] for q in message['quotes']]
+        self.assertEqual(prices[-1], 3.0)
+        self.assertLessEqual(len(prices), 3)
+        await communicator.disconnect()
+
+    async def test_unsupported_symbols_are_rejected(self):
+        communicator = await self._connect()
+        await communicator.send_json_to({'action': 'subscribe', 'symbols': ['AAPL', 'NOPE']})
+
+        error = await communicator.receive_json_from()
+        self.assertEqual(error['type'], 'error')
+        self.assertEqual(error['symbols'], ['NOPE'])
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'subscribed', 'symbols': ['AAPL']})
+
+        await communicator.send_json_to({'action': 'subscribe', 'symbols': ['NOPE']})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    @override_settings(PRICE_STREAM={'MAX_SYMBOLS': 1})
+    async def test_symbol_limit_per_connection(self):
+        communicator = await self._connect()
+        await communicator.send_json_to({'action': 'subscribe', 'symbols': ['AAPL', 'MSFT']})
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'error')
+        await communicator.disconnect()
+
+    async def test_invalid_message(self):
+        communicator = await self._connect()
+        await communicator.send_json_to({'action': 'buy', 'symbols': 'AAPL'})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+        await communicator.disconnect()
+
+
+class QuoteCacheTests(SimpleTestCase):
+    """QuoteCache con el backend en memoria"""
+
+    def _cache(self, **kwargs):
+        return QuoteCache(LocalCacheBackend(max_entries=kwargs.pop('max_entries', 100)), **kwargs)
+
+    def test_hit_after_fetch(self):
+        cache = self._cache()
+        calls = []
+        fetch = lambda: calls.append(1) or {'price': 10}
+
+        self.assertEqual(cache.get_or_fetch('aapl', fetch), {'price': 10})
+        self.assertEqual(cache.get_or_fetch('AAPL', fetch), {'price': 10})
+        self.assertEqual(len(calls), 1)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['fetches']), (1, 1, 1))
+
+    def test_per_symbol_ttl(self):
+        cache = self._cache(ttl=60, ttl_overrides={'-USD': 5, 'TSLA': 1})
+        self.assertEqual(cache.ttl_for('AAPL'), 60)
+        self.assertEqual(cache.ttl_for('btc-usd'), 5)
+        self.assertEqual(cache.ttl_for('TSLA'), 1)
+
+    def test_expired_entry_is_stale_and_served_on_error(self):
+        cache = self._cache(ttl=0.05, stale_ttl=60)
+        cache.set('AAPL', {'price': 10})
+        time.sleep(0.1)
+
+        self.assertIsNone(cache.get('AAPL'))
+        self.assertEqual(cache.get_stale('AAPL'), {'price': 10})
+
+        def failing():
+            raise RuntimeError('upstream caído')
+
+        self.assertEqual(cache.get_or_fetch('AAPL', failing), {'price': 10})
+        stats = cache.stats()
+        self.assertEqual(stats['errors'], 1)
+        self.assertGreaterEqual(stats['stale'], 2)
+
+    def test_lru_eviction(self):
+        cache = self._cache(max_entries=2)
+        cache.set('A', 1)
+        cache.set('B', 2)
+        cache.get('A')
+        cache.set('C', 3)
+
+        self.assertEqual(cache.get('A'), 1)
+        self.assertIsNone(cache.get('B'))
+        self.assertEqual(cache.get('C'), 3)
+
+    def test_concurrent_misses_collapse_into_one_fetch(self):
+        cache = self._cache()
+        calls = []
+        release = threading.Event()
+
+        def slow_fetch():
+            calls.append(1)
+            release.wait(2)
+            return {'price': 42}
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            futures = [pool.submit(cache.get_or_fetch, 'AAPL', slow_fetch) for _ in range(10)]
+            time.sleep(0.2)
+            release.set()
+            results = [f.result() for f in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'price': 42}] * 10)
+        self.assertEqual(cache.stats()['collapsed'], 9)
+
+
+class SymbolNotFound(Exception):
+    """Como el HTTPError 404 que lanza yfinance para un ticker inexistente"""
+
+    class response:
+        status_code = 404
+
+
+class UpstreamClientTests(SimpleTestCase):
+    """Circuito y reintentos de UpstreamClient"""
+
+    def _client(self, threshold=2, retries=2, concurrency=5):
+        return UpstreamClient(
+            'test',
+            CircuitBreaker(failure_threshold=threshold, recovery_timeout=0),
+            AdaptiveLimiter(initial=concurrency, max_limit=concurrency),
+            retries=retries,
+            backoff_base=0,
+            acquire_timeout=0.01,
+        )
+
+    def test_one_failure_per_logical_call(self):
+        client = self._client(threshold=2, retries=2)
+        attempts = []
+
+        def failing():
+            attempts.append(1)
+            raise ConnectionError('timeout')
+
+        with self.assertRaises(ConnectionError):
+            client.call(failing)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(client.breaker.failures, 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+        with self.assertRaises(ConnectionError):
+            client.call(failing)
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_symbol_errors_do_not_open_the_circuit(self):
+        client = self._client(threshold=1)
+        attempts = []
+
+        def missing():
+            attempts.append(1)
+            raise SymbolNotFound('404 Client Error')
+
+        for _ in range(3):
+            with self.assertRaises(SymbolNotFound):
+                client.call(missing)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_probe_released_when_limiter_is_full(self):
+        client = self._client(threshold=1, retries=0, concurrency=1)
+        with self.assertRaises(ConnectionError):
+            client.call(lambda: (_ for _ in ()).throw(ConnectionError('caído')))
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+        # Sin lugar en el limitador la prueba del half_open no llega al upstream
+        self.assertTrue(client.limiter.acquire(0))
+        with self.assertRaises(UpstreamUnavailable):
+            client.call(lambda: 'ok')
+        client.limiter.release(0, ok=True)
+
+        self.assertEqual(client.call(lambda: 'ok'), 'ok')
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+
+class _RecordingUpstream:
+    """Upstream falso que anota los argumentos de cada descarga"""
+
+    def __init__(self, days):
+        self.days = days
+        self.calls = []
+
+    def call(self, fn, **kwargs):
+        self.calls.append(kwargs)
+        index = pd.DatetimeIndex([pd.Timestamp(day) for day in self.days])
+        return pd.DataFrame(
+            {'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 100},
+            index=index,
+        )
+
+
+@override_settings(HISTORY_STORE={'INITIAL_PERIOD': '10y', 'RESYNC_SECONDS': 60})
+class HistoryStoreTests(TestCase):
+    """Sincronización del histórico con Yahoo y Celery reemplazados"""
+
+    def setUp(self):
+        cache = QuoteCache(LocalCacheBackend(max_entries=100))
+        self.backend = cache.backend
+        for target, value in (
+            ('services.history_store.get_quote_cache', lambda: cache),
+            ('services.history_store.yf.Ticker', mock.Mock()),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _upstream(self, days):
+        upstream = _RecordingUpstream(days)
+        patcher = mock.patch('services.history_store.get_upstream', lambda name: upstream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return upstream
+
+    def _store_bars(self, *days):
+        PriceBar.objects.bulk_create(
+            PriceBar(symbol='AAPL', date=day, open=1, high=1, low=1, close=1, volume=1) for day in days
+        )
+
+    def test_marker_not_set_when_backfill_cannot_be_queued(self):
+        today = date.today()
+        self._upstream([today - timedelta(days=1)])
+
+        with mock.patch('apps.stocks.tasks.sync_symbol_history.apply_async', side_effect=ConnectionError('caído')):
+            HistoryStore.ensure_synced('AAPL', start=today - timedelta(days=30))
+        self.assertIsNone(self.backend.get('history:synced:AAPL'))
+
+        with mock.patch('apps.stocks.tasks.sync_symbol_history.apply_async') as apply_async:
+            HistoryStore.ensure_synced('AAPL')
+        apply_async.assert_called_once()
+        self.assertTrue(self.backend.get('history:synced:AAPL'))
+
+    def test_incremental_sync_backfills_a_partial_history(self):
+        today = date.today()
+        self._store_bars(today - timedelta(days=365), today - timedelta(days=2))
+        upstream = self._upstream([today - timedelta(days=3650), today - timedelta(days=1)])
+
+        HistoryStore.sync('AAPL')
+        self.assertEqual(upstream.calls, [{'period': '10y'}])
+        self.assertEqual(HistoryStore.first_date('AAPL'), today - timedelta(days=3650))
+
+        # Con el histórico completo vuelve a pedir solo desde la última barra
+        HistoryStore.sync('AAPL')
+        self.assertEqual(upstream.calls[1], {'start': (today - timedelta(days=1)).isoformat()})
+
+    def test_short_listing_is_not_backfilled_again(self):
+        today = date.today()
+        self._store_bars(today - timedelta(days=100))
+        upstream = self._upstream([today - timedelta(days=100), today - timedelta(days=1)])
+
+        HistoryStore.sync('AAPL', full=True)
+        HistoryStore.sync('AAPL')
+        self.assertEqual(upstream.calls[1], {'start': (today - timedelta(days=1)).isoformat()})
+
+
+class AsyncViewsTests(SimpleTestCase):
+    """Vistas async llamadas como las corre Django bajo WSGI"""
+
+    def test_wsgi_request_closes_its_client(self):
+        client = AsyncMarketClient()
+        opened = []
+
+        async def get_stock_data(symbol):
+            opened.append(client._resources()[0])
+            return {'symbol': symbol}
+
+        with mock.patch.object(async_views, 'get_async_market_client', lambda: client), \
+                mock.patch.object(client, 'get_stock_data', get_stock_data):
+            response = async_to_sync(async_views.quote)(RequestFactory().get('/', {'symbol': 'AAPL'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(opened[0].is_closed)
+        self.assertEqual(len(client._per_loop), 0)
+
+    def test_stale_snapshot_is_refreshed_in_background(self):
+        snapshot = {'version': 3, 'generated_at': 0, 'stocks': [], 'cryptos': []}
+
+        with mock.patch.object(MarketSnapshot, 'get', return_value=snapshot), \
+                mock.patch.object(MarketSnapshot, '_refresh_in_background') as refresh:
+            response = async_to_sync(async_views.market_data)(RequestFactory().get('/'))
+
+        self.assertEqual(response.status_code, 200)
+        refresh.assert_called_once()
@@ -1,11 +1,17 @@
+from django.conf import settings
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from apps.users.permissions import IsAdmin
 import logging
 from datetime import datetime
 
-from services.yahoo_finance_service import YahooFinanceService
+from services.yahoo_finance_service import YahooFinanceService, DETAIL_FACETS
+from services.market_snapshot import MarketSnapshot
+from services.history_store import HistoryStore
+from services.history_serializer import RECORDS, SHAPES, bars_count
+from services.symbol_directory import SymbolDirectory
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +21,38 @@ class StocksViewSet(viewsets.ViewSet):
     
     permission_classes = [AllowAny]
     
+    def _parse_range(self, request):
+        """Lee ?period= o ?start=&end= (YYYY-MM-DD); por defecto el último año"""
+        return HistoryStore.resolve_range(
+            period=request.query_params.get('period'),
+            start=request.query_params.get('start'),
+            end=request.query_params.get('end'),
+        )
+    
+    def _parse_shape(self, request):
+        """Lee ?shape=records|columnar para el formato del histórico"""
+        shape = request.query_params.get('shape', RECORDS)
+        if shape not in SHAPES:
+            raise ValueError(f"Formato no soportado: {shape}")
+        return shape
+    
+    def _parse_facets(self, request):
+        """Lee ?fields=fundamentals,quote,history; por defecto todas las partes"""
+        raw = request.query_params.get('fields')
+        if not raw:
+            return DETAIL_FACETS
+        facets = tuple(f.strip() for f in raw.split(',') if f.strip())
+        invalid = [f for f in facets if f not in DETAIL_FACETS]
+        if invalid or not facets:
+            raise ValueError(f"Campos no soportados: {', '.join(invalid)}. Usa: {', '.join(DETAIL_FACETS)}")
+        return facets
+    
+    def _snapshot_unavailable(self):
+        return Response({
+            'success': False,
+            'message': 'Datos del mercado no disponibles todavía'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
     @action(detail=False, methods=['get'])
     def popular(self, request):
         """
@@ -22,11 +60,16 @@ class StocksViewSet(viewsets.ViewSet):
         GET /api/stocks/popular/
         """
         try:
-            stocks = YahooFinanceService.get_popular_stocks()
+            snapshot = MarketSnapshot.get_or_refresh()
+            if snapshot is None:
+                return self._snapshot_unavailable()
+            
+            stocks = snapshot['stocks']
             return Response({
                 'success': True,
                 'stocks': stocks,
-                'count': len(stocks)
+                'count': len(stocks),
+                **MarketSnapshot.metadata(snapshot)
             })
         except Exception as e:
             logger.error(f"Error obteniendo acciones populares: {str(e)}")
@@ -42,10 +85,18 @@ class StocksViewSet(viewsets.ViewSet):
         GET /api/stocks/market_data/
         """
         try:
-            data = YahooFinanceService.get_all_market_data()
+            snapshot = MarketSnapshot.get_or_refresh()
+            if snapshot is None:
+                return self._snapshot_unavailable()
+            
             return Response({
                 'success': True,
-                'data': data
+                'data': {
+                    'stocks': snapshot['stocks'],
+                    'cryptos': snapshot['cryptos'],
+                    'total': len(snapshot['stocks']) + len(snapshot['cryptos'])
+                },
+                **MarketSnapshot.metadata(snapshot)
             })
         except Exception as e:
             logger.error(f"Error obteniendo datos del mercado: {str(e)}")
@@ -61,11 +112,16 @@ class StocksViewSet(viewsets.ViewSet):
         GET /api/stocks/cryptos/
         """
         try:
-            cryptos = YahooFinanceService.get_popular_cryptos()
+            snapshot = MarketSnapshot.get_or_refresh()
+            if snapshot is None:
+                return self._snapshot_unavailable()
+            
+            cryptos = snapshot['cryptos']
             return Response({
                 'success': True,
                 'cryptos': cryptos,
-                'count': len(cryptos)
+                'count': len(cryptos),
+                **MarketSnapshot.metadata(snapshot)
             })
         except Exception as e:
             logger.error(f"Error obteniendo criptomonedas: {str(e)}")
@@ -74,35 +130,50 @@ class StocksViewSet(viewsets.ViewSet):
                 'message': 'Error obteniendo criptomonedas'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAdmin])
+    def cache_stats(self, request):
+        """
+        Contadores de la caché de cotizaciones (hits/misses/stale) y estado
+        del circuito hacia Yahoo
+        GET /api/stocks/cache_stats/
+        """
+        return Response({
+            'success': True,
+            'stats': YahooFinanceService.get_cache_stats(),
+            'upstream': YahooFinanceService.get_upstream_stats()
+        })
+    
     @action(detail=False, methods=['get'])
     def search(self, request):
         """
-        Busca una acción por símbolo
-        GET /api/stocks/search/?symbol=AAPL
+        Autocompletado de símbolos desde el directorio local (sin llamar a Yahoo)
+        GET /api/stocks/search/?q=app&limit=10
+        (?symbol= se sigue aceptando en lugar de ?q=)
         """
-        symbol = request.query_params.get('symbol')
+        query = request.query_params.get('q') or request.query_params.get('symbol')
         
-        if not symbol:
+        if not query:
             return Response({
                 'success': False,
-                'message': 'Símbolo requerido'
+                'message': 'Texto de búsqueda requerido'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        max_results = getattr(settings, 'SYMBOL_DIRECTORY', {}).get('MAX_RESULTS', 20)
         try:
-            stock = YahooFinanceService.search_stock(symbol)
-            
-            if not stock:
-                return Response({
-                    'success': False,
-                    'message': f'No se encontró {symbol}'
-                }, status=status.HTTP_404_NOT_FOUND)
-            
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), max_results)
+        except ValueError:
+            limit = 10
+        
+        try:
+            results = SymbolDirectory.search(query, limit)
             return Response({
                 'success': True,
-                'stock': stock
+                'query': query,
+                'count': len(results),
+                'results': results
             })
         except Exception as e:
-            logger.error(f"Error buscando {symbol}: {str(e)}")
+            logger.error(f"Error buscando {query}: {str(e)}")
             return Response({
                 'success': False,
                 'message': 'Error buscando acción'
@@ -145,9 +216,11 @@ class StocksViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def history(self, request):
         """
-        Obtiene datos históricos de 1 año para una acción
-        GET /api/stocks/history/?symbol=AAPL
+        Obtiene datos históricos diarios de una acción (por defecto 1 año)
+        GET /api/stocks/history/?symbol=AAPL&period=6mo
+        GET /api/stocks/history/?symbol=AAPL&start=2024-01-01&end=2024-06-30
         Devuelve array de datos diarios con fecha, close, high, low, volume
+        o, con ?shape=columnar, un arreglo por campo ({dates: [], close: [], ...})
         """
         symbol = request.query_params.get('symbol')
         
@@ -158,13 +231,23 @@ class StocksViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            historical = YahooFinanceService.get_historical_data(symbol)
+            start, end = self._parse_range(request)
+            shape = self._parse_shape(request)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            historical = YahooFinanceService.get_historical_data(symbol, start, end, shape)
             
             return Response({
                 'success': True,
                 'symbol': symbol.upper(),
+                'shape': shape,
                 'historical': historical,
-                'count': len(historical),
+                'count': bars_count(historical),
                 'timestamp': datetime.now().isoformat()
             })
         except Exception as e:
@@ -181,6 +264,8 @@ class StocksViewSet(viewsets.ViewSet):
         """
         Obtiene información detallada de una acción incluyendo histórico
         GET /api/stocks/detail/?symbol=AAPL
+        GET /api/stocks/detail/?symbol=AAPL&fields=fundamentals,quote  (sin histórico)
+        Acepta los mismos parámetros de rango que /history/
         """
         symbol = request.query_params.get('symbol')
         
@@ -191,7 +276,17 @@ class StocksViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            stock = YahooFinanceService.get_stock_detail(symbol)
+            start, end = self._parse_range(request)
+            shape = self._parse_shape(request)
+            facets = self._parse_facets(request)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            stock = YahooFinanceService.get_stock_detail(symbol, start, end, shape, facets)
             
             # Ahora siempre retorna datos, aunque sean con N/A
             # No verifica si stock es None porque el servicio maneja todos los errores
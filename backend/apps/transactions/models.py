@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from apps.stocks.models import Stock
+from apps.users.balance import BalanceService
 from decimal import Decimal
 
 User = get_user_model()
@@ -22,23 +23,35 @@ class Transaction(models.Model):
     reference_code = models.CharField(max_length=20, blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Listados paginados por cursor sobre (-timestamp, -id)
+            models.Index(fields=["user", "-timestamp"], name="tx_user_timestamp_idx"),
+            models.Index(fields=["user", "stock", "-timestamp"], name="tx_user_stock_timestamp_idx"),
+            models.Index(fields=["user", "transaction_type", "-timestamp"], name="tx_user_type_timestamp_idx"),
+            models.Index(fields=["-timestamp"], name="tx_timestamp_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if self.transaction_type in ["buy", "sell"] and self.stock and self.quantity:
             self.price = self.stock.current_price
             self.total = round(self.price * self.quantity, 2)
 
-        super().save(*args, **kwargs)
-
-        if self.transaction_type == "buy":
-            self.user.balance = round(self.user.balance - self.total, 2)
-        elif self.transaction_type == "sell":
-            self.user.balance = round(self.user.balance + self.total, 2)
-        elif self.transaction_type == "deposit":
-            self.user.balance = round(self.user.balance + (self.total or 0), 2)
-        elif self.transaction_type == "withdraw":
-            self.user.balance = round(self.user.balance - (self.total or 0), 2)
-
-        self.user.save()
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Money only moves when the transaction is first recorded
+            if adding and self.total:
+                reference = f"transaction:{self.pk}"
+                if self.transaction_type == "buy":
+                    BalanceService.debit(self.user_id, self.total, reference=reference)
+                elif self.transaction_type == "sell":
+                    BalanceService.credit(self.user_id, self.total, reference=reference)
+                elif self.transaction_type == "deposit":
+                    BalanceService.deposit(self.user_id, self.total, reference=reference)
+                elif self.transaction_type == "withdraw":
+                    BalanceService.withdraw(self.user_id, self.total, reference=reference)
 
     def __str__(self):
         return f"{self.transaction_type} - {self.user.username} - {self.total}"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Transaction
 from apps.stocks.models import Stock
+from apps.users.balance import BalanceService
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,7 +23,8 @@ class TransactionSerializer(serializers.ModelSerializer):
 
         if tx_type == "buy" and stock and quantity:
             total_cost = stock.current_price * quantity
-            if user.balance < total_cost:
+            # Early check for a clear message; the debit itself is conditional
+            if BalanceService.get_available(user) < total_cost:
                 raise serializers.ValidationError("Saldo insuficiente para realizar la compra.")
 
         if tx_type == "sell" and stock and quantity:
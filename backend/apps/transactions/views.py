@@ -1,22 +1,35 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, serializers
+from apps.users.balance import InsufficientFunds
+from apps.common.pagination import TransactionPagination
 from .models import Transaction
 from .serializers import TransactionSerializer
 
 class TransactionListView(generics.ListAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TransactionPagination
 
     def get_queryset(self):
-        # Show transactions
+        # Show transactions; the paginator orders by (-timestamp, -id)
         user = self.request.user
-        return Transaction.objects.filter(user=user).order_by("-timestamp")
+        queryset = Transaction.objects.filter(user=user).select_related("stock")
+        symbol = self.request.query_params.get("symbol")
+        transaction_type = self.request.query_params.get("type")
+        if symbol:
+            queryset = queryset.filter(stock__symbol=symbol.upper())
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+        return queryset
 
 class TransactionCreateView(generics.CreateAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        try:
+            serializer.save(user=self.request.user)
+        except InsufficientFunds:
+            raise serializers.ValidationError("Saldo insuficiente para realizar la compra.")
 
 class TransactionDetailView(generics.RetrieveAPIView):
     serializer_class = TransactionSerializer
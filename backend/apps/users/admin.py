@@ -1,4 +1,31 @@
-from django.contrib import admin
-from .models import Profile
+from django.apps import apps
+from django.contrib import admin, messages
+from .models import User
 
-admin.site.register(Profile)
\ No newline at end of file
+# Profile todavía no está en models.py (ver signals.py)
+try:
+    admin.site.register(apps.get_model('users', 'Profile'))
+except LookupError:
+    pass
+
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    list_display = ('email', 'username', 'role', 'status', 'is_active', 'date_joined')
+    list_filter = ('role', 'status', 'is_active')
+    search_fields = ('email', 'username', 'first_name', 'last_name')
+    actions = ['remove_users']
+
+    def delete_model(self, request, obj):
+        obj.remove()
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            user.remove()
+
+    @admin.action(description='Eliminar (o dar de baja si tienen movimientos)')
+    def remove_users(self, request, queryset):
+        # El borrado estándar del admin se niega ante los asientos protegidos
+        deleted = sum(1 for user in queryset if user.remove())
+        kept = len(queryset) - deleted
+        self.message_user(request, f'{deleted} usuarios eliminados, {kept} dados de baja', messages.SUCCESS)
@@ -0,0 +1,270 @@
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (desarrollo con un solo proceso)
+    fcntl = None
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+
+def _config():
+    return getattr(settings, 'AUDIT_LOG', {})
+
+
+def _try_lock(f):
+    """Bloqueo exclusivo sin esperar; False si otro proceso tiene el archivo"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class AuditLogWriter:
+    """
+    Escritura diferida de SecurityLog para log_action.
+
+    Los ids de UserAction se leen una vez y quedan en memoria (la tabla casi
+    no cambia). Cada registro se agrega a un archivo de spool del proceso
+    (JSONL en SPOOL_DIR) y a un búfer en memoria; un hilo lo vacía con
+    bulk_create cada FLUSH_INTERVAL_MS o al juntar BATCH_SIZE registros, y
+    solo entonces descarta el spool. Si el proceso muere antes, el spool queda
+    en disco y lo reinserta el siguiente writer que arranque (o la tarea
+    replay_audit_spool). La entrega es "al menos una vez": una caída justo
+    después del bulk_create puede duplicar ese lote.
+
+    Cada arranque usa su propio nombre (host y un uuid) y mantiene un flock
+    exclusivo sobre su spool y sobre el lote que está insertando. Un archivo
+    sin bloqueo es de un proceso muerto o de un lote que falló; el pid no
+    sirve porque web y worker comparten SPOOL_DIR desde contenedores con
+    espacios de pid distintos.
+    """
+
+    def __init__(self, spool_dir, flush_interval=0.2, batch_size=100, max_buffer=5000):
+        self.spool_dir = Path(spool_dir)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self._actions = None
+        self._buffer = []
+        self._spool = None
+        self._spool_name = None
+        self._pid = None
+        self._flushing = threading.Lock()
+        self._cond = threading.Condition()
+        self._thread = None
+        # Hay lotes .pending propios que fallaron y hay que reintentar
+        self._retry_pending = False
+
+    # --- UserAction en memoria ---
+
+    def _action_id(self, name):
+        from .models import UserAction
+
+        actions = self._actions
+        if actions is None or name not in actions:
+            # Primera vez o acción nueva: se recarga la tabla entera
+            actions = self._actions = dict(UserAction.objects.values_list('name', 'id'))
+        if name not in actions:
+            raise UserAction.DoesNotExist(f"UserAction '{name}' no existe")
+        return actions[name]
+
+    # --- spool y búfer ---
+
+    def _spool_path(self):
+        return self.spool_dir / self._spool_name
+
+    def _open_spool(self):
+        spool = open(self._spool_path(), 'a', encoding='utf-8')
+        _try_lock(spool)
+        return spool
+
+    def _start(self):
+        """Arranca (o rearranca tras un fork) el spool y el hilo de este proceso"""
+        if self._spool is not None:
+            # Heredado del padre: el bloqueo sigue siendo suyo mientras viva
+            self._spool.close()
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._buffer = []
+        self._spool_name = f"audit-{socket.gethostname()}-{uuid.uuid4().hex}.jsonl"
+        path = self._spool_path()
+        if path.exists():
+            # No debería pasar con el uuid; si pasa, lo ajeno queda para reinsertar
+            os.replace(path, path.with_suffix(f'.{time.time_ns()}.pending'))
+        self._spool = self._open_spool()
+        self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+        # Lo que dejaron procesos anteriores que murieron
+        threading.Thread(target=self._replay_once, name='audit-log-replay', daemon=True).start()
+
+    def _replay_once(self):
+        try:
+            self.replay_spool()
+        except Exception as e:
+            logger.error(f"Error reinsertando el spool de auditoría: {str(e)}")
+        finally:
+            connection.close()
+
+    def log(self, user, action_name, ip, user_agent):
+        user_id = getattr(user, 'pk', user)
+        record = {
+            # UUID u otro tipo no serializable a JSON se guarda como texto
+            'user_id': user_id if user_id is None or isinstance(user_id, int) else str(user_id),
+            'action_id': self._action_id(action_name),
+            'ip': ip,
+            'user_agent': user_agent,
+        }
+
+        with self._cond:
+            if self._pid != os.getpid():
+                self._start()
+            self._spool.write(json.dumps(record) + '\n')
+            self._spool.flush()
+            self._buffer.append(record)
+            pending = len(self._buffer)
+            if pending >= self.batch_size:
+                self._cond.notify()
+
+        if pending >= self.max_buffer:
+            # La base no da abasto: quien registra ayuda a vaciar. Si falla,
+            # el lote queda en su .pending y la petición sigue igual
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error guardando registros de auditoría: {str(e)}")
+                self._retry_pending = True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait(self.flush_interval)
+            try:
+                close_old_connections()
+                if self._retry_pending:
+                    self._retry_pending = False
+                    self.replay_spool()
+                self.flush()
+            except Exception as e:
+                # El lote quedó en su archivo .pending: se reintenta desde ahí
+                logger.error(f"Error guardando registros de auditoría: {str(e)}")
+                self._retry_pending = True
+                time.sleep(self.flush_interval)
+
+    def flush(self):
+        """Inserta lo acumulado; el spool del lote se borra solo si se guardó"""
+        with self._flushing:
+            with self._cond:
+                if not self._buffer or self._pid != os.getpid():
+                    return 0
+                # El spool actual pasa a ser el del lote y se abre uno nuevo.
+                # El lote sigue abierto (y bloqueado) hasta terminar el insert.
+                batch_path = self._spool_path().with_suffix(f'.{time.time_ns()}.pending')
+                os.replace(self._spool_path(), batch_path)
+                batch = self._spool
+                try:
+                    self._spool = self._open_spool()
+                except Exception:
+                    # Se sigue escribiendo en el mismo archivo con su nombre nuevo
+                    self._spool_name = batch_path.name
+                    raise
+                records, self._buffer = self._buffer, []
+
+            try:
+                self._insert(records)
+                batch_path.unlink(missing_ok=True)
+            finally:
+                # Si el insert falló, sin bloqueo el lote queda para replay_spool
+                batch.close()
+            return len(records)
+
+    @staticmethod
+    def _insert(records):
+        from .models import SecurityLog
+
+        SecurityLog.objects.bulk_create(
+            [SecurityLog(**record) for record in records],
+            batch_size=500,
+        )
+
+    def replay_spool(self):
+        """
+        Reinserta los spools de procesos muertos y los lotes que no se
+        guardaron. Solo se toma un archivo si se consigue su flock: el de un
+        writer vivo (incluido el de este proceso) está bloqueado, y dos
+        procesos no procesan el mismo a la vez. Mientras tanto este proceso
+        no vacía su búfer.
+
+        Returns:
+            int: registros reinsertados
+        """
+        if not self.spool_dir.exists():
+            return 0
+        replayed = 0
+        with self._flushing:
+            for path in sorted(self.spool_dir.glob('audit-*')):
+                if fcntl is None and path.name == self._spool_name:
+                    continue
+                try:
+                    f = open(path, encoding='utf-8')
+                except FileNotFoundError:
+                    continue
+
+                with f:
+                    if not _try_lock(f):
+                        continue
+                    try:
+                        if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                            # Renombrado o ya reinsertado mientras se esperaba
+                            continue
+                    except FileNotFoundError:
+                        continue
+
+                    try:
+                        records = [json.loads(line) for line in f if line.strip()]
+                        if records:
+                            self._insert(records)
+                        path.unlink()
+                        replayed += len(records)
+                    except Exception as e:
+                        self._retry_pending = True
+                        logger.error(f"No se pudo reinsertar el spool de auditoría {path.name}: {str(e)}")
+
+        if replayed:
+            logger.info(f"Registros de auditoría reinsertados desde el spool: {replayed}")
+        return replayed
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """Writer compartido según settings.AUDIT_LOG"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config = _config()
+                _writer = AuditLogWriter(
+                    config.get('SPOOL_DIR', Path(settings.LOGS_DIR) / 'audit'),
+                    flush_interval=config.get('FLUSH_INTERVAL_MS', 200) / 1000,
+                    batch_size=config.get('BATCH_SIZE', 100),
+                    max_buffer=config.get('MAX_BUFFER', 5000),
+                )
+    return _writer
@@ -1,8 +1,8 @@
-import jwt
-import requests
-from django.conf import settings
 from rest_framework import authentication, exceptions
 
+from apps.users.jwks import decode_auth0_token
+from apps.users.token_cache import get_token_cache
+
 class Auth0JWTAuthentication(authentication.BaseAuthentication):
     """
     Valida el token de Auth0 almacenado en la cookie 'access_token'.
@@ -13,36 +13,15 @@ class Auth0JWTAuthentication(authentication.BaseAuthentication):
         if not token:
             return None
 
+        cache = get_token_cache()
+        cached = cache.get(token)
+        if cached is not None:
+            user, _ = cached
+            return (user, token)
+
         try:
-            jwks_url = f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json"
-            jwks = requests.get(jwks_url, timeout=5).json()
-
-            unverified_header = jwt.get_unverified_header(token)
-            rsa_key = next(
-                (
-                    {
-                        "kty": key["kty"],
-                        "kid": key["kid"],
-                        "use": key["use"],
-                        "n": key["n"],
-                        "e": key["e"],
-                    }
-                    for key in jwks["keys"]
-                    if key["kid"] == unverified_header["kid"]
-                ),
-                None,
-            )
-
-            if not rsa_key:
-                raise exceptions.AuthenticationFailed("No se encontró la clave pública de Auth0.")
-
-            payload = jwt.decode(
-                token,
-                key=jwt.algorithms.RSAAlgorithm.from_jwk(rsa_key),
-                algorithms=["RS256"],
-                issuer=f"https://{settings.AUTH0_DOMAIN}/",
-                options={"verify_aud": False},
-            )
+            # Llaves de Auth0 en caché del proceso: verificar es solo CPU
+            payload = decode_auth0_token(token)
 
             auth0_id = payload.get("sub")
             if not auth0_id:
@@ -50,11 +29,13 @@ class Auth0JWTAuthentication(authentication.BaseAuthentication):
 
             from apps.users.models import Profile
 
-            profile = Profile.objects.filter(auth0_id=auth0_id).first()
+            # Perfil y usuario en una sola consulta
+            profile = Profile.objects.select_related("user").filter(auth0_id=auth0_id).first()
             if not profile:
                 raise exceptions.AuthenticationFailed("Usuario no registrado en el sistema.")
 
+            cache.set(token, profile.user, payload)
             return (profile.user, token)
 
         except Exception as e:
-            raise exceptions.AuthenticationFailed(f"Token inválido o expirado: {e}")
\ No newline at end of file
+            raise exceptions.AuthenticationFailed(f"Token inválido o expirado: {e}")
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from kombu.exceptions import ChannelError
+
+logger = logging.getLogger(__name__)
+
+# Respuestas de Auth0 que vale la pena reintentar
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RevocationFailed(Exception):
+    """Auth0 no respondió o respondió con un error temporal; se puede reintentar"""
+
+
+def _config():
+    return getattr(settings, 'AUTH0_REVOKE', {})
+
+
+def revoke_token(token):
+    """
+    Revoca el token en Auth0 (o en la URL de AUTH0_REVOKE, p. ej. el revoke
+    falso de desarrollo) con tiempo de espera acotado.
+
+    Returns:
+        bool: True si quedó revocado, False si Auth0 lo rechazó (no se reintenta)
+
+    Raises:
+        RevocationFailed: error de red, 429 o 5xx
+    """
+    config = _config()
+    try:
+        resp = requests.post(
+            config.get('URL', f"https://{settings.AUTH0_DOMAIN}/oauth/revoke"),
+            data={
+                "client_id": settings.AUTH0_CLIENT_ID,
+                "client_secret": settings.AUTH0_CLIENT_SECRET,
+                "token": token,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            timeout=config.get('TIMEOUT', 5),
+        )
+    except requests.RequestException as e:
+        raise RevocationFailed(str(e)) from e
+
+    if resp.status_code in (200, 204):
+        return True
+    if resp.status_code in RETRY_STATUS:
+        raise RevocationFailed(f"Auth0 respondió {resp.status_code}")
+    logger.warning(f"Auth0 rechazó la revocación del token ({resp.status_code}): {resp.text[:200]}")
+    return False
+
+
+class _QueueSize:
+    """
+    Tamaño de la cola de revocaciones, consultado al broker como mucho una vez
+    por segundo y con un timeout corto. Si el broker no responde devuelve
+    None hasta la próxima consulta, así solo una petición por segundo espera.
+    """
+
+    def __init__(self, ttl=1.0):
+        self.ttl = ttl
+        self._value = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, app, queue, timeout=0.5):
+        now = time.monotonic()
+        if now - self._checked_at < self.ttl:
+            return self._value
+        with self._lock:
+            if now - self._checked_at >= self.ttl:
+                try:
+                    self._value = self._probe(app, queue, timeout)
+                except Exception as e:
+                    logger.warning(f"No se pudo consultar la cola de revocaciones: {str(e)}")
+                    self._value = None
+                finally:
+                    self._checked_at = time.monotonic()
+        return self._value
+
+    @staticmethod
+    def _probe(app, queue, timeout):
+        # Un solo intento: sin max_retries kombu reintenta la conexión
+        with app.connection_for_read(
+            connect_timeout=timeout,
+            transport_options={'max_retries': 0, 'socket_timeout': timeout},
+        ) as conn:
+            try:
+                return conn.default_channel.queue_declare(queue=queue, passive=True).message_count
+            except ChannelError:
+                # En Redis una cola vacía no existe hasta el primer mensaje
+                return 0
+
+    def bump(self):
+        if self._value is not None:
+            self._value += 1
+
+
+_queue_size = _QueueSize()
+
+
+def enqueue_revocation(token):
+    """
+    Encola la revocación del token sin bloquear la petición.
+
+    La cola es acotada: con MAX_QUEUE revocaciones pendientes (Auth0 caído o
+    lento) se descarta la nueva y se registra; el token igual vence solo.
+    Un broker caído tampoco bloquea: si no respondió a la consulta del tamaño
+    (SIZE_TIMEOUT) se descarta sin publicar, y si no, se publica sin reintentos.
+
+    Returns:
+        bool: True si quedó encolada
+    """
+    from .tasks import revoke_auth0_token
+
+    if not token:
+        return False
+    config = _config()
+    queue = config.get('QUEUE', 'auth0')
+    try:
+        size = _queue_size.get(revoke_auth0_token.app, queue, config.get('SIZE_TIMEOUT', 0.5))
+        if size is None:
+            logger.warning("Broker no disponible; se descarta la revocación del token de Auth0")
+            return False
+        if size >= config.get('MAX_QUEUE', 1000):
+            logger.warning("Cola de revocaciones de Auth0 llena; se descarta la revocación")
+            return False
+        revoke_auth0_token.apply_async(
+            (token,),
+            queue=queue,
+            expires=config.get('EXPIRES', 3600),
+            retry=False,
+        )
+    except Exception as e:
+        logger.error(f"No se pudo encolar la revocación del token de Auth0: {str(e)}")
+        return False
+    _queue_size.bump()
+    return True
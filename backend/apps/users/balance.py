@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .ledger import Ledger
+from .models import LedgerEntry, UserBalance
+
+
+class InsufficientFunds(Exception):
+    """El saldo disponible no alcanza para el débito"""
+
+    def __init__(self, available, requested):
+        self.available = available
+        self.requested = requested
+        super().__init__(f"Saldo insuficiente: disponible {available}, requerido {requested}")
+
+
+def _amount(value):
+    amount = Decimal(str(value)).quantize(Decimal('0.01'))
+    if amount <= 0:
+        raise ValueError("El monto debe ser mayor a cero")
+    return amount
+
+
+class BalanceService:
+    """
+    Único punto para mover dinero del saldo de un usuario (tabla user_balances).
+
+    Cada movimiento es un solo UPDATE con expresiones F() sobre la fila del
+    saldo, así dos operaciones simultáneas no se pisan (no hay leer-modificar-
+    guardar en Python) y no se reescribe la fila del usuario. Los débitos
+    llevan la condición de saldo suficiente en el mismo UPDATE: si no afecta
+    filas, el saldo no alcanzaba. Cada movimiento queda además en el libro
+    mayor (apps.users.ledger) dentro de la misma transacción.
+    """
+
+    @staticmethod
+    def _user_id(user):
+        return getattr(user, 'pk', user)
+
+    @staticmethod
+    def _update(user_id, delta, kind, reference='', require=None):
+        """
+        Aplica delta en una sola sentencia (con require, solo si
+        available_balance >= require) y lo registra en el libro mayor.
+        Devuelve el saldo resultante o None si no se cumplió la condición.
+        """
+        values = {
+            'available_balance': F('available_balance') + delta,
+            'updated_at': timezone.now(),
+        }
+        if kind == LedgerEntry.DEPOSIT:
+            values['total_deposits'] = F('total_deposits') + delta
+        elif kind == LedgerEntry.WITHDRAWAL:
+            values['total_withdrawals'] = F('total_withdrawals') - delta
+
+        with transaction.atomic():
+            rows = UserBalance.objects.filter(user_id=user_id)
+            if require is not None:
+                rows = rows.filter(available_balance__gte=require)
+            if not rows.update(**values):
+                return None
+            # La fila queda bloqueada por el UPDATE hasta el commit: la lectura
+            # es consistente y los asientos del usuario salen en orden
+            balance = UserBalance.objects.filter(user_id=user_id).values_list('available_balance', flat=True).get()
+            Ledger.post(user_id, delta, balance, kind, reference)
+            return balance
+
+    @staticmethod
+    def get_available(user):
+        """Saldo disponible actual (0 si el usuario aún no tiene fila de saldo)"""
+        value = (
+            UserBalance.objects.filter(user_id=BalanceService._user_id(user))
+            .values_list('available_balance', flat=True)
+            .first()
+        )
+        return value if value is not None else Decimal('0')
+
+    @staticmethod
+    def credit(user, amount, kind=LedgerEntry.TRADE, reference=''):
+        """
+        Suma amount al saldo disponible. kind es el tipo de asiento
+        (LedgerEntry.KIND_CHOICES); los depósitos además suman a total_deposits.
+
+        Returns:
+            Decimal: saldo disponible resultante
+        """
+        user_id = BalanceService._user_id(user)
+        amount = _amount(amount)
+
+        balance = BalanceService._update(user_id, amount, kind, reference)
+        if balance is None:
+            UserBalance.objects.get_or_create(user_id=user_id)
+            balance = BalanceService._update(user_id, amount, kind, reference)
+        return balance
+
+    @staticmethod
+    def debit(user, amount, kind=LedgerEntry.TRADE, reference=''):
+        """
+        Resta amount del saldo disponible si alcanza; si no, lanza
+        InsufficientFunds sin modificar nada. Los retiros además suman a
+        total_withdrawals.
+
+        Returns:
+            Decimal: saldo disponible resultante
+        """
+        user_id = BalanceService._user_id(user)
+        amount = _amount(amount)
+
+        balance = BalanceService._update(user_id, -amount, kind, reference, require=amount)
+        if balance is None:
+            raise InsufficientFunds(BalanceService.get_available(user_id), amount)
+        return balance
+
+    @staticmethod
+    def deposit(user, amount, reference=''):
+        return BalanceService.credit(user, amount, LedgerEntry.DEPOSIT, reference)
+
+    @staticmethod
+    def withdraw(user, amount, reference=''):
+        return BalanceService.debit(user, amount, LedgerEntry.WITHDRAWAL, reference)
@@ -0,0 +1,163 @@
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _config():
+    return getattr(settings, 'IDEMPOTENCY', {})
+
+
+def _request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _render(view, request, response):
+    """
+    Contenido renderizado de la respuesta de la vista. DRF la renderiza
+    después (finalize_response) con el mismo renderer negociado, así que los
+    bytes guardados son los que recibe el cliente.
+    """
+    if not isinstance(response, Response):
+        return bytes(response.content), response.get('Content-Type', '')
+    response.accepted_renderer = request.accepted_renderer
+    response.accepted_media_type = request.accepted_media_type
+    response.renderer_context = view.get_renderer_context()
+    content = response.rendered_content
+    return bytes(content), response['Content-Type']
+
+
+def _replay(record):
+    response = HttpResponse(
+        bytes(record.response_content or b''),
+        status=record.response_status,
+        content_type=record.response_content_type or None,
+    )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _error(message, code):
+    return Response({'success': False, 'message': message}, status=code)
+
+
+def _claim(request, key, endpoint, request_hash):
+    """
+    Registra la llave como en proceso. Si ya existía devuelve el registro
+    existente; si está vencida la borra y la registra de nuevo, y si quedó
+    en proceso de un intento que murió (más de LOCK_TIMEOUT segundos) la
+    toma para este intento.
+
+    Returns:
+        tuple: (registro, True si este intento debe ejecutar la vista)
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=request.user,
+                key=key,
+                endpoint=endpoint,
+                request_hash=request_hash,
+                locked_at=now,
+                expires_at=now + timedelta(hours=_config().get('TTL_HOURS', 24)),
+            )
+        return record, True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+    if record is None:
+        # Se borró (vencida) entre el insert y la lectura: que el cliente reintente
+        return None, False
+    if record.expires_at <= now:
+        # Vencida aunque purge_expired no haya pasado: como si no existiera
+        IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+        return _claim(request, key, endpoint, request_hash)
+    if record.status == IdempotencyKey.PROCESSING and record.request_hash == request_hash:
+        stale_before = now - timedelta(seconds=_config().get('LOCK_TIMEOUT', 60))
+        taken = IdempotencyKey.objects.filter(
+            pk=record.pk, status=IdempotencyKey.PROCESSING, locked_at__lt=stale_before
+        ).update(locked_at=now)
+        if taken:
+            record.locked_at = now
+            return record, True
+    return record, False
+
+
+def idempotent(view_method):
+    """
+    Hace reintentable un POST de DRF con la cabecera Idempotency-Key.
+
+    El primer intento con una llave ejecuta la vista y guarda su respuesta en
+    la misma transacción que la operación, así no puede quedar la operación
+    hecha sin su respuesta guardada (ni al revés). Los reintentos con la misma
+    llave y el mismo cuerpo reciben la respuesta guardada sin volver a
+    escribir nada; con otro cuerpo reciben 422 y, si el primer intento sigue
+    en curso, 409. Sin cabecera la vista se ejecuta como siempre.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(f'{HEADER} admite hasta {MAX_KEY_LENGTH} caracteres', status.HTTP_400_BAD_REQUEST)
+
+        endpoint = f"{request.method} {request.path}"
+        request_hash = _request_hash(request)
+        record, owner = _claim(request, key, endpoint, request_hash)
+
+        if record is None:
+            return _error('Operación en curso, reintenta', status.HTTP_409_CONFLICT)
+        if record.endpoint != endpoint or record.request_hash != request_hash:
+            return _error(f'{HEADER} ya se usó con otra petición', status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if not owner:
+            if record.status == IdempotencyKey.COMPLETED:
+                return _replay(record)
+            return _error('Operación en curso, reintenta', status.HTTP_409_CONFLICT)
+
+        try:
+            with transaction.atomic():
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code >= 500:
+                    # Error del servidor: no se guarda, el reintento vuelve a ejecutar
+                    transaction.set_rollback(True)
+                else:
+                    record.status = IdempotencyKey.COMPLETED
+                    record.response_status = response.status_code
+                    record.response_content, record.response_content_type = _render(self, request, response)
+                    record.save(update_fields=['status', 'response_status', 'response_content', 'response_content_type'])
+        except Exception:
+            IdempotencyKey.objects.filter(pk=record.pk, status=IdempotencyKey.PROCESSING).delete()
+            raise
+
+        if response.status_code >= 500:
+            IdempotencyKey.objects.filter(pk=record.pk, status=IdempotencyKey.PROCESSING).delete()
+        return response
+
+    return wrapper
+
+
+def purge_expired():
+    """Borra las llaves vencidas; devuelve cuántas"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lt=timezone.now()).delete()
+    logger.info(f"Llaves de idempotencia vencidas borradas: {deleted}")
+    return deleted
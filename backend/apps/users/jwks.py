@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+
+import jwt
+import requests
+from django.conf import settings
+from jwt.algorithms import RSAAlgorithm
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownSigningKey(jwt.InvalidTokenError):
+    """El kid del token no está en el JWKS de Auth0, ni después de volver a pedirlo"""
+
+
+class JWKSCache:
+    """
+    Llaves públicas de Auth0 (JWKS) ya convertidas a objetos de llave, por kid.
+
+    Se descargan una vez por proceso y se renuevan en segundo plano cuando
+    se acerca el TTL, así verificar un token es solo trabajo de CPU. Un kid
+    desconocido (Auth0 rotó las llaves) provoca una descarga inmediata, como
+    mucho una cada MIN_REFETCH_INTERVAL segundos para que tokens con kid
+    inventado no se conviertan en peticiones a Auth0; el mismo límite
+    aplica mientras no haya ninguna llave. Si Auth0 falla se siguen usando
+    las llaves anteriores.
+    """
+
+    def __init__(self, url, ttl=600, refresh_ahead=60, min_refetch_interval=30, timeout=5):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._refreshing = False
+        # _lock serializa las descargas en línea; _flag_lock solo protege _refreshing
+        self._lock = threading.Lock()
+        self._flag_lock = threading.Lock()
+
+    def _download(self):
+        """Descarga y convierte el JWKS; devuelve {kid: llave}"""
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json().get('keys', []):
+            if jwk.get('kty') != 'RSA' or jwk.get('use', 'sig') != 'sig' or 'kid' not in jwk:
+                continue
+            keys[jwk['kid']] = RSAAlgorithm.from_jwk(jwk)
+        return keys
+
+    def refresh(self):
+        """Descarga el JWKS y reemplaza el juego de llaves; False si falló"""
+        self._last_attempt = time.monotonic()
+        try:
+            keys = self._download()
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el JWKS de Auth0: {str(e)}")
+            return False
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        return True
+
+    def _refresh_in_background(self):
+        with self._flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='jwks-refresh', daemon=True).start()
+
+    def get_key(self, kid):
+        """Llave pública para kid; lanza UnknownSigningKey si Auth0 no la publica"""
+        key = self._keys.get(kid)
+        age = time.monotonic() - self._fetched_at
+
+        if key is not None:
+            if age > self.ttl - self.refresh_ahead:
+                self._refresh_in_background()
+            return key
+
+        # Sin llaves todavía o kid nuevo: descarga en línea, una sola a la vez.
+        # También sin llaves se respeta MIN_REFETCH_INTERVAL: si Auth0 está
+        # caído al arrancar, cada petición no espera su propio timeout.
+        with self._lock:
+            key = self._keys.get(kid)
+            if key is None and (
+                not self._last_attempt or time.monotonic() - self._last_attempt >= self.min_refetch_interval
+            ):
+                self.refresh()
+                key = self._keys.get(kid)
+
+        if key is None:
+            raise UnknownSigningKey("No se encontró la clave pública de Auth0.")
+        return key
+
+    def stats(self):
+        return {
+            'keys': len(self._keys),
+            'age': round(time.monotonic() - self._fetched_at, 1) if self._fetched_at else None,
+            'refreshing': self._refreshing,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_jwks_cache():
+    """Caché compartida del JWKS de settings.AUTH0_DOMAIN según settings.AUTH0_JWKS"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = getattr(settings, 'AUTH0_JWKS', {})
+                _cache = JWKSCache(
+                    f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json",
+                    ttl=config.get('TTL', 600),
+                    refresh_ahead=config.get('REFRESH_AHEAD', 60),
+                    min_refetch_interval=config.get('MIN_REFETCH_INTERVAL', 30),
+                    timeout=config.get('TIMEOUT', 5),
+                )
+    return _cache
+
+
+def decode_auth0_token(token):
+    """
+    Verifica firma, emisor y expiración de un token de Auth0 con las llaves
+    en caché. Lanza jwt.InvalidTokenError (o una subclase) si no es válido.
+
+    Returns:
+        dict: claims del token
+    """
+    header = jwt.get_unverified_header(token)
+    if 'kid' not in header:
+        raise UnknownSigningKey("El token no indica su clave (kid).")
+
+    return jwt.decode(
+        token,
+        key=get_jwks_cache().get_key(header['kid']),
+        algorithms=["RS256"],
+        issuer=f"https://{settings.AUTH0_DOMAIN}/",
+        options={"verify_aud": False},
+    )
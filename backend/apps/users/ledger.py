@@ -0,0 +1,165 @@
+import logging
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import LedgerAccount, LedgerEntry, UserBalance
+
+logger = logging.getLogger(__name__)
+
+# Contraparte de cada tipo de movimiento
+COUNTERPARTS = {
+    LedgerEntry.DEPOSIT: LedgerAccount.EXTERNAL,
+    LedgerEntry.WITHDRAWAL: LedgerAccount.EXTERNAL,
+    LedgerEntry.TRADE: LedgerAccount.MARKET,
+    LedgerEntry.BONUS: LedgerAccount.PROMOTIONS,
+    LedgerEntry.OPENING: LedgerAccount.EXTERNAL,
+    LedgerEntry.ADJUSTMENT: LedgerAccount.EXTERNAL,
+}
+
+
+class Ledger:
+    """
+    Libro mayor de partida doble del efectivo de los usuarios.
+
+    UserBalance.available_balance queda como caché del saldo; la fuente de
+    verdad son los asientos. BalanceService registra cada movimiento aquí en
+    la misma transacción en que actualiza el saldo.
+    """
+
+    # Cuentas por tanda en la verificación
+    VERIFY_CHUNK_SIZE = 1000
+
+    @staticmethod
+    def system_account(kind):
+        # Sin caché por proceso: un id guardado de una transacción revertida
+        # apuntaría a una cuenta que no existe. La restricción parcial
+        # ledger_system_account_uniq hace seguro el get_or_create concurrente.
+        account, _ = LedgerAccount.objects.get_or_create(user=None, kind=kind)
+        return account.pk
+
+    @staticmethod
+    def account_id(user_id):
+        account, _ = LedgerAccount.objects.get_or_create(user_id=user_id, defaults={'kind': LedgerAccount.CASH})
+        return account.pk
+
+    @staticmethod
+    def post(user_id, amount, balance_after, kind, reference=''):
+        """
+        Registra un movimiento de amount (con signo) en la cuenta del usuario
+        y su contrapartida. Debe llamarse dentro de la transacción que tiene
+        bloqueada la fila de UserBalance del usuario (el UPDATE de
+        BalanceService), que es lo que serializa la secuencia de la cuenta.
+        """
+        account_id = Ledger.account_id(user_id)
+        last = (
+            LedgerEntry.objects.filter(account_id=account_id)
+            .order_by('-sequence')
+            .values_list('sequence', flat=True)
+            .first()
+        )
+        journal = uuid.uuid4()
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                account_id=account_id,
+                journal=journal,
+                sequence=(last or 0) + 1,
+                kind=kind,
+                amount=amount,
+                balance_after=balance_after,
+                reference=reference,
+            ),
+            LedgerEntry(
+                account_id=Ledger.system_account(COUNTERPARTS[kind]),
+                journal=journal,
+                kind=kind,
+                amount=-amount,
+                reference=reference,
+            ),
+        ])
+
+    @staticmethod
+    def balance(user):
+        """Saldo según el último asiento de la cuenta del usuario"""
+        value = (
+            LedgerEntry.objects.filter(account__user_id=getattr(user, 'pk', user))
+            .order_by('-sequence')
+            .values_list('balance_after', flat=True)
+            .first()
+        )
+        return value if value is not None else Decimal('0')
+
+    @staticmethod
+    def history(user, since=None, until=None):
+        """Asientos de la cuenta del usuario entre since y until (índice account, created_at)"""
+        entries = LedgerEntry.objects.filter(account__user_id=getattr(user, 'pk', user))
+        if since:
+            entries = entries.filter(created_at__gte=since)
+        if until:
+            entries = entries.filter(created_at__lt=until)
+        return entries
+
+    @staticmethod
+    def verify(journal_window_days=2):
+        """
+        Recalcula en bloque el saldo de cada cuenta de usuario (suma de sus
+        asientos) y lo compara con el saldo del último asiento y con
+        UserBalance. También revisa que los asientos recientes de cada journal
+        sumen cero y que no haya saldos sin cuenta en el libro.
+
+        Returns:
+            list: diferencias encontradas, [{'user_id', 'problem', ...}]
+        """
+        drift = []
+        latest = LedgerEntry.objects.filter(account=OuterRef('pk')).order_by('-sequence')
+
+        last_id = 0
+        while True:
+            accounts = list(
+                LedgerAccount.objects.filter(user__isnull=False, pk__gt=last_id)
+                .order_by('pk')
+                .annotate(
+                    total=Sum('entries__amount'),
+                    last_balance=Subquery(latest.values('balance_after')[:1]),
+                    cached=F('user__balance__available_balance'),
+                )
+                .values('pk', 'user_id', 'total', 'last_balance', 'cached')[:Ledger.VERIFY_CHUNK_SIZE]
+            )
+            if not accounts:
+                break
+            last_id = accounts[-1]['pk']
+
+            for account in accounts:
+                total = account['total'] or Decimal('0')
+                last_balance = account['last_balance'] or Decimal('0')
+                cached = account['cached'] or Decimal('0')
+                if total != last_balance or last_balance != cached:
+                    drift.append({
+                        'user_id': account['user_id'],
+                        'problem': 'balance',
+                        'entries_total': total,
+                        'last_balance': last_balance,
+                        'cached_balance': cached,
+                    })
+
+        orphaned = UserBalance.objects.exclude(available_balance=0).filter(user__ledger_account__isnull=True)
+        for user_id, cached in orphaned.values_list('user_id', 'available_balance'):
+            drift.append({'user_id': user_id, 'problem': 'no_account', 'cached_balance': cached})
+
+        since = timezone.now() - timedelta(days=journal_window_days)
+        unbalanced = (
+            LedgerEntry.objects.filter(created_at__gte=since)
+            .values('journal')
+            .annotate(total=Sum('amount'))
+            .exclude(total=0)
+        )
+        for row in unbalanced:
+            drift.append({'user_id': None, 'problem': 'unbalanced_journal', 'journal': row['journal'], 'total': row['total']})
+
+        for item in drift:
+            logger.error(f"Diferencia en el libro mayor: {item}")
+        logger.info(f"Verificación del libro mayor: {len(drift)} diferencias")
+        return drift
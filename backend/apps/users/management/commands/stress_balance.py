@@ -0,0 +1,99 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from apps.users.balance import BalanceService, InsufficientFunds
+from apps.users.ledger import Ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de BalanceService: muchos hilos moviendo el saldo de un "
+        "mismo usuario a la vez, y verificación de que no se pierde ningún "
+        "movimiento ni se descuadra el libro mayor. Usa un usuario temporal que "
+        "queda dado de baja al final. "
+        "Requiere PostgreSQL (SQLite serializa las escrituras)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help="Hilos simultáneos")
+        parser.add_argument('--operations', type=int, default=200, help="Movimientos por hilo")
+
+    def _worker(self, user_id, operations, barrier, counts, lock):
+        credited = debited = rejected = 0
+        try:
+            barrier.wait()
+            for _ in range(operations):
+                amount = Decimal(random.randint(1, 5))
+                if random.random() < 0.5:
+                    BalanceService.credit(user_id, amount)
+                    credited += amount
+                else:
+                    try:
+                        BalanceService.debit(user_id, amount)
+                        debited += amount
+                    except InsufficientFunds:
+                        rejected += 1
+        finally:
+            # Cada hilo usa su propia conexión
+            connection.close()
+        with lock:
+            counts['credited'] += credited
+            counts['debited'] += debited
+            counts['rejected'] += rejected
+
+    def _run(self, label, initial, threads, operations):
+        User = get_user_model()
+        suffix = uuid.uuid4().hex[:12]
+        user = User.objects.create(username=f'stress-{suffix}', email=f'stress-{suffix}@example.com')
+        try:
+            BalanceService.deposit(user, initial)
+
+            counts = {'credited': Decimal('0'), 'debited': Decimal('0'), 'rejected': 0}
+            lock = threading.Lock()
+            barrier = threading.Barrier(threads)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                futures = [
+                    pool.submit(self._worker, user.pk, operations, barrier, counts, lock)
+                    for _ in range(threads)
+                ]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - started
+
+            expected = initial + counts['credited'] - counts['debited']
+            final = BalanceService.get_available(user)
+            total_ops = threads * operations
+            self.stdout.write(
+                f"{label}: {total_ops} movimientos en {elapsed:.2f}s "
+                f"({total_ops / elapsed:.0f}/s), {counts['rejected']} débitos rechazados; "
+                f"saldo {final}, esperado {expected}"
+            )
+            if final != expected or final < 0:
+                raise CommandError(f"{label}: se perdieron movimientos (diferencia {final - expected})")
+            entries_total = Ledger.history(user).aggregate(total=Sum('amount'))['total']
+            if Ledger.balance(user) != final or entries_total != final:
+                raise CommandError(f"{label}: el libro mayor no cuadra con el saldo ({entries_total} vs {final})")
+        finally:
+            # El libro mayor no se borra: el usuario temporal queda dado de baja
+            user.remove()
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        operations = options['operations']
+
+        # Saldo holgado: ningún débito falla, el saldo final es exacto
+        self._run('holgado', Decimal('1000000'), threads, operations)
+        # Saldo justo: muchos débitos compiten por poco dinero, nunca debe quedar negativo
+        self._run('justo', Decimal('50'), threads, operations)
+
+        self.stdout.write(self.style.SUCCESS("Sin movimientos perdidos"))
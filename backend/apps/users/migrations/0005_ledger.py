@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def open_accounts(apps, schema_editor):
+    """Asiento de saldo inicial para cada saldo existente distinto de cero"""
+    UserBalance = apps.get_model('users', 'UserBalance')
+    LedgerAccount = apps.get_model('users', 'LedgerAccount')
+    LedgerEntry = apps.get_model('users', 'LedgerEntry')
+
+    external, _ = LedgerAccount.objects.get_or_create(user=None, kind='external')
+    balances = UserBalance.objects.exclude(available_balance=0).values_list('user_id', 'available_balance')
+    for user_id, amount in balances.iterator():
+        account = LedgerAccount.objects.create(user_id=user_id, kind='cash')
+        journal = uuid.uuid4()
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(account=account, journal=journal, sequence=1, kind='opening',
+                        amount=amount, balance_after=amount, reference='migration'),
+            LedgerEntry(account=external, journal=journal, kind='opening',
+                        amount=-amount, reference='migration'),
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0004_reportrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('cash', 'Efectivo del usuario'), ('external', 'Depósitos y retiros'), ('market', 'Compras y ventas'), ('promotions', 'Bonos y promociones')], default='cash', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_account', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'ledger_accounts',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ledgeraccount',
+            constraint=models.UniqueConstraint(condition=models.Q(user__isnull=True), fields=('kind',), name='ledger_system_account_uniq'),
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journal', models.UUIDField(db_index=True, default=uuid.uuid4)),
+                ('sequence', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('kind', models.CharField(choices=[('deposit', 'Depósito'), ('withdrawal', 'Retiro'), ('trade', 'Operación'), ('bonus', 'Bono'), ('opening', 'Saldo inicial'), ('adjustment', 'Ajuste')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('balance_after', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('reference', models.CharField(blank=True, default='', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='users.ledgeraccount')),
+            ],
+            options={
+                'db_table': 'ledger_entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(fields=('account', 'sequence'), name='ledger_entry_account_seq_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['account', 'created_at'], name='ledger_entry_account_time_idx'),
+        ),
+        migrations.RunPython(open_accounts, migrations.RunPython.noop),
+    ]
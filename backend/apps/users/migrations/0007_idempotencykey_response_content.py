@@ -0,0 +1,37 @@
+import json
+
+from django.db import migrations, models
+
+
+def forwards(apps, schema_editor):
+    # Las llaves viven horas: las completadas se pasan a JSON tal cual estaban guardadas
+    IdempotencyKey = apps.get_model('users', 'IdempotencyKey')
+    for record in IdempotencyKey.objects.exclude(response_body=None).iterator():
+        record.response_content = json.dumps(record.response_body).encode()
+        record.response_content_type = 'application/json'
+        record.save(update_fields=['response_content', 'response_content_type'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='response_content',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='response_content_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='idempotencykey',
+            name='response_body',
+        ),
+    ]
@@ -1,5 +1,5 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import EmailValidator
 from django.utils import timezone
@@ -73,6 +73,29 @@ class User(AbstractUser):
         """Marca el correo como verificado"""
         self.email_verified = True
         self.save()
+    
+    def soft_delete(self):
+        """Da de baja al usuario sin borrar la fila"""
+        self.status = 'deleted'
+        self.is_active = False
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['status', 'is_active', 'deleted_at', 'updated_at'])
+    
+    def remove(self):
+        """
+        Borra al usuario, o lo da de baja si tiene historial en el libro mayor.
+        
+        Los asientos no se borran nunca (LedgerAccount.user es PROTECT), así
+        que un usuario con movimientos queda con status 'deleted'. Devuelve
+        True si la fila se borró.
+        """
+        try:
+            with transaction.atomic():
+                self.delete()
+            return True
+        except models.ProtectedError:
+            self.soft_delete()
+            return False
 
 
 class PaymentMethod(models.Model):
@@ -155,19 +178,20 @@ class UserBalance(models.Model):
         return f"{self.user.email} - Balance: ${self.available_balance}"
     
     def add_balance(self, amount):
-        """Agrega dinero al balance disponible"""
-        self.available_balance += amount
-        self.total_deposits += amount
-        self.save()
+        """Agrega dinero al balance disponible (UPDATE atómico, ver BalanceService)"""
+        from .balance import BalanceService
+        BalanceService.deposit(self.user_id, amount)
+        self.refresh_from_db(fields=['available_balance', 'total_deposits', 'updated_at'])
     
     def subtract_balance(self, amount):
-        """Resta dinero del balance disponible"""
-        if self.available_balance >= amount:
-            self.available_balance -= amount
-            self.total_withdrawals += amount
-            self.save()
-            return True
-        return False
+        """Resta dinero del balance disponible si alcanza"""
+        from .balance import BalanceService, InsufficientFunds
+        try:
+            BalanceService.withdraw(self.user_id, amount)
+        except InsufficientFunds:
+            return False
+        self.refresh_from_db(fields=['available_balance', 'total_withdrawals', 'updated_at'])
+        return True
 
 
 class DepositTransaction(models.Model):
@@ -202,14 +226,21 @@ class DepositTransaction(models.Model):
     
     def complete_deposit(self):
         """Completa el depósito y actualiza el balance"""
-        if self.status == 'pending':
+        from .balance import BalanceService
+        
+        with transaction.atomic():
+            # Solo una llamada puede pasar de pending a completed: no hay doble abono
+            completed_at = timezone.now()
+            updated = DepositTransaction.objects.filter(pk=self.pk, status='pending').update(
+                status='completed', completed_at=completed_at
+            )
+            if not updated:
+                return
             self.status = 'completed'
-            self.completed_at = timezone.now()
-            self.save()
+            self.completed_at = completed_at
             
             # Actualizar balance del usuario
-            user_balance, created = UserBalance.objects.get_or_create(user=self.user)
-            user_balance.add_balance(self.amount)
+            BalanceService.deposit(self.user_id, self.amount, reference=f'deposit:{self.pk}')
 
 
 class ReportRequest(models.Model):
@@ -268,3 +299,137 @@ class ReportRequest(models.Model):
         self.status = 'sent'
         self.sent_at = timezone.now()
         self.save()
+
+
+class LedgerAccount(models.Model):
+    """
+    Cuenta del libro mayor. Cada usuario tiene una cuenta de efectivo y hay
+    una cuenta de sistema por contraparte (dinero externo, mercado, bonos),
+    así cada movimiento se registra en partida doble.
+    
+    La cuenta protege a su usuario: quien tuvo movimientos no se borra, se da
+    de baja con User.remove().
+    """
+    CASH = 'cash'
+    EXTERNAL = 'external'
+    MARKET = 'market'
+    PROMOTIONS = 'promotions'
+    KIND_CHOICES = [
+        (CASH, 'Efectivo del usuario'),
+        (EXTERNAL, 'Depósitos y retiros'),
+        (MARKET, 'Compras y ventas'),
+        (PROMOTIONS, 'Bonos y promociones'),
+    ]
+    
+    user = models.OneToOneField(User, on_delete=models.PROTECT, null=True, blank=True, related_name='ledger_account')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=CASH)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'ledger_accounts'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind'],
+                condition=models.Q(user__isnull=True),
+                name='ledger_system_account_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} - {self.user_id or 'sistema'}"
+
+
+class LedgerEntry(models.Model):
+    """
+    Asiento del libro mayor; solo se agregan, nunca se modifican ni borran.
+    
+    Las dos patas de un movimiento comparten journal y suman cero. En las
+    cuentas de usuario cada asiento lleva su número de secuencia y el saldo
+    después de aplicarlo, así el saldo se lee del último asiento y el
+    historial es un recorrido del índice (account, created_at). Las cuentas de
+    sistema no llevan saldo acumulado: las tocan todos los usuarios y serían
+    un punto de contención.
+    """
+    DEPOSIT = 'deposit'
+    WITHDRAWAL = 'withdrawal'
+    TRADE = 'trade'
+    BONUS = 'bonus'
+    OPENING = 'opening'
+    ADJUSTMENT = 'adjustment'
+    KIND_CHOICES = [
+        (DEPOSIT, 'Depósito'),
+        (WITHDRAWAL, 'Retiro'),
+        (TRADE, 'Operación'),
+        (BONUS, 'Bono'),
+        (OPENING, 'Saldo inicial'),
+        (ADJUSTMENT, 'Ajuste'),
+    ]
+    
+    account = models.ForeignKey(LedgerAccount, on_delete=models.PROTECT, related_name='entries')
+    journal = models.UUIDField(default=uuid.uuid4, db_index=True)
+    # Solo en cuentas de usuario: 1, 2, 3... sin huecos
+    sequence = models.PositiveBigIntegerField(null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Con signo: positivo entra a la cuenta, negativo sale
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    # Registro que originó el movimiento, p. ej. "wallet:42" o "deposit:<uuid>"
+    reference = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'ledger_entries'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'sequence'], name='ledger_entry_account_seq_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['account', 'created_at'], name='ledger_entry_account_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.account_id} {self.kind} {self.amount} -> {self.balance_after}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Los asientos del libro mayor no se modifican")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("Los asientos del libro mayor no se borran")
+
+
+class IdempotencyKey(models.Model):
+    """
+    Respuesta guardada de un POST con cabecera Idempotency-Key.
+    Un reintento con la misma llave recibe la respuesta original en lugar
+    de repetir la operación (ver apps.users.idempotency).
+    """
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+    STATUS_CHOICES = [
+        (PROCESSING, 'En proceso'),
+        (COMPLETED, 'Completado'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    # Método y ruta + hash del cuerpo: la misma llave con otra petición es un error del cliente
+    endpoint = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PROCESSING)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Respuesta ya renderizada: el reintento recibe los mismos bytes que el original
+    response_content = models.BinaryField(null=True, blank=True)
+    response_content_type = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.key} ({self.status})"
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from .models import User, EmailVerificationCode, PaymentMethod, UserBalance, DepositTransaction, ReportRequest
+from .models import User, EmailVerificationCode, PaymentMethod, UserBalance, DepositTransaction, ReportRequest, LedgerEntry
 from services.email_service import ZerobounceSendEmailService
 
 
@@ -156,6 +156,15 @@ class UserBalanceSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at', 'updated_at')
 
 
+class LedgerEntrySerializer(serializers.ModelSerializer):
+    """Serializador para los movimientos del libro mayor del usuario"""
+    
+    class Meta:
+        model = LedgerEntry
+        fields = ('id', 'sequence', 'kind', 'amount', 'balance_after', 'reference', 'created_at')
+        read_only_fields = fields
+
+
 class DepositTransactionSerializer(serializers.ModelSerializer):
     """Serializador para transacciones de depósito"""
     payment_method_alias = serializers.CharField(source='payment_method.alias', read_only=True)
@@ -1,12 +1,11 @@
 import jwt
-from jwt.algorithms import RSAAlgorithm
 
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from django.utils.text import slugify
-from apps.users.models import Profile, ProfileState
-import requests
-from django.conf import settings
+from apps.users.models import Profile
+from apps.users.states import ProfileStates
+from apps.users.jwks import decode_auth0_token, UnknownSigningKey
 
 from apps.users.utils import assign_unique_referral_code
 
@@ -49,29 +48,7 @@ class Auth0UserLoginSerializer(serializers.Serializer):
         token = attrs.get("auth0_token")
 
         try:
-            jwks_url = f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json"
-            jwks = requests.get(jwks_url, timeout=5).json()
-
-            unverified_header = jwt.get_unverified_header(token)
-            rsa_key = next(
-                (
-                    RSAAlgorithm.from_jwk(key)
-                    for key in jwks["keys"]
-                    if key["kid"] == unverified_header["kid"]
-                ),
-                None,
-            )
-
-            if rsa_key is None:
-                raise serializers.ValidationError("No se encontró la clave pública de Auth0.")
-
-            payload = jwt.decode(
-                token,
-                key=rsa_key,
-                algorithms=["RS256"],
-                issuer=f"https://{settings.AUTH0_DOMAIN}/",
-                options={"verify_aud": False},
-            )
+            payload = decode_auth0_token(token)
 
             attrs["auth0_id"] = payload.get("sub")
             attrs["email"] = payload.get("email")
@@ -82,6 +59,8 @@ class Auth0UserLoginSerializer(serializers.Serializer):
 
             return attrs
 
+        except UnknownSigningKey:
+            raise serializers.ValidationError("No se encontró la clave pública de Auth0.")
         except jwt.ExpiredSignatureError:
             raise serializers.ValidationError("El token ha expirado.")
         except jwt.InvalidTokenError as e:
@@ -112,8 +91,6 @@ class Auth0UserLoginSerializer(serializers.Serializer):
             is_active=False,
         )
 
-        pendiente_state = ProfileState.objects.get(name="pendiente")
-
         profile = Profile.objects.create(
             user=user,
             auth0_id=auth0_id,
@@ -122,7 +99,7 @@ class Auth0UserLoginSerializer(serializers.Serializer):
             address="",
             cellphone="",
             birth_date=None,
-            state=pendiente_state,
+            state=ProfileStates.pending(),
         )
 
         assign_unique_referral_code(profile, length=6)
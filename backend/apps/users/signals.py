@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from .models import User, UserBalance
+from .states import ProfileStates
+from .token_cache import get_token_cache
 
 
 @receiver(post_save, sender=User)
@@ -10,8 +13,36 @@ def create_user_balance(sender, instance, created, **kwargs):
         UserBalance.objects.get_or_create(user=instance)
 
 
+
 @receiver(post_save, sender=User)
-def save_user_balance(sender, instance, **kwargs):
-    """Guarda el UserBalance del usuario"""
-    if hasattr(instance, 'balance'):
-        instance.balance.save()
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Descarta los tokens en caché del usuario (estado, rol o datos cambiaron)"""
+    get_token_cache().invalidate_user(instance.pk)
+
+
+def invalidate_profile_tokens(sender, instance, **kwargs):
+    get_token_cache().invalidate_user(instance.user_id)
+
+
+def invalidate_profile_states(sender, **kwargs):
+    """Vacía el registro de estados y avisa a los demás procesos (ProfileStates)"""
+    ProfileStates.invalidate()
+
+
+def _connect_if_installed(model_name, handler):
+    """
+    Conecta handler al guardado y borrado del modelo si existe. Profile y
+    ProfileState todavía no están en models.py: importarlos aquí rompería el
+    arranque (ready() importa este módulo).
+    """
+    try:
+        model = apps.get_model('users', model_name)
+    except LookupError:
+        return
+    post_save.connect(handler, sender=model)
+    post_delete.connect(handler, sender=model)
+
+
+_connect_if_installed('Profile', invalidate_profile_tokens)
+_connect_if_installed('ProfileState', invalidate_profile_states)
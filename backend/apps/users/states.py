@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileStates:
+    """
+    Registro en memoria de ProfileState, por proceso.
+
+    La tabla casi nunca cambia, así que se lee una vez y las transiciones y
+    comparaciones de estado (login, habilitar/deshabilitar) no la consultan.
+    Un nombre desconocido vuelve a leer la tabla. Guardar o borrar un
+    ProfileState (signals.py) vacía el registro de este proceso y cambia la
+    versión en la caché compartida (la de cotizaciones); los demás procesos
+    la comparan cada VERSION_CHECK segundos y de todos modos releen la tabla
+    cada TTL segundos. Los nombres se comparan sin distinguir mayúsculas.
+    """
+
+    PENDING = "pendiente"
+    ENABLED = "habilitado"
+    DISABLED = "deshabilitado"
+    # Estados de los superusuarios (admin_views)
+    ACTIVE = "active"
+    INACTIVE = "inactive"
+
+    # Descripción con la que se crean los que falten (como hacía admin_views)
+    DESCRIPTIONS = {
+        ACTIVE: "Estado asignado a usuarios habilitados",
+        INACTIVE: "Cuenta deshabilitada o eliminada",
+    }
+
+    TTL = 60
+    VERSION_CHECK = 5
+    VERSION_KEY = "profile_states:version"
+
+    _by_name = None
+    _by_id = None
+    _version = None
+    _loaded_at = 0.0
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _backend():
+        from services.quote_cache import get_quote_cache
+
+        return get_quote_cache().backend
+
+    @classmethod
+    def _shared_version(cls):
+        try:
+            return cls._backend().get(cls.VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la versión de los estados de perfil: {str(e)}")
+            return cls._version
+
+    @classmethod
+    def _load(cls):
+        from .models import ProfileState
+
+        version = cls._shared_version()
+        with cls._lock:
+            states = list(ProfileState.objects.all())
+            cls._by_name = {state.name.lower(): state for state in states}
+            cls._by_id = {state.pk: state for state in states}
+            cls._version = version
+            cls._loaded_at = cls._checked_at = time.monotonic()
+            return cls._by_name, cls._by_id
+
+    @classmethod
+    def _current(cls):
+        """(por nombre, por id) vigentes; None si hay que leer la tabla"""
+        if cls._by_name is None:
+            return None
+        now = time.monotonic()
+        if now - cls._loaded_at > cls.TTL:
+            return None
+        if now - cls._checked_at > cls.VERSION_CHECK:
+            cls._checked_at = now
+            if cls._shared_version() != cls._version:
+                return None
+        return cls._by_name, cls._by_id
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._by_name = None
+            cls._by_id = None
+        try:
+            cls._backend().set(cls.VERSION_KEY, uuid.uuid4().hex, 30 * 86400)
+        except Exception as e:
+            # Los demás procesos la releen igual al vencer el TTL
+            logger.warning(f"No se pudo publicar la versión de los estados de perfil: {str(e)}")
+
+    @classmethod
+    def get(cls, name):
+        """
+        ProfileState por nombre. Si no existe y tiene descripción en
+        DESCRIPTIONS se crea; si no, lanza ProfileState.DoesNotExist.
+        """
+        from .models import ProfileState
+
+        key = name.lower()
+        current = cls._current()
+        states = current[0] if current else None
+        if states is None or key not in states:
+            states, _ = cls._load()
+        state = states.get(key)
+        if state is not None:
+            return state
+
+        if key not in cls.DESCRIPTIONS:
+            raise ProfileState.DoesNotExist(f"ProfileState '{name}' no existe")
+        state, _ = ProfileState.objects.get_or_create(
+            name=key, defaults={"description": cls.DESCRIPTIONS[key]}
+        )
+        # La señal de post_save ya vació el registro; se recarga en la próxima consulta
+        return state
+
+    @classmethod
+    def id(cls, name):
+        return cls.get(name).pk
+
+    @classmethod
+    def name_of(cls, state_id):
+        """Nombre del estado con ese id, sin tocar la base si ya está en memoria"""
+        current = cls._current()
+        states = current[1] if current else None
+        if states is None or state_id not in states:
+            _, states = cls._load()
+        state = states.get(state_id)
+        return state.name if state is not None else None
+
+    @classmethod
+    def is_state(cls, profile, name):
+        """Compara por state_id: no carga profile.state. Un estado que no existe no coincide"""
+        from .models import ProfileState
+
+        try:
+            return profile.state_id == cls.id(name)
+        except ProfileState.DoesNotExist:
+            return False
+
+    @classmethod
+    def pending(cls):
+        return cls.get(cls.PENDING)
+
+    @classmethod
+    def enabled(cls):
+        return cls.get(cls.ENABLED)
+
+    @classmethod
+    def disabled(cls):
+        return cls.get(cls.DISABLED)
+
+    @classmethod
+    def active(cls):
+        return cls.get(cls.ACTIVE)
+
+    @classmethod
+    def inactive(cls):
+        return cls.get(cls.INACTIVE)
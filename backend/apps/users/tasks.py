@@ -0,0 +1,43 @@
+import logging
+
+from celery import shared_task
+
+from .ledger import Ledger
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def verify_ledger():
+    """Recalcula los saldos desde el libro mayor y registra las diferencias"""
+    return len(Ledger.verify())
+
+
+@shared_task(ignore_result=True)
+def purge_idempotency_keys():
+    """Borra las llaves de idempotencia vencidas"""
+    from .idempotency import purge_expired
+
+    return purge_expired()
+
+
+@shared_task(ignore_result=True)
+def replay_audit_spool():
+    """Reinserta los registros de auditoría que quedaron en spool de procesos caídos"""
+    from .audit import get_audit_writer
+
+    return get_audit_writer().replay_spool()
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=5)
+def revoke_auth0_token(self, token):
+    """Revoca un token de Auth0; reintenta con espera exponencial si Auth0 falla"""
+    from .auth0_revoke import RevocationFailed, revoke_token
+
+    try:
+        return revoke_token(token)
+    except RevocationFailed as e:
+        if self.request.retries >= self.max_retries:
+            logger.error(f"No se pudo revocar el token de Auth0 tras {self.request.retries} reintentos: {str(e)}")
+            return False
+        raise self.retry(exc=e, countdown=min(2 ** self.request.retries * 5, 300))
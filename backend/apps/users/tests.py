@@ -1,3 +1,358 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+import threading
+import types
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
\ No newline at end of file
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from apps.auth.views import FakeAuth0RevokeView
+from apps.users import auth0_revoke
+from apps.users.audit import AuditLogWriter
+from apps.users.auth0_revoke import RevocationFailed, enqueue_revocation, revoke_token
+from apps.users.balance import BalanceService, InsufficientFunds
+from apps.users.idempotency import idempotent
+from apps.users.jwks import JWKSCache, UnknownSigningKey
+from apps.users.ledger import Ledger
+from apps.users.models import IdempotencyKey
+from apps.users.tasks import revoke_auth0_token
+
+User = get_user_model()
+
+
+def _user(username):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password='x')
+
+
+class BalanceServiceTests(TestCase):
+
+    def setUp(self):
+        self.user = _user('saver')
+
+    def test_credit_and_debit(self):
+        self.assertEqual(BalanceService.deposit(self.user, '100.50'), Decimal('100.50'))
+        self.assertEqual(BalanceService.debit(self.user, 40), Decimal('60.50'))
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('60.50'))
+
+    def test_insufficient_funds_changes_nothing(self):
+        BalanceService.deposit(self.user, 10)
+        with self.assertRaises(InsufficientFunds) as ctx:
+            BalanceService.withdraw(self.user, '10.01')
+        self.assertEqual(ctx.exception.available, Decimal('10.00'))
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('10.00'))
+        self.assertEqual(Ledger.history(self.user).count(), 1)
+
+    def test_rejects_non_positive_amounts(self):
+        for amount in (0, '-1', '0.001'):
+            with self.assertRaises(ValueError):
+                BalanceService.credit(self.user, amount)
+
+    def test_ledger_matches_balance(self):
+        BalanceService.deposit(self.user, 100)
+        BalanceService.debit(self.user, 30)
+        BalanceService.credit(self.user, 5)
+
+        self.assertEqual(Ledger.balance(self.user), Decimal('75.00'))
+        self.assertEqual(Ledger.history(self.user).aggregate(total=Sum('amount'))['total'], Decimal('75.00'))
+        self.assertEqual(Ledger.verify(), [])
+
+
+class UserRemovalTests(TestCase):
+
+    def test_user_without_movements_is_deleted(self):
+        user = _user('fresh')
+        self.assertTrue(user.remove())
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+
+    def test_user_with_ledger_history_is_soft_deleted(self):
+        user = _user('investor')
+        BalanceService.deposit(user, 25)
+
+        self.assertFalse(user.remove())
+        user.refresh_from_db()
+        self.assertEqual((user.status, user.is_active), ('deleted', False))
+        self.assertIsNotNone(user.deleted_at)
+        self.assertEqual(Ledger.balance(user), Decimal('25.00'))
+
+
+class CreditView(APIView):
+    """Acredita el monto pedido; con nested=1 reintenta la misma llave mientras procesa"""
+
+    nested_responses = []
+
+    @idempotent
+    def post(self, request):
+        if request.data.get('nested'):
+            self.nested_responses.append(
+                _idempotent_post(request.user, request.data, request.headers['Idempotency-Key'])
+            )
+        balance = BalanceService.credit(request.user, request.data['amount'])
+        return Response({'balance': balance}, status=201)
+
+
+def _idempotent_post(user, data, key):
+    request = APIRequestFactory().post('/credit/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    force_authenticate(request, user)
+    response = CreditView.as_view()(request)
+    return response.render() if hasattr(response, 'render') else response
+
+
+class IdempotencyTests(TestCase):
+
+    def setUp(self):
+        self.user = _user('retrier')
+
+    def test_replay_returns_the_original_bytes(self):
+        first = _idempotent_post(self.user, {'amount': '12.50'}, 'k1')
+        replay = _idempotent_post(self.user, {'amount': '12.50'}, 'k1')
+
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.content, first.content)
+        self.assertEqual(json.loads(replay.content)['balance'], 12.5)
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('12.50'))
+
+    def test_same_key_with_another_body(self):
+        _idempotent_post(self.user, {'amount': '5'}, 'k1')
+        response = _idempotent_post(self.user, {'amount': '6'}, 'k1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('5.00'))
+
+    def test_retry_while_in_flight(self):
+        CreditView.nested_responses.clear()
+        response = _idempotent_post(self.user, {'amount': '5', 'nested': 1}, 'k1')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r.status_code for r in CreditView.nested_responses], [409])
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('5.00'))
+
+    def test_expired_key_runs_again(self):
+        _idempotent_post(self.user, {'amount': '5'}, 'k1')
+        IdempotencyKey.objects.filter(key='k1').update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = _idempotent_post(self.user, {'amount': '5'}, 'k1')
+
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('10.00'))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Requiere escrituras concurrentes de PostgreSQL')
+class BalanceConcurrencyTests(TransactionTestCase):
+    """Muchos hilos moviendo el saldo del mismo usuario: no se pierde ningún movimiento"""
+
+    THREADS = 16
+    OPERATIONS = 50
+
+    def _hammer(self, user_id):
+        totals = {'credited': Decimal('0'), 'debited': Decimal('0')}
+        lock = threading.Lock()
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker():
+            credited = debited = Decimal('0')
+            try:
+                barrier.wait()
+                for _ in range(self.OPERATIONS):
+                    amount = Decimal(random.randint(1, 5))
+                    if random.random() < 0.5:
+                        BalanceService.credit(user_id, amount)
+                        credited += amount
+                    else:
+                        try:
+                            BalanceService.debit(user_id, amount)
+                            debited += amount
+                        except InsufficientFunds:
+                            pass
+            finally:
+                connection.close()
+            with lock:
+                totals['credited'] += credited
+                totals['debited'] += debited
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            for future in [pool.submit(worker) for _ in range(self.THREADS)]:
+                future.result()
+        return totals
+
+    def _check(self, initial):
+        user = _user(f'stress-{initial}')
+        BalanceService.deposit(user, initial)
+
+        totals = self._hammer(user.pk)
+
+        final = BalanceService.get_available(user)
+        self.assertEqual(final, Decimal(initial) + totals['credited'] - totals['debited'])
+        self.assertGreaterEqual(final, 0)
+        self.assertEqual(Ledger.balance(user), final)
+        self.assertEqual(Ledger.history(user).aggregate(total=Sum('amount'))['total'], final)
+
+    def test_no_lost_updates_with_ample_balance(self):
+        self._check(1000000)
+
+    def test_never_negative_with_scarce_balance(self):
+        self._check(50)
+
+
+class JWKSCacheTests(SimpleTestCase):
+
+    def test_cold_start_failures_are_rate_limited(self):
+        cache = JWKSCache('https://auth.example.com/.well-known/jwks.json', min_refetch_interval=30)
+        with mock.patch.object(cache, '_download', side_effect=ConnectionError('caído')) as download:
+            for _ in range(5):
+                with self.assertRaises(UnknownSigningKey):
+                    cache.get_key('kid-1')
+        self.assertEqual(download.call_count, 1)
+
+    def test_unknown_kid_refetches_after_interval(self):
+        cache = JWKSCache('https://auth.example.com/.well-known/jwks.json', min_refetch_interval=0)
+        with mock.patch.object(cache, '_download', side_effect=[{'old': 'k1'}, {'old': 'k1', 'new': 'k2'}]) as download:
+            self.assertEqual(cache.get_key('old'), 'k1')
+            self.assertEqual(cache.get_key('new'), 'k2')
+        self.assertEqual(download.call_count, 2)
+
+
+class AuditSpoolTests(SimpleTestCase):
+    """Spool de AuditLogWriter con el insert reemplazado por una lista"""
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.inserted = []
+        for target, value in (
+            ('_insert', staticmethod(self.inserted.extend)),
+            ('_action_id', lambda writer, name: 1),
+        ):
+            patcher = mock.patch.object(AuditLogWriter, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _writer(self):
+        writer = AuditLogWriter(self.spool_dir, flush_interval=60)
+        writer.log(1, 'login', '127.0.0.1', 'test')
+        return writer
+
+    def test_leftover_spool_is_replayed_once(self):
+        with open(os.path.join(self.spool_dir, 'audit-web-dead.jsonl'), 'w') as f:
+            f.write(json.dumps({'user_id': 9}) + '\n')
+
+        writer = self._writer()
+        writer.replay_spool()
+        writer.flush()
+
+        self.assertEqual(sorted(r['user_id'] for r in self.inserted), [1, 9])
+        self.assertEqual(len(os.listdir(self.spool_dir)), 1)
+
+    def test_live_spool_is_not_taken_by_another_writer(self):
+        writer = self._writer()
+        other = AuditLogWriter(self.spool_dir)
+
+        self.assertEqual(other.replay_spool(), 0)
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual([r['user_id'] for r in self.inserted], [1])
+
+    def test_failed_batch_is_replayed(self):
+        writer = self._writer()
+        with mock.patch.object(AuditLogWriter, '_insert', side_effect=RuntimeError('sin base')):
+            with self.assertRaises(RuntimeError):
+                writer.flush()
+
+        # Lo reinserta esta llamada o el replay de arranque, nunca los dos
+        writer.replay_spool()
+        self.assertEqual(len(self.inserted), 1)
+        writer.log(1, 'logout', '127.0.0.1', 'test')
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(len(self.inserted), 2)
+
+    def test_full_buffer_survives_a_database_outage(self):
+        writer = AuditLogWriter(self.spool_dir, flush_interval=60, max_buffer=2)
+        with mock.patch.object(AuditLogWriter, '_insert', side_effect=RuntimeError('sin base')):
+            for _ in range(3):
+                writer.log(1, 'login', '127.0.0.1', 'test')
+
+        # Los dos primeros quedaron en su .pending; el tercero en el búfer
+        writer.replay_spool()
+        writer.flush()
+        self.assertEqual(len(self.inserted), 3)
+
+
+def _fake_auth0_post(url, data=None, **kwargs):
+    """requests.post contra FakeAuth0RevokeView, sin servidor"""
+    query = url.partition('?')[2]
+    request = APIRequestFactory().post(f'/oauth/revoke?{query}', data)
+    response = FakeAuth0RevokeView.as_view()(request).render()
+    return types.SimpleNamespace(status_code=response.status_code, text=response.content.decode())
+
+
+@override_settings(AUTH0_CLIENT_ID='test-client', AUTH0_CLIENT_SECRET='secret')
+class Auth0RevokeTests(SimpleTestCase):
+    """revoke_token y la cola de revocaciones contra el revoke falso de Auth0"""
+
+    def setUp(self):
+        FakeAuth0RevokeView.revoked.clear()
+        patcher = mock.patch.object(auth0_revoke.requests, 'post', side_effect=_fake_auth0_post)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Cada prueba consulta el tamaño de la cola de cero
+        queue_size = mock.patch.object(auth0_revoke, '_queue_size', auth0_revoke._QueueSize())
+        self.queue_size = queue_size.start()
+        self.addCleanup(queue_size.stop)
+
+    def _revoke(self, token, query=''):
+        with self.settings(AUTH0_REVOKE={'URL': f'http://fake-auth0/oauth/revoke{query}'}):
+            return revoke_token(token)
+
+    def test_revoked(self):
+        self.assertTrue(self._revoke('tok-1'))
+        self.assertEqual(FakeAuth0RevokeView.revoked, ['tok-1'])
+
+    def test_temporary_errors_can_be_retried(self):
+        for code in (429, 503):
+            with self.assertRaises(RevocationFailed):
+                self._revoke('tok-1', f'?status={code}')
+        self.assertEqual(FakeAuth0RevokeView.revoked, [])
+
+    def test_rejected_token_is_not_retried(self):
+        self.assertFalse(self._revoke('', ''))
+        self.assertFalse(self._revoke('tok-1', '?status=400'))
+
+    def test_task_retries_then_gives_up(self):
+        # apply() ejecuta en el proceso y encadena los reintentos sin esperar el countdown
+        with mock.patch('apps.users.auth0_revoke.revoke_token', side_effect=RevocationFailed('503')) as revoke:
+            result = revoke_auth0_token.apply(('tok-1',))
+        self.assertIs(result.get(), False)
+        self.assertEqual(revoke.call_count, revoke_auth0_token.max_retries + 1)
+
+    def test_full_queue_drops_new_revocations(self):
+        with mock.patch.object(self.queue_size, '_probe', return_value=1000), \
+                mock.patch.object(revoke_auth0_token, 'apply_async') as publish, \
+                self.settings(AUTH0_REVOKE={'MAX_QUEUE': 1000}):
+            self.assertFalse(enqueue_revocation('tok-1'))
+        publish.assert_not_called()
+
+    def test_unreachable_broker_is_checked_once_per_ttl(self):
+        with mock.patch.object(self.queue_size, '_probe', side_effect=ConnectionError('sin broker')) as probe, \
+                mock.patch.object(revoke_auth0_token, 'apply_async') as publish:
+            for _ in range(5):
+                self.assertFalse(enqueue_revocation('tok-1'))
+        self.assertEqual(probe.call_count, 1)
+        publish.assert_not_called()
+
+    def test_enqueued_below_limit(self):
+        with mock.patch.object(self.queue_size, '_probe', return_value=0), \
+                mock.patch.object(revoke_auth0_token, 'apply_async') as publish:
+            self.assertTrue(enqueue_revocation('tok-1'))
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args.kwargs['retry'], False)
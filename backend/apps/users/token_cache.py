@@ -0,0 +1,102 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class VerifiedTokenCache:
+    """
+    Tokens de Auth0 ya verificados, por hash del token: usuario y claims.
+
+    Cada entrada vive hasta el exp del token o TTL segundos, lo que llegue
+    antes, así un cliente que manda muchas peticiones con el mismo token
+    solo paga la verificación y la consulta del usuario una vez por TTL.
+    Es por proceso y acotada a MAX_ENTRIES (se descarta la menos usada).
+    Los cambios de usuario o perfil invalidan sus entradas en este proceso;
+    en los demás expiran solas en a lo sumo TTL segundos.
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        """(usuario, claims) si el token está en caché y vigente; si no, None"""
+        digest = self._hash(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            user, claims, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._discard(digest)
+                return None
+            self._entries.move_to_end(digest)
+        # Copia: la vista puede modificar su usuario sin tocar el de la caché
+        return copy.copy(user), claims
+
+    def set(self, token, user, claims):
+        lifetime = self.ttl
+        exp = claims.get('exp')
+        if exp:
+            lifetime = min(lifetime, exp - time.time())
+        if lifetime <= 0:
+            return
+
+        digest = self._hash(token)
+        with self._lock:
+            self._discard(digest)
+            self._entries[digest] = (copy.copy(user), claims, time.monotonic() + lifetime)
+            self._by_user.setdefault(user.pk, set()).add(digest)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            digests = self._by_user.get(entry[0].pk)
+            if digests:
+                digests.discard(digest)
+                if not digests:
+                    del self._by_user[entry[0].pk]
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._discard(digest)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'users': len(self._by_user)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """Caché compartida según settings.AUTH0_TOKEN_CACHE"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = getattr(settings, 'AUTH0_TOKEN_CACHE', {})
+                _cache = VerifiedTokenCache(
+                    ttl=config.get('TTL', 60),
+                    max_entries=config.get('MAX_ENTRIES', 10000),
+                )
+    return _cache
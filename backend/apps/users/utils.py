@@ -1,7 +1,7 @@
 # users/utils.py
 import secrets
-from apps.users.models import SecurityLog, UserAction
 from django.db import transaction, IntegrityError
+from apps.users.audit import get_audit_writer
 from apps.users.models import Profile
 
 ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # sin 0/O/1/I para evitar confusión
@@ -38,11 +38,5 @@ def log_action(request, user, action_name: str):
 
     user_agent = request.META.get("HTTP_USER_AGENT", "")
 
-    action = UserAction.objects.get(name=action_name)
-
-    SecurityLog.objects.create(
-        user=user,
-        action=action,
-        ip=ip,
-        user_agent=user_agent,
-    )
+    # Se encola: un hilo del proceso lo guarda por lotes (ver apps.users.audit)
+    get_audit_writer().log(user, action_name, ip, user_agent)
@@ -18,8 +18,12 @@ from .serializers import (
     DepositTransactionSerializer,
     DepositTransactionCreateSerializer,
     ReportRequestSerializer,
-    ReportRequestCreateSerializer
+    ReportRequestCreateSerializer,
+    LedgerEntrySerializer
 )
+from .ledger import Ledger
+from .idempotency import idempotent
+from apps.common.pagination import KeysetPagination
 from services.email_service import ZerobounceSendEmailService
 
 logger = logging.getLogger(__name__)
@@ -377,6 +381,21 @@ class UserViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    def destroy(self, request, *args, **kwargs):
+        """Eliminar un usuario; si tiene movimientos en el libro mayor queda dado de baja"""
+        instance = self.get_object()
+        if instance.remove():
+            message = 'Usuario eliminado exitosamente'
+        else:
+            message = 'El usuario tiene movimientos registrados; se dio de baja'
+        return Response(
+            {
+                'success': True,
+                'message': message
+            },
+            status=status.HTTP_200_OK
+        )
+
 
 class PaymentMethodViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar métodos de pago ficticios"""
@@ -502,6 +521,21 @@ class UserBalanceViewSet(viewsets.ReadOnlyModelViewSet):
             },
             status=status.HTTP_200_OK
         )
+    
+    @action(detail=False, methods=['get'])
+    def ledger(self, request):
+        """
+        Movimientos del saldo (libro mayor), más reciente primero, paginados por cursor
+        GET /api/users/balance/ledger/?kind=deposit&cursor=...
+        """
+        entries = Ledger.history(request.user)
+        kind = request.query_params.get('kind')
+        if kind:
+            entries = entries.filter(kind=kind)
+        
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(entries, request, view=self)
+        return paginator.get_paginated_response(LedgerEntrySerializer(page, many=True).data)
 
 
 class DepositTransactionViewSet(viewsets.ModelViewSet):
@@ -519,8 +553,9 @@ class DepositTransactionViewSet(viewsets.ModelViewSet):
             return DepositTransactionCreateSerializer
         return DepositTransactionSerializer
     
+    @idempotent
     def create(self, request, *args, **kwargs):
-        """Crear un nuevo depósito"""
+        """Crear un nuevo depósito (reintentable con la cabecera Idempotency-Key)"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         deposit = self.perform_create(serializer)
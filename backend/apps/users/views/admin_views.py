@@ -4,7 +4,8 @@ from apps.users.permissions import IsAdmin
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiResponse
-from apps.users.models import Profile, ProfileState
+from apps.users.models import Profile
+from apps.users.states import ProfileStates
 
 # serializers
 from apps.users.serializers import CreateSuperUserSerializer, SuperUserListSerializer
@@ -31,15 +32,8 @@ class DeleteSuperUser(APIView):
         user.is_active = False
         user.save(update_fields=["is_staff", "is_superuser", "is_active"])
 
-        try:
-            inactive_state = ProfileState.objects.get(name__iexact="inactive")
-        except ProfileState.DoesNotExist:
-            inactive_state = ProfileState.objects.create(
-                name="inactive", description="Cuenta deshabilitada o eliminada"
-            )
-
         profile = user.profile
-        profile.state = inactive_state
+        profile.state = ProfileStates.inactive()
         profile.soft_delete()
         profile.save(update_fields=["state", "deleted_at"])
 
@@ -64,14 +58,7 @@ class SuperUserView(APIView):
         if serializer.is_valid():
             user = serializer.save()
 
-            try:
-                active_state = ProfileState.objects.get(name__iexact="active")
-            except ProfileState.DoesNotExist:
-                active_state = ProfileState.objects.create(
-                    name="active", description="Estado asignado a usuarios habilitados"
-                )
-
-            user.profile.state = active_state
+            user.profile.state = ProfileStates.active()
             user.profile.save(update_fields=["state"])
 
             return Response(
@@ -1,9 +1,9 @@
-import requests
-from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from apps.users.serializers import Auth0UserLoginSerializer, UserSerializer
+from apps.users.auth0_revoke import enqueue_revocation
+from apps.users.states import ProfileStates
 
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 # no-repudio
@@ -16,24 +16,9 @@ class Auth0LoginView(APIView):
     - Si el usuario no existe -> se crea con perfil 'pendiente' (sin cookie JWT).
     - Si existe pero el perfil no está habilitado -> no genera JWT.
     - Si el perfil está habilitado -> genera cookie JWT (1h).
+    En los casos sin acceso el token de Auth0 se revoca en segundo plano
+    (tarea revoke_auth0_token), sin esperar a Auth0.
     """
-    def revoke_auth0_token(self, token):
-            """Revoca el token de Auth0 para impedir futuros accesos."""
-            try:
-                resp = requests.post(
-                    f"https://{settings.AUTH0_DOMAIN}/oauth/revoke",
-                    data={
-                        "client_id": settings.AUTH0_CLIENT_ID,
-                        "client_secret": settings.AUTH0_CLIENT_SECRET,
-                        "token": token,
-                    },
-                    headers={"Content-Type": "application/x-www-form-urlencoded"},
-                )
-                if resp.status_code not in (200, 204):
-                    print("Error al revocar token de Auth0:", resp.text)
-            except Exception as e:
-                print("No se pudo revocar token de Auth0:", e)
-    
     @extend_schema(
     tags=["auth"],
     summary="Autenticación con Auth0",
@@ -76,8 +61,8 @@ class Auth0LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if profile.state.name.lower() == "pendiente":
-            self.revoke_auth0_token(auth0_token)
+        if ProfileStates.is_state(profile, ProfileStates.PENDING):
+            enqueue_revocation(auth0_token)
             return Response(
                 {
                     "message": "Usuario creado correctamente, pero pendiente de habilitación.",
@@ -86,18 +71,18 @@ class Auth0LoginView(APIView):
                 status=status.HTTP_201_CREATED,
             )
 
-        if profile.state.name.lower() != "habilitado":
-            self.revoke_auth0_token(auth0_token)
+        if not ProfileStates.is_state(profile, ProfileStates.ENABLED):
+            enqueue_revocation(auth0_token)
             return Response(
                 {
-                    "message": f"El perfil está '{profile.state.name}'. Acceso restringido.",
+                    "message": f"El perfil está '{ProfileStates.name_of(profile.state_id)}'. Acceso restringido.",
                     "user": UserSerializer(user).data,
                 },
                 status=status.HTTP_403_FORBIDDEN,
             )
         
         if profile.profile_completed == False:
-            self.revoke_auth0_token(auth0_token)
+            enqueue_revocation(auth0_token)
             return Response(
                 {
                     "message": f"El perfil está incompleto'. Acceso restringido.",
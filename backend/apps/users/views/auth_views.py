@@ -3,8 +3,7 @@ from rest_framework import serializers, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-import requests
-from django.conf import settings
+from apps.users.auth0_revoke import enqueue_revocation
 
 # swagger
 from drf_spectacular.utils import extend_schema, OpenApiResponse
@@ -16,23 +15,6 @@ from apps.users.actions import Action
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def revoke_auth0_token(self, token):
-        """Revoca el token de Auth0 para impedir futuros accesos."""
-        try:
-            resp = requests.post(
-                f"https://{settings.AUTH0_DOMAIN}/oauth/revoke",
-                data={
-                    "client_id": settings.AUTH0_CLIENT_ID,
-                    "client_secret": settings.AUTH0_CLIENT_SECRET,
-                    "token": token,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
-            if resp.status_code not in (200, 204):
-                print("Error al revocar token de Auth0:", resp.text)
-        except Exception as e:
-            print("No se pudo revocar token de Auth0:", e)
-
     @extend_schema(
         request=serializers.Serializer,
         responses={204: OpenApiResponse(description="Logout ok")},
@@ -50,7 +32,7 @@ class LogoutView(APIView):
             response = Response({"detail": "Sesión cerrada correctamente."}, status=status.HTTP_200_OK)
             
             response.delete_cookie("access_token")
-            self.revoke_auth0_token(token_str)
+            enqueue_revocation(token_str)
 
             log_action(request, request.user, Action.AUTH_LOGOUT)
             
@@ -13,7 +13,7 @@ from apps.users.serializers import UserListSerializer, UserDetailSerializer
 
 
 # models
-from apps.users.models import ProfileState
+from apps.users.states import ProfileStates
 
 # no-repudio
 from apps.users.utils import log_action
@@ -84,10 +84,6 @@ class UserViewSet(viewsets.GenericViewSet,
         log_action(request, request.user, Action.PROFILE_UPDATED)
         return resp
 
-    def _get_state(self, name: str) -> ProfileState:
-        # Busca por nombre EXACTO según tu tabla: "pendiente", "habilitado", "deshabilitado"
-        return ProfileState.objects.get(name=name)
-
     @action(detail=True, methods=["post"])
     @extend_schema(
         responses={200: OpenApiResponse(description="Usuario habilitado (profile.state = 'habilitado')")},
@@ -101,7 +97,7 @@ class UserViewSet(viewsets.GenericViewSet,
             user.save(update_fields=["is_active"])
             prof = getattr(user, "profile", None)
             if prof:
-                prof.state = self._get_state("habilitado")
+                prof.state = ProfileStates.enabled()
                 prof.save(update_fields=["state"])
         log_action(request, request.user, Action.ADMIN_USER_ENABLED)
         return Response({"status": "enabled"})
@@ -120,7 +116,7 @@ class UserViewSet(viewsets.GenericViewSet,
             user.save(update_fields=["is_active"])
             prof = getattr(user, "profile", None)
             if prof:
-                prof.state = self._get_state("deshabilitado")
+                prof.state = ProfileStates.disabled()
                 prof.save(update_fields=["state"])
         log_action(request, request.user, Action.ADMIN_USER_DISABLED)
         return Response({"status": "disabled"})
\ No newline at end of file
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from apps.users.balance import BalanceService
 
 User = settings.AUTH_USER_MODEL
 
@@ -16,14 +17,16 @@ class WalletTransaction(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-        if self.transaction_type == "deposit":
-            self.user.balance = round(self.user.balance + self.amount, 2)
-        elif self.transaction_type == "withdraw":
-            self.user.balance = round(self.user.balance - self.amount, 2)
-
-        self.user.save()
+            # Money only moves when the movement is first recorded
+            if adding:
+                if self.transaction_type == "deposit":
+                    BalanceService.deposit(self.user_id, self.amount, reference=f"wallet:{self.pk}")
+                elif self.transaction_type == "withdraw":
+                    BalanceService.withdraw(self.user_id, self.amount, reference=f"wallet:{self.pk}")
 
     def __str__(self):
         return f"{self.transaction_type} - {self.user.username} - {self.amount}"
\ No newline at end of file
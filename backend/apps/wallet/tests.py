@@ -1,3 +1,53 @@
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.users.balance import BalanceService
+
+from .views import DepositView, WithdrawView
+
+User = get_user_model()
+
+
+class WalletAmountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='wallet', email='wallet@example.com', password='x')
+        self.factory = APIRequestFactory()
+
+    def _post(self, view, amount, **headers):
+        request = self.factory.post('/', {'amount': amount}, format='json', **headers)
+        force_authenticate(request, self.user)
+        return view.as_view()(request)
+
+    def test_invalid_amounts_are_rejected(self):
+        for amount in ('NaN', 'sNaN', 'Infinity', '-Infinity', '0.001', '0', '-5', 'abc', '1e30'):
+            for view in (DepositView, WithdrawView):
+                response = self._post(view, amount)
+                self.assertEqual(response.status_code, 400, (view.__name__, amount))
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('0'))
+
+    def test_amount_rounded_to_cents(self):
+        response = self._post(DepositView, '12.345')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('12.34'))
+
+    def test_withdraw_more_than_balance(self):
+        self._post(DepositView, '10')
+        response = self._post(WithdrawView, '10.01')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('10.00'))
+
+    def test_idempotent_replay_returns_the_same_bytes(self):
+        first = self._post(DepositView, '12.50', HTTP_IDEMPOTENCY_KEY='deposit-1').render()
+        replay = self._post(DepositView, '12.50', HTTP_IDEMPOTENCY_KEY='deposit-1')
 
-# Create your tests here.
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.status_code, first.status_code)
+        self.assertEqual(replay.content, first.content)
+        self.assertEqual(replay['Content-Type'], first['Content-Type'])
+        self.assertEqual(json.loads(replay.content)['balance'], 12.5)
+        self.assertEqual(BalanceService.get_available(self.user), Decimal('12.50'))
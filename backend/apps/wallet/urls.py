@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import wallet_balance
+from .views import DepositView, WalletBalanceView, WalletHistoryView, WithdrawView
 
 urlpatterns = [
-    path("balance/", wallet_balance, name="wallet_balance"),
-]
\ No newline at end of file
+    path("balance/", WalletBalanceView.as_view(), name="wallet_balance"),
+    path("deposit/", DepositView.as_view(), name="wallet_deposit"),
+    path("withdraw/", WithdrawView.as_view(), name="wallet_withdraw"),
+    path("transactions/", WalletHistoryView.as_view(), name="wallet_transactions"),
+]
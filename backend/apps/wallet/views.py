@@ -1,42 +1,67 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
+from decimal import Decimal, InvalidOperation
+from apps.users.balance import BalanceService, InsufficientFunds
+from apps.users.idempotency import idempotent
 from .models import WalletTransaction
 
+CENTS = Decimal("0.01")
+# WalletTransaction.amount: max_digits=12, decimal_places=2
+MAX_AMOUNT = Decimal("9999999999.99")
+
+
+def parse_amount(value):
+    """Amount rounded to cents, or None unless it is a finite number above zero"""
+    try:
+        amount = Decimal(str(value))
+        if not amount.is_finite():
+            return None
+        amount = amount.quantize(CENTS)
+    except InvalidOperation:
+        return None
+    if amount <= 0 or amount > MAX_AMOUNT:
+        return None
+    return amount
+
 class WalletBalanceView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        return Response({"balance": request.user.balance})
+        return Response({"balance": BalanceService.get_available(request.user)})
 
 class DepositView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request):
-        amount = float(request.data.get("amount", 0))
+        amount = parse_amount(request.data.get("amount", 0))
+        if amount is None:
+            return Response({"error": "Invalid amount"}, status=400)
         method = request.data.get("payment_method")
-        request.user.balance += amount
-        request.user.save()
-        WalletTransaction.objects.create(user=request.user, type="deposit", total=amount)
-        return Response({"message": "Deposit successful", "balance": request.user.balance})
+        # The movement and the balance update commit together (see WalletTransaction.save)
+        WalletTransaction.objects.create(user=request.user, transaction_type="deposit", amount=amount)
+        return Response({"message": "Deposit successful", "balance": BalanceService.get_available(request.user)})
 
 class WithdrawView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request):
-        amount = float(request.data.get("amount", 0))
+        amount = parse_amount(request.data.get("amount", 0))
+        if amount is None:
+            return Response({"error": "Invalid amount"}, status=400)
         account = request.data.get("bank_account")
-        if request.user.balance < amount:
+        try:
+            WalletTransaction.objects.create(user=request.user, transaction_type="withdraw", amount=amount)
+        except InsufficientFunds:
             return Response({"error": "Insufficient balance"}, status=400)
-        request.user.balance -= amount
-        request.user.save()
-        WalletTransaction.objects.create(user=request.user, type="withdrawal", total=amount)
-        return Response({"message": "Withdrawal successful", "balance": request.user.balance})
+        return Response({"message": "Withdrawal successful", "balance": BalanceService.get_available(request.user)})
 
 class WalletHistoryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         transactions = WalletTransaction.objects.filter(user=request.user).order_by("-timestamp")
-        data = [{"type": t.type, "total": t.total, "created_at": t.timestamp} for t in transactions]
+        data = [{"type": t.transaction_type, "total": t.amount, "created_at": t.timestamp} for t in transactions]
         return Response(data)
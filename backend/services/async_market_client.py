@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import random
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from services.quote_cache import get_chart_quote_cache, get_quote_cache
+from services.upstream import UpstreamUnavailable, get_upstream, is_symbol_error
+from services.yahoo_finance_service import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMarketClient:
+    """
+    Cliente asyncio de cotizaciones para las vistas async servidas por ASGI.
+
+    Usa un httpx.AsyncClient con pool de conexiones por event loop y un
+    semáforo que acota las peticiones simultáneas a Yahoo, así un solo worker
+    atiende cientos de cotizaciones en vuelo sin crear hilos. Comparte el
+    circuito de Yahoo con el cliente síncrono y lee su caché de cotizaciones.
+    """
+
+    # Endpoint de gráficos: no requiere crumb y trae precio, cierre anterior y volumen
+    CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/{symbol}'
+    # Campos que el endpoint de gráficos trae al día
+    PRICE_FIELDS = ('price', 'change', 'changePercent', 'volume', 'lastUpdate')
+
+    def __init__(self, max_connections=100, concurrency=50, timeout=10, retries=1):
+        self.max_connections = max_connections
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        # Un cliente y un semáforo por event loop: no se pueden compartir entre loops
+        self._per_loop = weakref.WeakKeyDictionary()
+
+    def _resources(self):
+        loop = asyncio.get_running_loop()
+        resources = self._per_loop.get(loop)
+        if resources is None:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                headers={'User-Agent': 'Mozilla/5.0 (TikalInvest)'},
+            )
+            resources = self._per_loop[loop] = (client, asyncio.Semaphore(self.concurrency))
+        return resources
+
+    async def aclose(self):
+        """
+        Cierra el cliente del event loop actual. Las vistas lo llaman cuando
+        el loop es de una sola petición (WSGI), para no dejar conexiones abiertas.
+        """
+        resources = self._per_loop.pop(asyncio.get_running_loop(), None)
+        if resources is not None:
+            await resources[0].aclose()
+
+    async def _request_chart(self, symbol):
+        """
+        Pide el gráfico de un símbolo con las mismas reglas de circuito que
+        UpstreamClient.call: una prueba por llamada en half_open que se libera
+        pase lo que pase (también si la petición se cancela) y una sola falla
+        por llamada, ya agotados los reintentos.
+        """
+        client, semaphore = self._resources()
+        breaker = get_upstream('yahoo').breaker
+        if not breaker.allow():
+            raise UpstreamUnavailable(f"yahoo no disponible, reintento en {breaker.retry_in():.0f}s")
+
+        settled = False
+        attempt = 0
+        try:
+            while True:
+                try:
+                    async with semaphore:
+                        response = await client.get(
+                            self.CHART_URL.format(symbol=symbol),
+                            params={'range': '1d', 'interval': '1d'},
+                        )
+                    # 404 = símbolo inexistente, no es una falla del upstream
+                    if response.status_code == 404:
+                        breaker.record_success()
+                        settled = True
+                        return None
+                    response.raise_for_status()
+                    breaker.record_success()
+                    settled = True
+                    return response.json()
+                except httpx.HTTPError as e:
+                    if is_symbol_error(e):
+                        breaker.record_success()
+                        settled = True
+                        raise
+                    if attempt >= self.retries:
+                        breaker.record_failure()
+                        settled = True
+                        raise
+                    attempt += 1
+                    logger.info(f"Reintentando cotización async de {symbol}: {str(e)}")
+                    await asyncio.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+        finally:
+            if not settled:
+                # Cancelada (cliente desconectado, wait_for) o error inesperado
+                breaker.release_probe()
+
+    async def fetch_quote(self, symbol):
+        """Descarga la cotización de un símbolo; None si Yahoo no lo conoce"""
+        data = await self._request_chart(symbol)
+        results = ((data or {}).get('chart') or {}).get('result') or []
+        if not results:
+            return None
+
+        meta = results[0].get('meta') or {}
+        price = meta.get('regularMarketPrice') or 0
+        if not price:
+            return None
+
+        return YahooFinanceService._build_quote(
+            symbol,
+            price,
+            meta.get('chartPreviousClose') or meta.get('previousClose') or price,
+            meta.get('regularMarketVolume'),
+            0,
+            meta.get('currency'),
+            meta.get('longName') or meta.get('shortName'),
+        )
+
+    async def get_quotes(self, symbols, refresh=False):
+        """
+        Versión async de YahooFinanceService.get_quotes: caché primero y las
+        cotizaciones que falten en paralelo, con la última conocida si Yahoo falla.
+
+        Las cotizaciones del endpoint de gráficos no traen capitalización ni
+        nombre completo: si el símbolo ya tiene una cotización completa en la
+        caché compartida solo se le actualizan los campos de precio; si no, se
+        guardan en la caché de gráficos, que las vistas síncronas no leen.
+
+        Returns:
+            dict: {símbolo en mayúsculas: cotización}
+        """
+        cache = get_quote_cache()
+        chart_cache = get_chart_quote_cache()
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+
+        def lookup():
+            quotes, missing = cache.get_many(symbols)
+            if missing:
+                charted, missing = chart_cache.get_many(missing)
+                quotes.update(charted)
+            return quotes, missing
+
+        if refresh:
+            quotes, missing = {}, symbols
+        else:
+            quotes, missing = await sync_to_async(lookup, thread_sensitive=False)()
+
+        if not missing:
+            return quotes
+
+        results = await asyncio.gather(
+            *(self.fetch_quote(symbol) for symbol in missing),
+            return_exceptions=True,
+        )
+
+        fetched, failed = {}, []
+        for symbol, result in zip(missing, results):
+            if isinstance(result, Exception):
+                if not isinstance(result, UpstreamUnavailable):
+                    logger.warning(f"Error obteniendo cotización async de {symbol}: {str(result)}")
+                failed.append(symbol)
+            elif result:
+                fetched[symbol] = result
+            else:
+                failed.append(symbol)
+
+        def store_and_fill():
+            stored = {}
+            for symbol, quote in fetched.items():
+                full = cache.get_stale(symbol)
+                if full:
+                    merged = {**full, **{field: quote[field] for field in self.PRICE_FIELDS}}
+                    cache.set(symbol, merged)
+                    stored[symbol] = merged
+                else:
+                    chart_cache.set(symbol, quote)
+                    stored[symbol] = quote
+            for symbol in failed:
+                value = cache.get_stale(symbol) or chart_cache.get_stale(symbol)
+                if value:
+                    stored[symbol] = value
+            return stored
+
+        quotes.update(await sync_to_async(store_and_fill, thread_sensitive=False)())
+        return quotes
+
+    async def get_stock_data(self, symbol):
+        quotes = await self.get_quotes([symbol])
+        return quotes.get(symbol.upper())
+
+
+_client = None
+
+
+def get_async_market_client():
+    """Instancia compartida según settings.ASYNC_MARKET_CLIENT"""
+    global _client
+    if _client is None:
+        config = getattr(settings, 'ASYNC_MARKET_CLIENT', {})
+        _client = AsyncMarketClient(
+            max_connections=config.get('MAX_CONNECTIONS', 100),
+            concurrency=config.get('CONCURRENCY', 50),
+            timeout=config.get('TIMEOUT', 10),
+            retries=config.get('RETRIES', 1),
+        )
+    return _client
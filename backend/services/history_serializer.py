@@ -0,0 +1,50 @@
+import pandas as pd
+
+RECORDS = 'records'
+COLUMNAR = 'columnar'
+SHAPES = (RECORDS, COLUMNAR)
+
+
+def serialize_bars(hist, fields, shape=RECORDS):
+    """
+    Convierte un DataFrame de barras diarias (columnas Open/High/Low/Close/Volume,
+    índice de fechas) a JSON operando por columnas completas.
+
+    Args:
+        hist: DataFrame como el de Ticker.history() o HistoryStore.read()
+        fields: campos a incluir, p. ej. ['close', 'high', 'low', 'volume']
+        shape: 'records' -> [{'date': ..., 'close': ...}, ...]
+               'columnar' -> {'dates': [...], 'close': [...], ...}
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Formato no soportado: {shape}")
+
+    # Las filas incompletas se descartan, igual que antes hacía el try/except por fila
+    frame = hist[[field.capitalize() for field in fields]].dropna()
+
+    dates = pd.to_datetime(frame.index).strftime('%Y-%m-%d').tolist()
+    columns = {}
+    for field in fields:
+        column = frame[field.capitalize()]
+        if field == 'volume':
+            columns[field] = column.astype('int64').tolist()
+        else:
+            columns[field] = column.round(2).tolist()
+
+    if shape == COLUMNAR:
+        return {'dates': dates, **columns}
+
+    keys = ['date'] + list(fields)
+    return [dict(zip(keys, row)) for row in zip(dates, *columns.values())]
+
+
+def empty_bars(fields, shape=RECORDS):
+    """Resultado vacío con la forma pedida"""
+    if shape == COLUMNAR:
+        return {'dates': [], **{field: [] for field in fields}}
+    return []
+
+
+def bars_count(data):
+    """Número de barras en cualquiera de los dos formatos"""
+    return len(data['dates']) if isinstance(data, dict) else len(data)
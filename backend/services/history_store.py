@@ -0,0 +1,233 @@
+import logging
+from datetime import date, timedelta
+
+import pandas as pd
+import yfinance as yf
+from django.conf import settings
+
+from services.quote_cache import get_quote_cache
+from services.upstream import get_upstream
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryStore:
+    """
+    Almacén local de barras diarias OHLCV (tabla price_bars).
+    La primera sincronización de un símbolo descarga INITIAL_PERIOD (en
+    Celery; la petición que lo descubre solo baja el rango que pidió); las
+    siguientes solo piden las barras desde la última fecha guardada, salvo
+    que al símbolo todavía le falte el inicio de INITIAL_PERIOD.
+    """
+
+    # Margen para fines de semana y feriados al comparar la primera barra
+    BACKFILL_TOLERANCE_DAYS = 7
+
+    COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+    # Días aproximados por periodo aceptado en ?period=
+    PERIOD_DAYS = {
+        '5d': 5,
+        '1mo': 31,
+        '3mo': 92,
+        '6mo': 183,
+        '1y': 366,
+        '2y': 731,
+        '5y': 1827,
+        '10y': 3653,
+    }
+
+    @staticmethod
+    def _config():
+        return getattr(settings, 'HISTORY_STORE', {})
+
+    @staticmethod
+    def resolve_range(period=None, start=None, end=None):
+        """
+        Convierte ?period= o ?start=&end= (YYYY-MM-DD) en un rango de fechas.
+        start=None significa "desde el inicio". Lanza ValueError si el rango no es válido.
+        """
+        end_date = date.fromisoformat(end) if end else date.today()
+
+        if start:
+            start_date = date.fromisoformat(start)
+        else:
+            period = (period or '1y').lower()
+            if period == 'max':
+                start_date = None
+            elif period == 'ytd':
+                start_date = date(end_date.year, 1, 1)
+            elif period in HistoryStore.PERIOD_DAYS:
+                start_date = end_date - timedelta(days=HistoryStore.PERIOD_DAYS[period])
+            else:
+                raise ValueError(f"Periodo no soportado: {period}")
+
+        if start_date and start_date > end_date:
+            raise ValueError("La fecha inicial debe ser anterior a la final")
+
+        return start_date, end_date
+
+    @staticmethod
+    def last_date(symbol):
+        from apps.stocks.models import PriceBar
+
+        return (
+            PriceBar.objects.filter(symbol=symbol.upper())
+            .order_by('-date')
+            .values_list('date', flat=True)
+            .first()
+        )
+
+    @staticmethod
+    def first_date(symbol):
+        from apps.stocks.models import PriceBar
+
+        return (
+            PriceBar.objects.filter(symbol=symbol.upper())
+            .order_by('date')
+            .values_list('date', flat=True)
+            .first()
+        )
+
+    @staticmethod
+    def needs_backfill(symbol):
+        """
+        True si la primera barra guardada es posterior al inicio de
+        INITIAL_PERIOD, p. ej. porque no se pudo encolar la descarga completa
+        tras la sincronización inicial. Un símbolo con menos historia que
+        INITIAL_PERIOD queda marcado como completo tras su descarga completa.
+        """
+        period_days = HistoryStore.PERIOD_DAYS.get(HistoryStore._config().get('INITIAL_PERIOD', '10y'))
+        first = HistoryStore.first_date(symbol)
+        if period_days is None or first is None:
+            return False
+        if get_quote_cache().backend.get(f"history:complete:{symbol.upper()}"):
+            return False
+        expected = date.today() - timedelta(days=period_days - HistoryStore.BACKFILL_TOLERANCE_DAYS)
+        return first > expected
+
+    @staticmethod
+    def sync(symbol, start=None, full=False):
+        """
+        Descarga las barras nuevas de un símbolo y las guarda.
+        La última barra guardada se vuelve a pedir porque pudo haberse
+        guardado con el mercado abierto.
+
+        Args:
+            start: descarga solo desde esa fecha (lo que pidió una petición)
+            full: descarga INITIAL_PERIOD completo aunque ya haya barras (backfill).
+                Sin start ni full también se descarga completo si needs_backfill()
+
+        Returns:
+            int: número de barras insertadas o actualizadas
+        """
+        from apps.stocks.models import PriceBar
+
+        symbol = symbol.upper()
+        ticker = yf.Ticker(symbol)
+        yahoo = get_upstream('yahoo')
+
+        if start is None and not full:
+            start = HistoryStore.last_date(symbol)
+            if start is not None and HistoryStore.needs_backfill(symbol):
+                start = None
+        if start is None:
+            hist = yahoo.call(ticker.history, period=HistoryStore._config().get('INITIAL_PERIOD', '10y'))
+        else:
+            hist = yahoo.call(ticker.history, start=start.isoformat())
+
+        if hist.empty:
+            return 0
+
+        hist = hist[HistoryStore.COLUMNS].dropna(subset=['Close'])
+        bars = [
+            PriceBar(
+                symbol=symbol,
+                date=day.date(),
+                open=float(open_),
+                high=float(high),
+                low=float(low),
+                close=float(close),
+                volume=0 if pd.isna(volume) else int(volume),
+            )
+            for day, open_, high, low, close, volume in hist.itertuples(name=None)
+        ]
+
+        PriceBar.objects.bulk_create(
+            bars,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['symbol', 'date'],
+            update_fields=['open', 'high', 'low', 'close', 'volume'],
+        )
+        if start is None:
+            # Lo guardado ya es todo el histórico que Yahoo tiene del símbolo
+            get_quote_cache().backend.set(f"history:complete:{symbol}", True, 30 * 86400)
+        logger.info(f"Histórico sincronizado para {symbol}: {len(bars)} barras")
+        return len(bars)
+
+    @staticmethod
+    def _enqueue_sync(symbol, full=False):
+        """
+        Encola la sincronización en Celery sin bloquear si el broker está caído.
+        Devuelve False si no se pudo encolar.
+        """
+        from apps.stocks.tasks import sync_symbol_history
+
+        try:
+            sync_symbol_history.apply_async((symbol,), {'full': full}, retry=False)
+        except Exception as e:
+            logger.warning(f"No se pudo encolar la sincronización del histórico de {symbol}: {str(e)}")
+            return False
+        return True
+
+    @staticmethod
+    def ensure_synced(symbol, start=None):
+        """
+        Deja el símbolo listo para leer el rango que empieza en start.
+
+        Un símbolo que nunca se sincronizó se descarga en la petición, pero
+        solo desde start (o el último año si se pidió todo); el resto de
+        INITIAL_PERIOD lo completa una tarea de Celery (si no se puede encolar,
+        la próxima petición lo reintenta). Un símbolo ya guardado no se
+        sincroniza en la petición: si pasaron RESYNC_SECONDS desde la última
+        vez se encola la actualización, que completa INITIAL_PERIOD si falta,
+        y se sirve lo que hay.
+        """
+        symbol = symbol.upper()
+        backend = get_quote_cache().backend
+        marker = f"history:synced:{symbol}"
+        if backend.get(marker):
+            return
+        resync_seconds = HistoryStore._config().get('RESYNC_SECONDS', 21600)
+
+        if HistoryStore.last_date(symbol) is not None:
+            if HistoryStore._enqueue_sync(symbol):
+                backend.set(marker, True, resync_seconds)
+            return
+
+        inline_start = start or date.today() - timedelta(days=HistoryStore.PERIOD_DAYS['1y'])
+        try:
+            HistoryStore.sync(symbol, start=inline_start)
+        except Exception as e:
+            logger.warning(f"No se pudo sincronizar el histórico de {symbol}: {str(e)}")
+            return
+        if HistoryStore._enqueue_sync(symbol, full=True):
+            backend.set(marker, True, resync_seconds)
+
+    @staticmethod
+    def read(symbol, start=None, end=None):
+        """
+        Lee las barras guardadas en el rango como DataFrame indexado por fecha,
+        con las mismas columnas que Ticker.history()
+        """
+        from apps.stocks.models import PriceBar
+
+        bars = PriceBar.objects.filter(symbol=symbol.upper())
+        if start:
+            bars = bars.filter(date__gte=start)
+        if end:
+            bars = bars.filter(date__lte=end)
+
+        rows = bars.order_by('date').values_list('date', 'open', 'high', 'low', 'close', 'volume')
+        return pd.DataFrame(list(rows), columns=['Date'] + HistoryStore.COLUMNS).set_index('Date')
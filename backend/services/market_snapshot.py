@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from services.price_stream import compute_deltas, publish_deltas
+from services.quote_cache import get_quote_cache
+from services.yahoo_finance_service import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+
+class MarketSnapshot:
+    """
+    Foto del mercado (acciones y criptos populares) que refresca una tarea
+    periódica de Celery y que las vistas sirven sin llamar a Yahoo.
+    Se guarda en el mismo backend que la caché de cotizaciones, así que con
+    Redis es compartida entre el worker de Celery y los workers web.
+    """
+
+    KEY = 'market:snapshot'
+    # Marca de que algún proceso ya está renovando una foto vencida
+    REFRESHING_KEY = 'market:snapshot:refreshing'
+
+    _refresh_lock = threading.Lock()
+
+    @staticmethod
+    def _config():
+        return getattr(settings, 'MARKET_SNAPSHOT', {})
+
+    @staticmethod
+    def _backend():
+        return get_quote_cache().backend
+
+    @staticmethod
+    def get():
+        """Retorna la última foto guardada o None"""
+        return MarketSnapshot._backend().get(MarketSnapshot.KEY)
+
+    @staticmethod
+    def refresh():
+        """
+        Descarga el mercado y guarda una nueva versión de la foto.
+        Si la descarga falla o viene vacía se conserva la versión anterior.
+        """
+        previous = MarketSnapshot.get()
+        try:
+            data = YahooFinanceService.get_all_market_data(refresh=True)
+        except Exception as e:
+            logger.error(f"Error refrescando la foto del mercado: {str(e)}")
+            return previous
+
+        if not data['total']:
+            logger.warning("Yahoo no devolvió cotizaciones, se conserva la foto anterior")
+            return previous
+
+        snapshot = {
+            'version': (previous or {}).get('version', 0) + 1,
+            'generated_at': time.time(),
+            'stocks': data['stocks'],
+            'cryptos': data['cryptos'],
+        }
+        MarketSnapshot._backend().set(
+            MarketSnapshot.KEY,
+            snapshot,
+            MarketSnapshot._config().get('RETENTION', 86400)
+        )
+        
+        # Avisar a los clientes del canal de precios solo de lo que cambió
+        publish_deltas(compute_deltas(previous, snapshot), snapshot['version'])
+        return snapshot
+
+    @staticmethod
+    def _refresh_in_background():
+        """
+        Renueva la foto en un hilo, sin hacer esperar a la petición. Una sola
+        renovación a la vez por proceso y, con la marca REFRESHING_KEY en el
+        backend compartido, como mucho una cada REFRESH_SECONDS entre procesos.
+        """
+        if not MarketSnapshot._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            backend = MarketSnapshot._backend()
+            if backend.get(MarketSnapshot.REFRESHING_KEY):
+                MarketSnapshot._refresh_lock.release()
+                return
+            backend.set(MarketSnapshot.REFRESHING_KEY, True, MarketSnapshot._config().get('REFRESH_SECONDS', 30))
+        except Exception:
+            MarketSnapshot._refresh_lock.release()
+            raise
+
+        def run():
+            try:
+                MarketSnapshot.refresh()
+            finally:
+                MarketSnapshot._refresh_lock.release()
+
+        threading.Thread(target=run, name='market-snapshot-refresh', daemon=True).start()
+
+    @staticmethod
+    def get_or_refresh(generate=True):
+        """
+        Retorna la foto guardada. Si no existe ninguna (arranque en frío) la
+        genera en la petición, una vez por proceso, salvo con generate=False
+        (retorna None); si está vencida (MAX_AGE, p. ej. beat o el worker
+        están caídos) la sirve igual y la renueva en segundo plano.
+        """
+        snapshot = MarketSnapshot.get()
+        if snapshot is not None:
+            if MarketSnapshot.metadata(snapshot)['stale']:
+                try:
+                    MarketSnapshot._refresh_in_background()
+                except Exception as e:
+                    logger.error(f"No se pudo iniciar la renovación de la foto del mercado: {str(e)}")
+            return snapshot
+        if not generate:
+            return None
+        with MarketSnapshot._refresh_lock:
+            snapshot = MarketSnapshot.get()
+            if snapshot is None:
+                snapshot = MarketSnapshot.refresh()
+        return snapshot
+
+    @staticmethod
+    def metadata(snapshot):
+        """Versión y antigüedad de la foto para incluir en las respuestas"""
+        age = max(time.time() - snapshot['generated_at'], 0)
+        return {
+            'snapshot_version': snapshot['version'],
+            'snapshot_age': round(age, 1),
+            'stale': age > MarketSnapshot._config().get('MAX_AGE', 120),
+        }
@@ -0,0 +1,70 @@
+import logging
+import re
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+GROUP_PREFIX = 'prices.'
+
+
+def group_name(symbol):
+    """Nombre del grupo de channels para un símbolo (solo caracteres válidos)"""
+    return GROUP_PREFIX + re.sub(r'[^A-Za-z0-9._-]', '_', symbol.upper())
+
+
+def streamed_symbols():
+    """Símbolos cuyos cambios publica el refresco de la foto del mercado"""
+    from services.yahoo_finance_service import YahooFinanceService
+
+    return frozenset(YahooFinanceService.POPULAR_STOCKS + YahooFinanceService.POPULAR_CRYPTOS)
+
+
+def compute_deltas(previous, snapshot):
+    """
+    Cotizaciones de la nueva foto del mercado que cambiaron respecto a la anterior.
+    Sin foto anterior se consideran nuevas todas.
+    """
+    old = {}
+    if previous:
+        for quote in previous.get('stocks', []) + previous.get('cryptos', []):
+            old[quote['symbol']] = quote
+
+    deltas = []
+    for quote in snapshot.get('stocks', []) + snapshot.get('cryptos', []):
+        before = old.get(quote['symbol'])
+        if before is None or before['price'] != quote['price'] or before['volume'] != quote['volume']:
+            deltas.append({
+                'symbol': quote['symbol'],
+                'price': quote['price'],
+                'change': quote['change'],
+                'changePercent': quote['changePercent'],
+                'volume': quote['volume'],
+                'lastUpdate': quote['lastUpdate'],
+            })
+    return deltas
+
+
+def publish_deltas(deltas, version=None):
+    """
+    Envía cada cambio al grupo de su símbolo. Una sola descarga del refresco
+    llega así a todos los clientes conectados, sin importar cuántos sean.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not deltas:
+        return 0
+
+    send = async_to_sync(channel_layer.group_send)
+    sent = 0
+    for delta in deltas:
+        try:
+            send(group_name(delta['symbol']), {
+                'type': 'price.delta',
+                'quote': delta,
+                'version': version,
+            })
+            sent += 1
+        except Exception as e:
+            logger.warning(f"No se pudo publicar el precio de {delta['symbol']}: {str(e)}")
+    return sent
@@ -0,0 +1,311 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCacheBackend:
+    """Backend en memoria del proceso con expiración por entrada y desalojo LRU"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        result = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (value, time.time() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCacheBackend:
+    """Backend compartido en Redis; los valores se guardan como JSON"""
+
+    def __init__(self, location, prefix='tikal'):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(location)
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def get(self, key):
+        raw = self._client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        raws = self._client.mget([self._key(k) for k in keys])
+        return {k: json.loads(raw) for k, raw in zip(keys, raws) if raw is not None}
+
+    def set(self, key, value, timeout):
+        self._client.set(self._key(key), json.dumps(value), ex=max(int(timeout), 1))
+
+    def delete(self, key):
+        self._client.delete(self._key(key))
+
+    def clear(self):
+        keys = list(self._client.scan_iter(f"{self.prefix}:*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(f"{self.prefix}:*"))
+
+
+class _Flight:
+    """Petición upstream en curso compartida por los que esperan el mismo símbolo"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class QuoteCache:
+    """
+    Caché de cotizaciones por símbolo.
+
+    Cada entrada se considera fresca durante su TTL y se conserva como
+    "stale" durante STALE_TTL adicional, para poder servirla si el upstream
+    falla. Las peticiones concurrentes para un mismo símbolo sin entrada
+    fresca se agrupan en una sola llamada al upstream.
+    """
+
+    def __init__(self, backend, ttl=60, stale_ttl=900, ttl_overrides=None, namespace='quote', wait_timeout=15):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.ttl_overrides = ttl_overrides or {}
+        self.namespace = namespace
+        self.wait_timeout = wait_timeout
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'fetches': 0, 'collapsed': 0, 'errors': 0}
+
+    def ttl_for(self, symbol):
+        """TTL en segundos para un símbolo (exacto o por sufijo, p. ej. '-USD')"""
+        symbol = symbol.upper()
+        if symbol in self.ttl_overrides:
+            return self.ttl_overrides[symbol]
+        for suffix, ttl in self.ttl_overrides.items():
+            if suffix.startswith('-') and symbol.endswith(suffix):
+                return ttl
+        return self.ttl
+
+    def _key(self, symbol):
+        return f"{self.namespace}:{symbol.upper()}"
+
+    def _incr(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _lookup(self, symbol):
+        """Retorna (valor, es_fresco) o (None, False) si no hay entrada"""
+        entry = self.backend.get(self._key(symbol))
+        if entry is None:
+            return None, False
+        return entry['value'], entry['fresh_until'] > time.time()
+
+    def get(self, symbol):
+        """Retorna la cotización si está fresca; None en caso contrario"""
+        value, fresh = self._lookup(symbol)
+        if value is not None and fresh:
+            self._incr('hits')
+            return value
+        self._incr('stale' if value is not None else 'misses')
+        return None
+
+    def get_many(self, symbols):
+        """
+        Busca varios símbolos en una sola consulta al backend.
+
+        Returns:
+            tuple: (dict con las cotizaciones frescas, lista de símbolos a refrescar)
+        """
+        keys = {self._key(s): s for s in symbols}
+        entries = self.backend.get_many(keys.keys())
+        now = time.time()
+        found, missing = {}, []
+        hits = misses = stale = 0
+        for key, symbol in keys.items():
+            entry = entries.get(key)
+            if entry is None:
+                misses += 1
+                missing.append(symbol)
+            elif entry['fresh_until'] > now:
+                hits += 1
+                found[symbol] = entry['value']
+            else:
+                stale += 1
+                missing.append(symbol)
+        with self._stats_lock:
+            self._stats['hits'] += hits
+            self._stats['misses'] += misses
+            self._stats['stale'] += stale
+        return found, missing
+
+    def get_stale(self, symbol):
+        """Retorna la última cotización conocida, aunque haya vencido su TTL"""
+        value, _ = self._lookup(symbol)
+        return value
+
+    def set(self, symbol, value):
+        ttl = self.ttl_for(symbol)
+        self.backend.set(
+            self._key(symbol),
+            {'value': value, 'fresh_until': time.time() + ttl},
+            ttl + self.stale_ttl,
+        )
+
+    def delete(self, symbol):
+        self.backend.delete(self._key(symbol))
+
+    def get_or_fetch(self, symbol, fetch):
+        """
+        Retorna la cotización desde caché o llamando a fetch() una sola vez
+        aunque haya varios hilos pidiendo el mismo símbolo.
+        Si fetch() falla y existe una entrada vencida, se sirve esa.
+        """
+        value, fresh = self._lookup(symbol)
+        if value is not None and fresh:
+            self._incr('hits')
+            return value
+        self._incr('stale' if value is not None else 'misses')
+
+        key = self._key(symbol)
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            self._incr('collapsed')
+            flight.event.wait(self.wait_timeout)
+            return flight.result if flight.result is not None else value
+
+        try:
+            self._incr('fetches')
+            result = fetch()
+            if result is not None:
+                self.set(symbol, result)
+            flight.result = result if result is not None else value
+        except Exception as e:
+            self._incr('errors')
+            logger.warning(f"Error refrescando {symbol}, se usa caché vencida: {str(e)}")
+            flight.result = value
+        finally:
+            flight.event.set()
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+        return flight.result
+
+    def stats(self):
+        """Contadores de uso para ajustar los TTL"""
+        with self._stats_lock:
+            data = dict(self._stats)
+        lookups = data['hits'] + data['misses'] + data['stale']
+        data['hit_ratio'] = round(data['hits'] / lookups, 4) if lookups else 0.0
+        data['entries'] = len(self.backend)
+        data['ttl'] = self.ttl
+        data['ttl_overrides'] = self.ttl_overrides
+        return data
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+def build_backend(config):
+    """Construye el backend configurado ('local' o 'redis')"""
+    if config.get('BACKEND') == 'redis' and config.get('LOCATION'):
+        try:
+            return RedisCacheBackend(config['LOCATION'], prefix=config.get('KEY_PREFIX', 'tikal'))
+        except ImportError:
+            logger.warning("redis no está instalado, se usa la caché local")
+    return LocalCacheBackend(max_entries=config.get('MAX_ENTRIES', 1024))
+
+
+_backend = None
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(namespace, ttl_key, default_ttl, use_overrides=False):
+    global _backend
+    if namespace not in _caches:
+        with _caches_lock:
+            if namespace not in _caches:
+                config = getattr(settings, 'QUOTE_CACHE', {})
+                if _backend is None:
+                    _backend = build_backend(config)
+                _caches[namespace] = QuoteCache(
+                    _backend,
+                    ttl=config.get(ttl_key, default_ttl),
+                    stale_ttl=config.get('STALE_TTL', 900),
+                    ttl_overrides=config.get('TTL_OVERRIDES') if use_overrides else None,
+                    namespace=namespace,
+                )
+    return _caches[namespace]
+
+
+def get_quote_cache():
+    """Instancia compartida de QuoteCache para cotizaciones según settings.QUOTE_CACHE"""
+    return _get_cache('quote', 'TTL', 60, use_overrides=True)
+
+
+def get_fundamentals_cache():
+    """Caché de datos fundamentales (sector, descripción, beta, P/E...), que cambian como mucho a diario"""
+    return _get_cache('fundamentals', 'FUNDAMENTALS_TTL', 86400)
+
+
+def get_chart_quote_cache():
+    """
+    Cotizaciones armadas desde el endpoint de gráficos (cliente async). Van
+    aparte porque no traen capitalización ni nombre completo y no deben
+    reemplazar a las de get_quote_cache().
+    """
+    return _get_cache('chart', 'TTL', 60, use_overrides=True)
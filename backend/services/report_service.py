@@ -1,9 +1,12 @@
 import io
-from datetime import datetime
-from decimal import Decimal
+from datetime import datetime, timedelta
 from django.core.mail import EmailMessage
 from django.conf import settings
-from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,11 +16,6 @@ class ReportService:
     """Servicio para generar y enviar reportes en PDF"""
     
     def __init__(self):
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.lib import colors
-        
         self.letter = letter
         self.A4 = A4
         self.inch = inch
@@ -40,7 +38,6 @@ class ReportService:
             textColor=colors.HexColor('#667eea'),
             spaceAfter=12
         )
-        )
     
     def generate_and_send_report(self, user, report_types, start_date, end_date, recipient_email):
         """
@@ -57,13 +54,6 @@ class ReportService:
             dict: {'success': bool, 'message': str, 'file': BytesIO}
         """
         try:
-            # Importar reportlab solo cuando se necesite
-            from reportlab.lib.pagesizes import letter
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib.units import inch
-            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-            from reportlab.lib import colors
-            
             # Crear PDF en memoria
             pdf_buffer = io.BytesIO()
             doc = SimpleDocTemplate(pdf_buffer, pagesize=letter)
@@ -84,16 +74,16 @@ class ReportService:
             
             # Agregar secciones según tipos solicitados
             if 'complete' in report_types or 'profile' in report_types:
-                story.extend(self._generate_profile_section(user, Paragraph, Spacer, inch, colors, Table, TableStyle))
+                story.extend(self._generate_profile_section(user))
             
             if 'complete' in report_types or 'portfolio' in report_types:
-                story.extend(self._generate_portfolio_section(user, start_date, end_date, Paragraph, Spacer, inch, colors, Table, TableStyle))
+                story.extend(self._generate_portfolio_section(user, start_date, end_date))
             
             if 'complete' in report_types or 'transactions' in report_types:
-                story.extend(self._generate_transactions_section(user, start_date, end_date, Paragraph, Spacer, inch, colors, Table, TableStyle))
+                story.extend(self._generate_transactions_section(user, start_date, end_date))
             
             if 'complete' in report_types or 'performance' in report_types:
-                story.extend(self._generate_performance_section(user, start_date, end_date, Paragraph, Spacer, inch, colors, Table, TableStyle))
+                story.extend(self._generate_performance_section(user, start_date, end_date))
             
             # Construir PDF
             doc.build(story)
@@ -165,17 +155,19 @@ class ReportService:
         elements.append(Paragraph("💼 Estado del Portafolio", self.heading_style))
         
         try:
-            from apps.portfolio.models import Portfolio, StockTransaction
+            from apps.portfolio.checkpoints import as_of
+            from apps.portfolio.models import Portfolio
             
             portfolio = Portfolio.objects.get(user=user)
+            summary = portfolio.get_summary()
             
             # Información general del portafolio
             portfolio_data = [
-                ['Valor Total del Portafolio', f"${portfolio.total_value:,.2f}"],
-                ['Inversión Total', f"${portfolio.total_invested:,.2f}"],
-                ['Ganancias/Pérdidas', f"${portfolio.total_gains:,.2f}"],
-                ['Retorno %', f"{portfolio.gains_percentage:.2f}%"],
-                ['Cantidad de Acciones', f"{portfolio.total_shares}"],
+                ['Valor Total del Portafolio', f"${summary['current_value']:,.2f}"],
+                ['Inversión Total', f"${summary['total_invested']:,.2f}"],
+                ['Ganancias/Pérdidas', f"${summary['total_gains']:,.2f}"],
+                ['Retorno %', f"{summary['gains_percentage']:.2f}%"],
+                ['Cantidad de Acciones', f"{summary['total_shares']}"],
             ]
             
             table = Table(portfolio_data, colWidths=[2*inch, 3.5*inch])
@@ -192,21 +184,26 @@ class ReportService:
             elements.append(table)
             elements.append(Spacer(1, 0.2 * inch))
             
-            # Distribución de activos
-            holdings = portfolio.get_holdings()
-            if holdings:
+            # Distribución de activos al inicio y al cierre del período.
+            # Al inicio = al cierre del día anterior a start_date
+            holdings_start = as_of(user, start_date - timedelta(days=1))
+            holdings = as_of(user, end_date)
+            if holdings or holdings_start:
                 elements.append(Paragraph("Distribución de Activos", self.styles['Heading3']))
                 
-                holdings_data = [['Símbolo', 'Cantidad', 'Precio Promedio', 'Valor Total']]
-                for symbol, data in holdings.items():
+                holdings_data = [['Símbolo', 'Cantidad Inicial', 'Cantidad Final', 'Precio Promedio', 'Costo Total']]
+                for symbol in sorted(set(holdings) | set(holdings_start)):
+                    start = holdings_start.get(symbol)
+                    end = holdings.get(symbol)
                     holdings_data.append([
                         symbol,
-                        str(data['shares']),
-                        f"${data['averagePrice']:.2f}",
-                        f"${data['totalValue']:.2f}"
+                        str(start.shares if start else 0),
+                        str(end.shares if end else 0),
+                        f"${end.average_price:.2f}" if end else '-',
+                        f"${end.cost_basis:.2f}" if end else '-'
                     ])
                 
-                holdings_table = Table(holdings_data, colWidths=[1*inch, 1*inch, 1.5*inch, 1.5*inch])
+                holdings_table = Table(holdings_data, colWidths=[1*inch, 1.1*inch, 1.1*inch, 1.2*inch, 1.2*inch])
                 holdings_table.setStyle(TableStyle([
                     ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
                     ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -221,7 +218,7 @@ class ReportService:
         
         except Exception as e:
             logger.error(f"Error generando portafolio: {str(e)}")
-            elements.append(Paragraph(f"No hay datos de portafolio disponibles", self.styles['Normal']))
+            elements.append(Paragraph("No hay datos de portafolio disponibles", self.styles['Normal']))
         
         elements.append(Spacer(1, 0.3 * inch))
         elements.append(PageBreak())
@@ -252,7 +249,7 @@ class ReportService:
                         tx.transaction_type.upper(),
                         str(tx.shares),
                         f"${tx.price_per_share:.2f}",
-                        f"${tx.total_value:.2f}"
+                        f"${tx.total:.2f}"
                     ])
                 
                 table = Table(tx_data, colWidths=[1*inch, 1*inch, 0.7*inch, 0.8*inch, 1*inch, 1*inch])
@@ -273,7 +270,7 @@ class ReportService:
         
         except Exception as e:
             logger.error(f"Error generando transacciones: {str(e)}")
-            elements.append(Paragraph(f"No hay datos de transacciones disponibles", self.styles['Normal']))
+            elements.append(Paragraph("No hay datos de transacciones disponibles", self.styles['Normal']))
         
         elements.append(Spacer(1, 0.3 * inch))
         elements.append(PageBreak())
@@ -289,14 +286,16 @@ class ReportService:
             from apps.portfolio.models import Portfolio
             
             portfolio = Portfolio.objects.get(user=user)
+            summary = portfolio.get_summary()
             
             performance_data = [
                 ['Métrica', 'Valor'],
-                ['Valor Total del Portafolio', f"${portfolio.total_value:,.2f}"],
-                ['Inversión Total', f"${portfolio.total_invested:,.2f}"],
-                ['Ganancias Totales', f"${portfolio.total_gains:,.2f}"],
-                ['Retorno Porcentual', f"{portfolio.gains_percentage:.2f}%"],
-                ['Cantidad de Acciones', str(portfolio.total_shares)],
+                ['Valor Total del Portafolio', f"${summary['current_value']:,.2f}"],
+                ['Inversión Total', f"${summary['total_invested']:,.2f}"],
+                ['Ganancias Totales', f"${summary['total_gains']:,.2f}"],
+                ['Ganancia Realizada', f"${summary['realized_pnl']:,.2f}"],
+                ['Retorno Porcentual', f"{summary['gains_percentage']:.2f}%"],
+                ['Cantidad de Acciones', str(summary['total_shares'])],
                 ['Última Actualización', portfolio.updated_at.strftime('%d/%m/%Y %H:%M')],
             ]
             
@@ -330,7 +329,7 @@ class ReportService:
         
         except Exception as e:
             logger.error(f"Error generando rendimiento: {str(e)}")
-            elements.append(Paragraph(f"No hay datos de rendimiento disponibles", self.styles['Normal']))
+            elements.append(Paragraph("No hay datos de rendimiento disponibles", self.styles['Normal']))
         
         elements.append(Spacer(1, 0.3 * inch))
         
@@ -0,0 +1,232 @@
+import csv
+import difflib
+import logging
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LISTING_FILE = Path(__file__).resolve().parent / 'data' / 'symbols.csv'
+
+# Palabras de los nombres que no aportan a la búsqueda ("Apple Inc." -> "apple")
+NAME_STOPWORDS = {
+    'inc', 'the', 'corporation', 'corp', 'company', 'co', 'plc', 'ltd',
+    'limited', 'incorporated', 'sa', 'and', 'of', '&',
+}
+
+
+def normalize(text):
+    """Minúsculas y sin acentos, para comparar 'Nestlé' con 'nestle'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+def name_tokens(name):
+    return [t for t in re.split(r'[^a-z0-9]+', normalize(name)) if t and t not in NAME_STOPWORDS]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = []
+
+
+class SymbolIndex:
+    """
+    Índice en memoria del directorio de símbolos.
+
+    Tiene dos tries: uno por símbolo y otro por cada palabra del nombre.
+    Cada nodo guarda ya ordenados los mejores resultados de su prefijo,
+    así una búsqueda solo recorre tantos nodos como letras tenga la consulta.
+    """
+
+    # Resultados guardados por nodo del trie
+    MAX_PER_NODE = 50
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.by_symbol = {e['symbol']: i for i, e in enumerate(self.entries)}
+        self._symbols = _TrieNode()
+        self._tokens = _TrieNode()
+        self._vocabulary = {}
+
+        for i, entry in enumerate(self.entries):
+            self._insert(self._symbols, entry['symbol'].lower(), i)
+            for token in set(name_tokens(entry['name'])):
+                self._insert(self._tokens, token, i)
+                self._vocabulary.setdefault(token, set()).add(i)
+            self._vocabulary.setdefault(entry['symbol'].lower(), set()).add(i)
+
+        self._finish(self._symbols)
+        self._finish(self._tokens)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _insert(root, key, entry_id):
+        node = root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.ids.append(entry_id)
+
+    def _rank(self, entry_id):
+        entry = self.entries[entry_id]
+        return (entry['priority'], len(entry['symbol']), entry['symbol'])
+
+    def _finish(self, root):
+        """Ordena y recorta los resultados de cada nodo una vez construido el trie"""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.ids = sorted(set(node.ids), key=self._rank)[:self.MAX_PER_NODE]
+            stack.extend(node.children.values())
+
+    @staticmethod
+    def _lookup(root, prefix):
+        node = root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.ids
+
+    def _name_matches(self, words):
+        """Entradas cuyo nombre tiene una palabra que empieza por cada palabra de la consulta"""
+        matches = None
+        for word in words:
+            ids = set(self._lookup(self._tokens, word))
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return []
+        return sorted(matches, key=self._rank)
+
+    def _fuzzy_matches(self, query):
+        """Palabras parecidas (errores de tipeo) cuando no hay coincidencias por prefijo"""
+        close = difflib.get_close_matches(query, self._vocabulary.keys(), n=5, cutoff=0.75)
+        ids = set()
+        for word in close:
+            ids |= self._vocabulary[word]
+        return sorted(ids, key=self._rank)
+
+    def search(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+
+        words = [w for w in re.split(r'[^a-z0-9]+', query) if w]
+        ordered = []
+        exact = self.by_symbol.get(query.upper())
+        if exact is not None:
+            ordered.append(exact)
+        ordered += self._lookup(self._symbols, query)
+        if words:
+            ordered += self._name_matches(words)
+        if not ordered and len(query) >= 3:
+            ordered += self._fuzzy_matches(query)
+
+        seen, results = set(), []
+        for entry_id in ordered:
+            if entry_id in seen:
+                continue
+            seen.add(entry_id)
+            entry = self.entries[entry_id]
+            results.append({
+                'symbol': entry['symbol'],
+                'name': entry['name'],
+                'exchange': entry['exchange'],
+                'type': entry['type'],
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+
+class SymbolDirectory:
+    """
+    Directorio local de símbolos para el autocompletado de /api/stocks/search/.
+    Se arma con el archivo de listados incluido en el repositorio y la tabla
+    Stock, sin llamar a Yahoo; el índice se construye una vez por proceso y
+    se vuelve a construir cuando cambia la tabla Stock.
+    """
+
+    _index = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _config():
+        return getattr(settings, 'SYMBOL_DIRECTORY', {})
+
+    @staticmethod
+    def _load_listing(path):
+        entries = []
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if row.get('symbol'):
+                        entries.append({
+                            'symbol': row['symbol'].strip().upper(),
+                            'name': (row.get('name') or '').strip(),
+                            'exchange': (row.get('exchange') or '').strip(),
+                            'type': (row.get('type') or 'stock').strip(),
+                        })
+        except OSError as e:
+            logger.warning(f"No se pudo leer el listado de símbolos {path}: {str(e)}")
+        return entries
+
+    @staticmethod
+    def load_entries():
+        """Une el listado incluido con la tabla Stock (la tabla tiene prioridad)"""
+        from apps.stocks.models import Stock
+        from services.yahoo_finance_service import YahooFinanceService
+
+        path = SymbolDirectory._config().get('LISTING_FILE', DEFAULT_LISTING_FILE)
+        entries = {e['symbol']: e for e in SymbolDirectory._load_listing(path)}
+
+        try:
+            for symbol, name, category in Stock.objects.values_list('symbol', 'name', 'category'):
+                symbol = symbol.upper()
+                entry = entries.setdefault(symbol, {
+                    'symbol': symbol,
+                    'exchange': '',
+                    'type': 'crypto' if symbol.endswith('-USD') else 'stock',
+                })
+                entry['name'] = name or entry.get('name', symbol)
+                if category:
+                    entry['category'] = category
+        except Exception as e:
+            logger.warning(f"No se pudo leer la tabla Stock para el directorio: {str(e)}")
+
+        # Los símbolos populares del mercado aparecen primero
+        popular = set(YahooFinanceService.POPULAR_STOCKS + YahooFinanceService.POPULAR_CRYPTOS)
+        for entry in entries.values():
+            entry['priority'] = 0 if entry['symbol'] in popular else 1
+        return list(entries.values())
+
+    @staticmethod
+    def get_index():
+        index = SymbolDirectory._index
+        if index is None:
+            with SymbolDirectory._lock:
+                index = SymbolDirectory._index
+                if index is None:
+                    index = SymbolIndex(SymbolDirectory.load_entries())
+                    SymbolDirectory._index = index
+                    logger.info(f"Directorio de símbolos cargado: {len(index)} símbolos")
+        return index
+
+    @staticmethod
+    def search(query, limit=10):
+        """Busca por prefijo de símbolo o de palabras del nombre, con tolerancia a errores de tipeo"""
+        return SymbolDirectory.get_index().search(query, limit)
+
+    @staticmethod
+    def invalidate():
+        """Descarta el índice; se vuelve a construir en la siguiente búsqueda"""
+        SymbolDirectory._index = None
@@ -0,0 +1,260 @@
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """El upstream no se consulta: circuito abierto o sin capacidad disponible"""
+
+
+# Excepciones de yfinance que significan "ese símbolo no existe o no tiene datos"
+SYMBOL_ERRORS = {'YFTickerMissingError', 'YFPricesMissingError', 'YFTzMissingError', 'YFInvalidPeriodError'}
+
+
+def is_symbol_error(exc):
+    """
+    True si el upstream respondió que el símbolo no existe (p. ej. un ticker
+    mal escrito): no es una falla del upstream, no se reintenta ni abre el circuito.
+    """
+    response = getattr(exc, 'response', None)
+    if getattr(response, 'status_code', None) in (400, 404):
+        return True
+    return any(cls.__name__ in SYMBOL_ERRORS for cls in type(exc).__mro__)
+
+
+class CircuitBreaker:
+    """
+    Circuito de tres estados por upstream.
+
+    - closed: las llamadas pasan; FAILURE_THRESHOLD llamadas fallidas
+      seguidas (ya agotados sus reintentos) lo abren.
+    - open: las llamadas fallan de inmediato durante RECOVERY_TIMEOUT segundos.
+    - half_open: pasa una sola llamada de prueba; si va bien se cierra,
+      si falla se vuelve a abrir.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True si la llamada puede ir al upstream"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuito de upstream cerrado tras una llamada correcta")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """Libera la llamada de prueba que no llegó a tener resultado (p. ej. sin capacidad)"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuito de upstream abierto tras {self.failures} fallos")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def retry_in(self):
+        """Segundos hasta la siguiente llamada de prueba (0 si no está abierto)"""
+        if self.state != self.OPEN:
+            return 0
+        return max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0)
+
+
+class AdaptiveLimiter:
+    """
+    Límite de llamadas simultáneas que se ajusta solo (AIMD): sube de a poco
+    mientras las respuestas llegan rápido y sin error, y se recorta a una
+    fracción cuando hay errores o la latencia supera TARGET_LATENCY.
+    """
+
+    def __init__(self, initial=5, min_limit=1, max_limit=20, target_latency=2.0, backoff=0.7):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        """Espera un lugar libre hasta timeout segundos; False si no lo hubo"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, latency, ok):
+        with self._cond:
+            self.in_flight -= 1
+            if ok and latency <= self.target_latency:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            else:
+                self.limit = max(self.limit * self.backoff, self.min_limit)
+            self._cond.notify_all()
+
+
+class UpstreamClient:
+    """
+    Punto único por el que pasan las llamadas a un upstream (p. ej. Yahoo).
+    Combina circuito, límite adaptativo de concurrencia y reintentos con
+    espera exponencial aleatoria. El estado es por proceso.
+    """
+
+    def __init__(self, name, breaker, limiter, retries=2, backoff_base=0.5, backoff_max=4.0, acquire_timeout=5.0):
+        self.name = name
+        self.breaker = breaker
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.acquire_timeout = acquire_timeout
+        self._stats_lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'retries': 0, 'rejected': 0}
+
+    def _incr(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _backoff(self, attempt):
+        """Espera aleatoria entre 0 y base * 2^intento ("full jitter")"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, func, *args, **kwargs):
+        """
+        Ejecuta func(*args, **kwargs) contra el upstream.
+        Lanza UpstreamUnavailable sin esperar si el circuito está abierto, para
+        que quien llama sirva la caché; los demás errores se relanzan después
+        de agotar los reintentos. Para el circuito cuenta una sola falla por
+        llamada, y los errores de símbolo inexistente no cuentan.
+        """
+        if not self.breaker.allow():
+            self._incr('rejected')
+            raise UpstreamUnavailable(
+                f"{self.name} no disponible, reintento en {self.breaker.retry_in():.0f}s"
+            )
+
+        settled = False
+        attempt = 0
+        try:
+            while True:
+                if not self.limiter.acquire(self.acquire_timeout):
+                    self._incr('rejected')
+                    raise UpstreamUnavailable(f"{self.name} sin capacidad disponible")
+
+                self._incr('calls')
+                started = time.monotonic()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    latency = time.monotonic() - started
+                    if is_symbol_error(e):
+                        # El upstream respondió bien: el error es del símbolo pedido
+                        self.limiter.release(latency, ok=True)
+                        self.breaker.record_success()
+                        settled = True
+                        raise
+                    self.limiter.release(latency, ok=False)
+                    if attempt >= self.retries:
+                        self.breaker.record_failure()
+                        self._incr('failures')
+                        settled = True
+                        raise
+                    attempt += 1
+                    self._incr('retries')
+                    logger.info(f"Reintentando llamada a {self.name} ({attempt}/{self.retries}): {str(e)}")
+                    time.sleep(self._backoff(attempt))
+                    continue
+                except BaseException:
+                    self.limiter.release(time.monotonic() - started, ok=False)
+                    raise
+
+                self.limiter.release(time.monotonic() - started, ok=True)
+                self.breaker.record_success()
+                settled = True
+                return result
+        finally:
+            if not settled:
+                # Sin capacidad o interrumpida: la prueba del half_open queda libre para otra llamada
+                self.breaker.release_probe()
+
+    def stats(self):
+        with self._stats_lock:
+            data = dict(self._stats)
+        data.update({
+            'state': self.breaker.state,
+            'retry_in': round(self.breaker.retry_in(), 1),
+            'concurrency_limit': round(self.limiter.limit, 2),
+            'in_flight': self.limiter.in_flight,
+        })
+        return data
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_upstream(name):
+    """Cliente compartido para el upstream name según settings.UPSTREAM[name]"""
+    if name not in _clients:
+        with _clients_lock:
+            if name not in _clients:
+                config = getattr(settings, 'UPSTREAM', {}).get(name, {})
+                _clients[name] = UpstreamClient(
+                    name,
+                    CircuitBreaker(
+                        failure_threshold=config.get('FAILURE_THRESHOLD', 5),
+                        recovery_timeout=config.get('RECOVERY_TIMEOUT', 30),
+                    ),
+                    AdaptiveLimiter(
+                        initial=config.get('CONCURRENCY', 5),
+                        min_limit=config.get('MIN_CONCURRENCY', 1),
+                        max_limit=config.get('MAX_CONCURRENCY', 20),
+                        target_latency=config.get('TARGET_LATENCY', 2.0),
+                    ),
+                    retries=config.get('RETRIES', 2),
+                    backoff_base=config.get('BACKOFF_BASE', 0.5),
+                    backoff_max=config.get('BACKOFF_MAX', 4.0),
+                    acquire_timeout=config.get('ACQUIRE_TIMEOUT', 5.0),
+                )
+    return _clients[name]
@@ -4,8 +4,24 @@ from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
+from services.quote_cache import get_quote_cache, get_fundamentals_cache
+from services.history_store import HistoryStore
+from services.history_serializer import RECORDS, serialize_bars, empty_bars, bars_count
+from services.upstream import UpstreamUnavailable, get_upstream
+
 logger = logging.getLogger(__name__)
 
+# Partes en las que se divide el detalle de una acción
+DETAIL_FACETS = ('fundamentals', 'quote', 'history')
+
+# Pool compartido para descargar en paralelo las partes del detalle
+_facet_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='stock-detail')
+
+
+def _yahoo():
+    """Cliente con circuito y límite de concurrencia para todas las llamadas a Yahoo"""
+    return get_upstream('yahoo')
+
 
 class YahooFinanceService:
     """Servicio para obtener datos de Yahoo Finance"""
@@ -24,63 +40,198 @@ class YahooFinanceService:
         'BTC-USD', 'ETH-USD', 'BNB-USD', 'XRP-USD', 'ADA-USD'
     ]
     
+    # Endpoint de cotizaciones de Yahoo que acepta varios símbolos por petición
+    QUOTE_URL = 'https://query1.finance.yahoo.com/v7/finance/quote'
+    QUOTE_FIELDS = [
+        'regularMarketPrice', 'regularMarketPreviousClose', 'regularMarketVolume',
+        'marketCap', 'currency', 'longName', 'shortName'
+    ]
+    BATCH_SIZE = 50
+    
+    # Segundos máximos de espera por cada parte del detalle
+    FACET_TIMEOUT = 15
+    
     @staticmethod
     def get_stock_data(symbol):
-        """Obtiene datos de una acción específica"""
+        """Obtiene datos de una acción específica (pasando por la caché de cotizaciones)"""
+        return get_quote_cache().get_or_fetch(
+            symbol,
+            lambda: YahooFinanceService._fetch_stock_data(symbol)
+        )
+    
+    @staticmethod
+    def get_cache_stats():
+        """Contadores de aciertos/fallos de la caché de cotizaciones"""
+        return get_quote_cache().stats()
+    
+    @staticmethod
+    def get_upstream_stats():
+        """Estado del circuito y concurrencia actual hacia Yahoo"""
+        return _yahoo().stats()
+    
+    @staticmethod
+    def _fetch_stock_data(symbol):
+        """
+        Descarga la cotización de una acción directamente de Yahoo Finance.
+        Con el circuito abierto lanza UpstreamUnavailable sin esperar, para que
+        la caché sirva la última cotización conocida.
+        """
         try:
-            ticker = yf.Ticker(symbol)
-            
             # Obtener información actual
-            info = ticker.info
-            current_price = info.get('currentPrice', 0)
+            info = _yahoo().call(lambda: yf.Ticker(symbol).info)
+            current_price = info.get('currentPrice') or info.get('regularMarketPrice') or 0
             previous_close = info.get('previousClose', current_price)
             
             if current_price == 0:
                 return None
             
-            change = current_price - previous_close
-            change_percent = (change / previous_close * 100) if previous_close > 0 else 0
-            
-            return {
-                'symbol': symbol,
-                'name': info.get('longName', symbol),
-                'price': round(current_price, 2),
-                'change': round(change, 2),
-                'changePercent': round(change_percent, 2),
-                'volume': info.get('volume', 0),
-                'marketCap': info.get('marketCap', 0),
-                'currency': info.get('currency', 'USD'),
-                'lastUpdate': datetime.now().isoformat()
-            }
+            return YahooFinanceService._build_quote(
+                symbol,
+                current_price,
+                previous_close,
+                info.get('volume', 0),
+                info.get('marketCap', 0),
+                info.get('currency', 'USD'),
+                info.get('longName', symbol),
+            )
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error obteniendo datos de {symbol}: {str(e)}")
             return None
     
     @staticmethod
-    def get_multiple_stocks(symbols):
-        """Obtiene datos de múltiples acciones en paralelo"""
-        stocks = []
+    def _build_quote(symbol, price, previous_close, volume, market_cap, currency, name):
+        """Arma el diccionario de cotización que consumen las vistas"""
+        change = price - previous_close
+        change_percent = (change / previous_close * 100) if previous_close > 0 else 0
+        
+        return {
+            'symbol': symbol,
+            'name': name or symbol,
+            'price': round(price, 2),
+            'change': round(change, 2),
+            'changePercent': round(change_percent, 2),
+            'volume': volume or 0,
+            'marketCap': market_cap or 0,
+            'currency': currency or 'USD',
+            'lastUpdate': datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def _fetch_quotes_batch(symbols):
+        """
+        Descarga las cotizaciones de varios símbolos con una sola petición por lote,
+        pidiendo solo los campos que se usan en lugar del bloque completo de .info
+        
+        Returns:
+            dict: {símbolo: cotización} solo con los símbolos encontrados
+        """
+        from yfinance.data import YfData
+        
+        data = YfData()
+        quotes = {}
+        symbols = [s.upper() for s in symbols]
+        
+        for i in range(0, len(symbols), YahooFinanceService.BATCH_SIZE):
+            chunk = symbols[i:i + YahooFinanceService.BATCH_SIZE]
+            response = _yahoo().call(
+                data.get_raw_json,
+                YahooFinanceService.QUOTE_URL,
+                params={
+                    'symbols': ','.join(chunk),
+                    'fields': ','.join(YahooFinanceService.QUOTE_FIELDS),
+                    'formatted': 'false',
+                }
+            )
+            for item in (response.get('quoteResponse') or {}).get('result') or []:
+                symbol = item.get('symbol')
+                price = item.get('regularMarketPrice') or 0
+                if not symbol or not price:
+                    continue
+                quotes[symbol] = YahooFinanceService._build_quote(
+                    symbol,
+                    price,
+                    item.get('regularMarketPreviousClose') or price,
+                    item.get('regularMarketVolume'),
+                    item.get('marketCap'),
+                    item.get('currency'),
+                    item.get('longName') or item.get('shortName'),
+                )
+        
+        return quotes
+    
+    @staticmethod
+    def _fetch_quotes_individually(symbols):
+        """Ruta anterior: una petición .info por símbolo en paralelo"""
+        quotes = {}
         
-        # Usar ThreadPoolExecutor para hacer peticiones en paralelo
         with ThreadPoolExecutor(max_workers=5) as executor:
-            # Enviar todas las peticiones
             future_to_symbol = {
-                executor.submit(YahooFinanceService.get_stock_data, symbol): symbol 
+                executor.submit(YahooFinanceService._fetch_stock_data, symbol): symbol 
                 for symbol in symbols
             }
             
-            # Recopilar resultados conforme se completan
             for future in as_completed(future_to_symbol):
+                symbol = future_to_symbol[future]
                 try:
                     data = future.result()
                     if data:
-                        stocks.append(data)
+                        quotes[symbol.upper()] = data
+                except UpstreamUnavailable:
+                    continue
                 except Exception as e:
-                    symbol = future_to_symbol[future]
                     logger.error(f"Error procesando {symbol}: {str(e)}")
                     continue
         
-        return stocks
+        return quotes
+    
+    @staticmethod
+    def get_quotes(symbols, refresh=False):
+        """
+        Obtiene cotizaciones de varios símbolos: primero de la caché y los que
+        falten en una sola descarga por lotes.
+        Con refresh=True se ignora la caché y se descargan todos.
+        
+        Returns:
+            dict: {símbolo en mayúsculas: cotización}
+        """
+        cache = get_quote_cache()
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        if refresh:
+            quotes, missing = {}, symbols
+        else:
+            quotes, missing = cache.get_many(symbols)
+        
+        if missing:
+            try:
+                fetched = YahooFinanceService._fetch_quotes_batch(missing)
+            except UpstreamUnavailable as e:
+                # Circuito abierto: no insistir símbolo por símbolo, se sirve la caché
+                logger.warning(f"Yahoo no disponible, se sirven cotizaciones en caché: {str(e)}")
+                fetched = {}
+            except Exception as e:
+                logger.warning(f"Descarga por lotes fallida, se consulta símbolo por símbolo: {str(e)}")
+                fetched = YahooFinanceService._fetch_quotes_individually(missing)
+            
+            for symbol, quote in fetched.items():
+                cache.set(symbol, quote)
+            quotes.update(fetched)
+            
+            # Si Yahoo no devolvió algún símbolo, servir la última cotización conocida
+            for symbol in missing:
+                if symbol not in quotes:
+                    stale = cache.get_stale(symbol)
+                    if stale:
+                        quotes[symbol] = stale
+        
+        return quotes
+    
+    @staticmethod
+    def get_multiple_stocks(symbols):
+        """Obtiene datos de múltiples acciones conservando el orden de symbols"""
+        quotes = YahooFinanceService.get_quotes(symbols)
+        return [quotes[s.upper()] for s in symbols if s.upper() in quotes]
     
     @staticmethod
     def get_popular_stocks():
@@ -93,10 +244,14 @@ class YahooFinanceService:
         return YahooFinanceService.get_multiple_stocks(YahooFinanceService.POPULAR_CRYPTOS)
     
     @staticmethod
-    def get_all_market_data():
-        """Obtiene acciones y criptomonedas"""
-        stocks = YahooFinanceService.get_popular_stocks()
-        cryptos = YahooFinanceService.get_popular_cryptos()
+    def get_all_market_data(refresh=False):
+        """Obtiene acciones y criptomonedas en una sola descarga por lotes"""
+        quotes = YahooFinanceService.get_quotes(
+            YahooFinanceService.POPULAR_STOCKS + YahooFinanceService.POPULAR_CRYPTOS,
+            refresh=refresh
+        )
+        stocks = [quotes[s] for s in YahooFinanceService.POPULAR_STOCKS if s in quotes]
+        cryptos = [quotes[s] for s in YahooFinanceService.POPULAR_CRYPTOS if s in quotes]
         
         return {
             'stocks': stocks,
@@ -105,183 +260,161 @@ class YahooFinanceService:
         }
     
     @staticmethod
-    def search_stock(query):
-        """Busca acciones por símbolo o nombre"""
+    def get_historical_data(symbol, start=None, end=None, shape=RECORDS):
+        """
+        Obtiene datos históricos diarios de una acción desde el almacén local.
+        Sin rango explícito se devuelve todo lo guardado.
+        shape: 'records' (lista de filas) o 'columnar' (un arreglo por campo)
+        """
+        fields = ['close', 'open', 'high', 'low', 'volume']
         try:
-            ticker = yf.Ticker(query.upper())
-            info = ticker.info
-            
-            if not info:
-                return None
-            
-            current_price = info.get('currentPrice', 0)
-            previous_close = info.get('previousClose', current_price)
-            
-            if current_price == 0:
-                return None
-            
-            change = current_price - previous_close
-            change_percent = (change / previous_close * 100) if previous_close > 0 else 0
-            
-            return {
-                'symbol': query.upper(),
-                'name': info.get('longName', query.upper()),
-                'price': round(current_price, 2),
-                'change': round(change, 2),
-                'changePercent': round(change_percent, 2),
-                'volume': info.get('volume', 0),
-                'marketCap': info.get('marketCap', 0),
-                'currency': info.get('currency', 'USD'),
-                'lastUpdate': datetime.now().isoformat()
-            }
-        except Exception as e:
-            logger.error(f"Error buscando {query}: {str(e)}")
-            return None
-    
-    @staticmethod
-    def get_historical_data(symbol):
-        """Obtiene datos históricos de 1 año para una acción"""
-        try:
-            ticker = yf.Ticker(symbol.upper())
-            
-            # Obtener histórico de 1 año
-            hist = ticker.history(period='1y')
+            HistoryStore.ensure_synced(symbol, start)
+            hist = HistoryStore.read(symbol, start, end)
             
             if hist.empty:
                 logger.warning(f"No hay datos históricos para {symbol}")
-                return []
+                return empty_bars(fields, shape)
             
-            historical_data = []
-            for date, row in hist.iterrows():
-                try:
-                    historical_data.append({
-                        'date': date.strftime('%Y-%m-%d'),
-                        'close': round(float(row['Close']), 2),
-                        'open': round(float(row['Open']), 2),
-                        'high': round(float(row['High']), 2),
-                        'low': round(float(row['Low']), 2),
-                        'volume': int(row['Volume'])
-                    })
-                except Exception as e:
-                    logger.warning(f"Error procesando fila histórica para {symbol}: {str(e)}")
-                    continue
+            historical_data = serialize_bars(hist, fields, shape)
             
-            logger.info(f"Histórico obtenido para {symbol}: {len(historical_data)} días")
+            logger.info(f"Histórico obtenido para {symbol}: {bars_count(historical_data)} días")
             return historical_data
         except Exception as e:
             logger.error(f"Error obteniendo histórico para {symbol}: {str(e)}")
-            return []
+            return empty_bars(fields, shape)
     
     @staticmethod
-    def get_stock_detail(symbol):
-        """Obtiene información detallada de una acción incluyendo histórico"""
+    def _safe_number(val, decimals=2, default='N/A'):
+        """Convierte a número redondeado o retorna default"""
         try:
-            ticker = yf.Ticker(symbol.upper())
-            info = ticker.info
-            
-            # Función auxiliar para convertir a número seguro
-            def safe_number(val, decimals=2, default='N/A'):
-                try:
-                    if val is None:
-                        return default
-                    num = float(val)
-                    return round(num, decimals)
-                except (TypeError, ValueError):
-                    return default
-            
-            # Obtener precio actual
-            current_price = safe_number(info.get('currentPrice') or info.get('regularMarketPrice'))
-            
-            # Si no hay precio, intentar obtenerlo del histórico
-            if current_price == 'N/A':
-                try:
-                    hist = ticker.history(period='1d')
-                    if not hist.empty:
-                        price_val = float(hist['Close'].iloc[-1])
-                        current_price = round(price_val, 2)
-                except:
-                    pass
-            
-            # Obtener datos históricos para gráficas
-            historical_data = []
+            if val is None:
+                return default
+            num = float(val)
+            return round(num, decimals)
+        except (TypeError, ValueError):
+            return default
+    
+    @staticmethod
+    def _fetch_fundamentals(symbol):
+        """Descarga los datos fundamentales de una acción (cambian como mucho a diario)"""
+        info = _yahoo().call(lambda: yf.Ticker(symbol.upper()).info)
+        if not info:
+            return None
+        
+        safe_number = YahooFinanceService._safe_number
+        
+        # Obtener dividendo yield de forma segura
+        dividend_yield = info.get('dividendYield')
+        if dividend_yield and isinstance(dividend_yield, (int, float)):
+            dividend_yield = round(dividend_yield * 100, 2)
+        else:
+            dividend_yield = 'N/A'
+        
+        return {
+            'name': info.get('longName') or info.get('shortName') or symbol.upper(),
+            'sector': info.get('sector') or 'N/A',
+            'industry': info.get('industry') or 'N/A',
+            'avgVolume': info.get('averageVolume') or 'N/A',
+            'marketCap': info.get('marketCap') or 'N/A',
+            'beta': safe_number(info.get('beta')),
+            'pe': safe_number(info.get('trailingPE')),
+            'dividend': safe_number(info.get('dividendRate')),
+            'dividendYield': dividend_yield,
+            '52WeekHigh': safe_number(info.get('fiftyTwoWeekHigh')),
+            '52WeekLow': safe_number(info.get('fiftyTwoWeekLow')),
+            'description': info.get('longBusinessSummary') or 'No disponible',
+            'currency': info.get('currency') or 'USD',
+        }
+    
+    @staticmethod
+    def get_fundamentals(symbol):
+        """Datos fundamentales de una acción desde su caché (TTL diario)"""
+        return get_fundamentals_cache().get_or_fetch(
+            symbol,
+            lambda: YahooFinanceService._fetch_fundamentals(symbol)
+        )
+    
+    @staticmethod
+    def _empty_detail(symbol):
+        """Detalle con todos los campos en N/A, base para armar la respuesta"""
+        return {
+            'symbol': symbol,
+            'name': symbol,
+            'sector': 'N/A',
+            'industry': 'N/A',
+            'price': 'N/A',
+            'change': 'N/A',
+            'changePercent': 'N/A',
+            'volume': 'N/A',
+            'avgVolume': 'N/A',
+            'marketCap': 'N/A',
+            'beta': 'N/A',
+            'pe': 'N/A',
+            'dividend': 'N/A',
+            'dividendYield': 'N/A',
+            '52WeekHigh': 'N/A',
+            '52WeekLow': 'N/A',
+            'description': f'No se pudo cargar información para {symbol}',
+            'currency': 'USD',
+        }
+    
+    @staticmethod
+    def get_stock_detail(symbol, start=None, end=None, shape=RECORDS, fields=DETAIL_FACETS):
+        """
+        Obtiene información detallada de una acción armada a partir de tres partes
+        con cachés independientes:
+        - fundamentals: sector, industria, descripción, beta, P/E... (TTL diario)
+        - quote: precio y cambio (caché de cotizaciones)
+        - history: barras diarias del rango pedido (almacén local)
+        Las partes que no están en caché se descargan en paralelo.
+        fields permite pedir solo algunas, p. ej. ('fundamentals', 'quote') para la cabecera.
+        """
+        symbol = symbol.upper()
+        detail = YahooFinanceService._empty_detail(symbol)
+        
+        futures = {}
+        if 'fundamentals' in fields:
+            futures['fundamentals'] = _facet_executor.submit(YahooFinanceService.get_fundamentals, symbol)
+        if 'quote' in fields:
+            futures['quote'] = _facet_executor.submit(YahooFinanceService.get_stock_data, symbol)
+        
+        # El histórico sale de la base de datos, se lee en el hilo de la petición
+        hist = None
+        if 'history' in fields:
+            history_fields = ['close', 'high', 'low', 'volume']
+            detail['historicalData'] = empty_bars(history_fields, shape)
             try:
-                hist = ticker.history(period='1y')
+                HistoryStore.ensure_synced(symbol, start)
+                hist = HistoryStore.read(symbol, start, end)
                 if not hist.empty:
-                    for date, row in hist.iterrows():
-                        try:
-                            historical_data.append({
-                                'date': date.strftime('%Y-%m-%d'),
-                                'close': round(float(row['Close']), 2),
-                                'high': round(float(row['High']), 2),
-                                'low': round(float(row['Low']), 2),
-                                'volume': int(row['Volume'])
-                            })
-                        except:
-                            continue
+                    detail['historicalData'] = serialize_bars(hist, history_fields, shape)
             except Exception as e:
                 logger.warning(f"No se pudo obtener histórico para {symbol}: {str(e)}")
-            
-            # Calcular cambio
-            previous_close = safe_number(info.get('previousClose') or info.get('regularMarketPreviousClose'))
-            
-            if isinstance(current_price, (int, float)) and isinstance(previous_close, (int, float)):
-                change = round(current_price - previous_close, 2)
-                change_percent = round((change / previous_close * 100) if previous_close > 0 else 0, 2)
-            else:
-                change = 'N/A'
-                change_percent = 'N/A'
-            
-            # Obtener dividendo yield de forma segura
-            dividend_yield = info.get('dividendYield')
-            if dividend_yield and isinstance(dividend_yield, (int, float)):
-                dividend_yield = round(dividend_yield * 100, 2)
-            else:
-                dividend_yield = 'N/A'
-            
-            return {
-                'symbol': symbol.upper(),
-                'name': info.get('longName') or info.get('shortName') or symbol.upper(),
-                'sector': info.get('sector') or 'N/A',
-                'industry': info.get('industry') or 'N/A',
-                'price': current_price,
-                'change': change,
-                'changePercent': change_percent,
-                'volume': info.get('volume') or 'N/A',
-                'avgVolume': info.get('averageVolume') or 'N/A',
-                'marketCap': info.get('marketCap') or 'N/A',
-                'beta': safe_number(info.get('beta')),
-                'pe': safe_number(info.get('trailingPE')),
-                'dividend': safe_number(info.get('dividendRate')),
-                'dividendYield': dividend_yield,
-                '52WeekHigh': safe_number(info.get('fiftyTwoWeekHigh')),
-                '52WeekLow': safe_number(info.get('fiftyTwoWeekLow')),
-                'description': info.get('longBusinessSummary') or 'No disponible',
-                'currency': info.get('currency') or 'USD',
-                'historicalData': historical_data[-365:] if historical_data else [],
-                'lastUpdate': datetime.now().isoformat()
-            }
-        except Exception as e:
-            logger.error(f"Error obteniendo detalles de {symbol}: {str(e)}")
-            # Retornar datos parciales
-            return {
-                'symbol': symbol.upper(),
-                'name': symbol.upper(),
-                'sector': 'N/A',
-                'industry': 'N/A',
-                'price': 'N/A',
-                'change': 'N/A',
-                'changePercent': 'N/A',
-                'volume': 'N/A',
-                'avgVolume': 'N/A',
-                'marketCap': 'N/A',
-                'beta': 'N/A',
-                'pe': 'N/A',
-                'dividend': 'N/A',
-                'dividendYield': 'N/A',
-                '52WeekHigh': 'N/A',
-                '52WeekLow': 'N/A',
-                'description': f'No se pudo cargar información para {symbol}',
-                'currency': 'USD',
-                'historicalData': [],
-                'lastUpdate': datetime.now().isoformat()
-            }
+        
+        results = {}
+        for facet, future in futures.items():
+            try:
+                results[facet] = future.result(timeout=YahooFinanceService.FACET_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"No se pudo obtener {facet} de {symbol}: {str(e)}")
+                results[facet] = None
+        
+        quote = results.get('quote')
+        if quote:
+            detail.update({
+                'name': quote['name'],
+                'price': quote['price'],
+                'change': quote['change'],
+                'changePercent': quote['changePercent'],
+                'volume': quote['volume'] or 'N/A',
+                'currency': quote['currency'],
+            })
+        elif 'quote' in fields and hist is not None and not hist.empty:
+            # Si no hay cotización, usar el último cierre guardado
+            detail['price'] = round(float(hist['Close'].iloc[-1]), 2)
+        
+        if results.get('fundamentals'):
+            detail.update(results['fundamentals'])
+        
+        detail['lastUpdate'] = datetime.now().isoformat()
+        return detail
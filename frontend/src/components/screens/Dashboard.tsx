@@ -51,6 +51,15 @@ const performanceData90Days = [
   { date: 'Mes 3', value: 45800 },
 ];
 
+// performance_data trae fechas ISO (YYYY-MM-DD); los datos de ejemplo ya traen su etiqueta
+const PERFORMANCE_RANGES = { '7': '7D', '30': '1M', '90': '3M' } as const;
+
+const formatChartDate = (value: string) => {
+  if (!/^\d{4}-\d{2}-\d{2}$/.test(value)) return value;
+  const [year, month, day] = value.split('-').map(Number);
+  return new Date(year, month - 1, day).toLocaleDateString('es-GT', { day: 'numeric', month: 'short' });
+};
+
 // Recent transactions
 const recentTransactions = [
   { id: '1', symbol: 'AAPL', type: 'buy', shares: 10, price: 176.11, total: 1761.10, date: '2024-11-02 14:30', status: 'completed' },
@@ -158,7 +167,8 @@ export function Dashboard({ onNavigate }: DashboardProps) {
         
         if (!token) return;
 
-        const response = await fetch(`${API_BASE_URL}/portfolio/portfolio/dashboard_stats/`, {
+        const range = PERFORMANCE_RANGES[performancePeriod];
+        const response = await fetch(`${API_BASE_URL}/portfolio/portfolio/dashboard_stats/?range=${range}`, {
           headers: {
             'Authorization': `Bearer ${token}`,
           },
@@ -184,7 +194,7 @@ export function Dashboard({ onNavigate }: DashboardProps) {
     // Recargar cada 30 segundos
     const interval = setInterval(fetchDashboardStats, 30000);
     return () => clearInterval(interval);
-  }, []);
+  }, [performancePeriod]);
 
   const performanceData = performancePeriod === '7' 
     ? performanceData7Days 
@@ -294,7 +304,7 @@ export function Dashboard({ onNavigate }: DashboardProps) {
                 </linearGradient>
               </defs>
               <CartesianGrid strokeDasharray="3 3" stroke="#e2e8f0" />
-              <XAxis dataKey="date" stroke="#64748b" fontSize={12} />
+              <XAxis dataKey="date" stroke="#64748b" fontSize={12} tickFormatter={formatChartDate} />
               <YAxis stroke="#64748b" fontSize={12} />
               <Tooltip 
                 contentStyle={{ 
@@ -302,6 +312,7 @@ export function Dashboard({ onNavigate }: DashboardProps) {
                   border: '1px solid #e2e8f0',
                   borderRadius: '8px' 
                 }}
+                labelFormatter={(label: any) => formatChartDate(String(label))}
                 formatter={(value: any) => {
                   const val = typeof value === 'number' ? value : parseFloat(value || '0');
                   return [`$${val.toLocaleString()}`, 'Valor'];